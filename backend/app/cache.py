@@ -0,0 +1,128 @@
+"""In-process caches for values that only change when data is written.
+
+Every code path that writes profiles (ingest, sample data, resets) calls
+``bump_version()`` in its transaction and ``invalidate()`` after committing;
+readers recompute lazily on the next request.  The caches are per process,
+matching the single-writer SQLite deployment.  The data version is stored
+in the database, so keys built from it (response_cache.py) stay valid
+across restarts.  ``data_version`` re-reads it every ``DATA_VERSION_TTL``
+seconds: a write committed by another process (a second worker, a script)
+is seen within that time, and drops the values cached for the old data.
+"""
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from . import models
+
+_lock = threading.Lock()
+_generation = 0
+_profile_count = None
+_values = {}
+# (token, time.monotonic() when read) of the data version, None until read
+_version = None
+
+# Seconds the data version is trusted before it is read from the database again
+VERSION_TTL = float(os.getenv("DATA_VERSION_TTL", "1"))
+
+
+def profile_count(db: Session) -> int:
+    """``SELECT count(*) FROM profiles``, computed once per data change"""
+    global _profile_count
+    with _lock:
+        count, generation = _profile_count, _generation
+    if count is None:
+        count = db.execute(select(func.count()).select_from(models.Profile)).scalar_one()
+        with _lock:
+            # Do not store a count that an invalidation raced past
+            if generation == _generation:
+                _profile_count = count
+    return count
+
+
+async def profile_count_async(db) -> int:
+    """``profile_count`` for an async session"""
+    global _profile_count
+    with _lock:
+        count, generation = _profile_count, _generation
+    if count is None:
+        count = (await db.execute(select(func.count()).select_from(models.Profile))).scalar_one()
+        with _lock:
+            if generation == _generation:
+                _profile_count = count
+    return count
+
+
+def cached(name: str, compute):
+    """``compute()`` evaluated once per data change and shared by every request"""
+    with _lock:
+        value, generation = _values.get(name), _generation
+    if value is None:
+        value = compute()
+        with _lock:
+            if generation == _generation:
+                _values[name] = value
+    return value
+
+
+def bump_version(db: Session):
+    """Give the data a new version in the caller's transaction"""
+    db.merge(models.DataVersion(id=1, token=uuid.uuid4().hex, updated_at=datetime.utcnow()))
+
+
+def ensure_version(db: Session):
+    """Commit a first data version if the database has none (startup)"""
+    if db.get(models.DataVersion, 1) is None:
+        bump_version(db)
+        db.commit()
+        invalidate()
+
+
+def read_version(db: Session) -> str:
+    """Token of the current data version, read from the database ("" before the first write)"""
+    return db.execute(select(models.DataVersion.token).where(models.DataVersion.id == 1)).scalar() or ""
+
+
+def fresh_version():
+    """The data version if it was read less than ``VERSION_TTL`` seconds ago, else None"""
+    with _lock:
+        if _version is not None and time.monotonic() - _version[1] < VERSION_TTL:
+            return _version[0]
+    return None
+
+
+def data_version(db: Session) -> str:
+    """``read_version``, read again once it is ``VERSION_TTL`` seconds old or the data changed"""
+    global _version
+    with _lock:
+        known, generation = _version, _generation
+    if known is not None and time.monotonic() - known[1] < VERSION_TTL:
+        return known[0]
+    token = read_version(db)
+    with _lock:
+        # Do not store a token that an invalidation raced past
+        if generation == _generation:
+            if known is not None and token != known[0]:
+                # Another process wrote: what this one cached describes the old data
+                _clear()
+            _version = (token, time.monotonic())
+    return token
+
+
+def _clear():
+    global _profile_count, _generation, _version
+    _generation += 1
+    _profile_count = None
+    _version = None
+    _values.clear()
+
+
+def invalidate():
+    """Drop cached values after profiles were written or deleted"""
+    with _lock:
+        _clear()
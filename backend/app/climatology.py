@@ -0,0 +1,297 @@
+"""Pre-aggregated TEMP/PSAL climatology cubes.
+
+Measurements are binned by ``GRID_DEG`` latitude/longitude cell, standard
+pressure bin (``PRESSURE_EDGES``) and calendar month of the profile date.
+Each cell of the ``climatology`` table keeps count, sum, sum of squares,
+min and max per variable, so mean and variance follow directly and cells
+merge by addition: ingest folds each new batch in with an upsert, and
+coarser views (a regional depth profile, a seasonal cycle) are a
+``GROUP BY`` over a few hundred cells instead of a scan of the
+measurements.  Replacing profiles cannot be undone for min/max, so grid
+cells that lose profiles are recomputed from the measurements instead.
+"""
+import math
+import os
+
+import numpy as np
+from sqlalchemy import and_, case, delete, func, or_, select, tuple_
+from sqlalchemy.orm import Session
+
+from . import models
+
+# Cell size in degrees
+GRID_DEG = float(os.getenv("CLIMATOLOGY_GRID_DEG", "1.0"))
+
+# Lower edges (dbar) of the pressure bins; the last bin is open-ended
+PRESSURE_EDGES = np.array([
+    0, 10, 20, 30, 50, 75, 100, 125, 150, 200, 250, 300, 400, 500, 600, 700,
+    800, 900, 1000, 1100, 1200, 1300, 1400, 1500, 1750, 2000,
+], dtype=np.float64)
+
+VARIABLES = ("temp", "psal")
+KEY_COLUMNS = ("lat_bin", "lon_bin", "pres_bin", "month")
+GROUPS = ("cell", "pres", "month")
+
+# Grid cells per recompute query
+CHUNK_CELLS = 100
+
+# Measurements per chunk when rebuilding from SQL
+REBUILD_CHUNK = 100000
+
+
+def _bin(values) -> np.ndarray:
+    return np.floor(np.asarray(values, dtype=np.float64) / GRID_DEG).astype(np.int64)
+
+
+def _cells(lat, lon) -> list:
+    """``(lat_bin, lon_bin)`` per position; None where the position is missing"""
+    lat, lon = np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64)
+    located = np.isfinite(lat) & np.isfinite(lon)
+    lat_bin, lon_bin = _bin(np.where(located, lat, 0)), _bin(np.where(located, lon, 0))
+    return [(a, b) if ok else None for a, b, ok in zip(lat_bin.tolist(), lon_bin.tolist(), located.tolist())]
+
+
+def pressure_bin(pres) -> np.ndarray:
+    return np.maximum(np.searchsorted(PRESSURE_EDGES, np.asarray(pres, dtype=np.float64), side="right") - 1, 0)
+
+
+def month_of(juld) -> np.ndarray:
+    """Calendar month (1-12) of Argo JULD day numbers; 0 where the date is missing"""
+    juld = np.asarray(juld, dtype=np.float64)
+    known = np.isfinite(juld)
+    days = np.floor(np.where(known, juld, 0)).astype("timedelta64[D]")
+    months = (np.datetime64("1950-01-01") + days).astype("datetime64[M]").astype(np.int64) % 12 + 1
+    return np.where(known, months, 0)
+
+
+def cell_stats(lat, lon, pres, juld, values: dict) -> dict:
+    """Aggregate measurement arrays into ``{column: array}``, one entry per cell"""
+    lat, lon = np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64)
+    located = np.isfinite(lat) & np.isfinite(lon)
+    keys = np.column_stack([
+        _bin(lat[located]), _bin(lon[located]),
+        pressure_bin(np.asarray(pres)[located]), month_of(np.asarray(juld)[located]),
+    ])
+    if keys.shape[0] == 0:
+        return {}
+    cells, inverse = np.unique(keys, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    n = cells.shape[0]
+
+    stats = {name: cells[:, i] for i, name in enumerate(KEY_COLUMNS)}
+    for name in VARIABLES:
+        v = np.asarray(values[name], dtype=np.float64)[located]
+        finite = np.isfinite(v)
+        idx, v = inverse[finite], v[finite]
+        lo = np.full(n, np.inf)
+        hi = np.full(n, -np.inf)
+        np.minimum.at(lo, idx, v)
+        np.maximum.at(hi, idx, v)
+        stats[f"{name}_count"] = np.bincount(idx, minlength=n)
+        stats[f"{name}_sum"] = np.bincount(idx, weights=v, minlength=n)
+        stats[f"{name}_sumsq"] = np.bincount(idx, weights=v * v, minlength=n)
+        stats[f"{name}_min"] = np.where(np.isfinite(lo), lo, np.nan)
+        stats[f"{name}_max"] = np.where(np.isfinite(hi), hi, np.nan)
+    return stats
+
+
+def _rows(stats: dict) -> list:
+    names = list(stats)
+    return [
+        {name: (None if isinstance(value, float) and math.isnan(value) else value) for name, value in zip(names, row)}
+        for row in zip(*(stats[name].tolist() for name in names))
+    ]
+
+
+def _merge_statement(dialect: str):
+    """Dialect upsert folding new partial statistics into existing cells"""
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+    table = models.ClimatologyCell.__table__
+    stmt = insert(table)
+    new = stmt.excluded
+    merged = {}
+    for name in VARIABLES:
+        for part in ("count", "sum", "sumsq"):
+            column = f"{name}_{part}"
+            merged[column] = table.c[column] + new[column]
+        low, high = table.c[f"{name}_min"], table.c[f"{name}_max"]
+        merged[low.name] = case((low.is_(None), new[low.name]), (new[low.name] < low, new[low.name]), else_=low)
+        merged[high.name] = case((high.is_(None), new[high.name]), (new[high.name] > high, new[high.name]), else_=high)
+    return stmt.on_conflict_do_update(index_elements=list(KEY_COLUMNS), set_=merged)
+
+
+def _merge_orm(db: Session, rows: list):
+    for row in rows:
+        cell = db.get(models.ClimatologyCell, tuple(row[k] for k in KEY_COLUMNS))
+        if cell is None:
+            db.add(models.ClimatologyCell(**row))
+            continue
+        for name in VARIABLES:
+            for part in ("count", "sum", "sumsq"):
+                column = f"{name}_{part}"
+                setattr(cell, column, (getattr(cell, column) or 0) + row[column])
+            for column, pick in ((f"{name}_min", min), (f"{name}_max", max)):
+                known = [v for v in (getattr(cell, column), row[column]) if v is not None]
+                setattr(cell, column, pick(known) if known else None)
+
+
+def merge(db: Session, stats: dict):
+    """Fold partial cell statistics (from ``cell_stats``) into the table"""
+    rows = _rows(stats) if stats else []
+    if not rows:
+        return
+    stmt = _merge_statement(db.get_bind().dialect.name)
+    if stmt is None:
+        _merge_orm(db, rows)
+    else:
+        db.execute(stmt, rows)
+
+
+def add_batch(db: Session, batch: dict, skip_cells=()):
+    """Fold a newly written batch into the cubes, except profiles in the grid cells ``skip_cells``"""
+    index = batch["profile_index"]
+    juld = batch.get("juld")
+    lat, lon = batch["latitude"][index], batch["longitude"][index]
+    juld = np.full(index.shape[0], np.nan) if juld is None else juld[index]
+    pres = batch["pres"]
+    values = {name: batch[name] for name in VARIABLES}
+    if skip_cells:
+        keep = ~np.array([cell in skip_cells for cell in _cells(batch["latitude"], batch["longitude"])], dtype=bool)
+        keep = keep[index]
+        lat, lon, juld, pres = lat[keep], lon[keep], juld[keep], pres[keep]
+        values = {name: v[keep] for name, v in values.items()}
+    merge(db, cell_stats(lat, lon, pres, juld, values))
+
+
+def grid_cells(db: Session, profile_ids) -> set:
+    """``(lat_bin, lon_bin)`` of the given profiles"""
+    cells = set()
+    profile_ids = list(profile_ids)
+    for lo in range(0, len(profile_ids), 500):
+        rows = db.execute(
+            select(models.Profile.latitude, models.Profile.longitude)
+            .where(models.Profile.id.in_(profile_ids[lo:lo + 500]),
+                   models.Profile.latitude.is_not(None), models.Profile.longitude.is_not(None))
+        ).all()
+        if rows:
+            lat, lon = np.asarray(rows, dtype=np.float64).T
+            cells.update(_cells(lat, lon))
+    return cells
+
+
+def _measurements(db: Session, where=None):
+    """Yield ``(lat, lon, juld, pres, temp, psal)`` arrays in chunks"""
+    p, m = models.Profile, models.Measurement
+    q = select(p.latitude, p.longitude, p.juld, m.pres, m.temp, m.psal).join(m, m.profile_id == p.id)
+    if where is not None:
+        q = q.where(where)
+    result = db.execute(q.execution_options(yield_per=REBUILD_CHUNK))
+    for rows in result.partitions():
+        yield np.asarray(rows, dtype=np.float64).T
+
+
+def rebuild_cells(db: Session, cells):
+    """Recompute whole grid cells (every pressure bin and month) from the measurements"""
+    cells = sorted(cells)
+    table = models.ClimatologyCell
+    for lo in range(0, len(cells), CHUNK_CELLS):
+        chunk = cells[lo:lo + CHUNK_CELLS]
+        db.execute(delete(table).where(tuple_(table.lat_bin, table.lon_bin).in_(chunk)))
+        # Pad the boxes slightly and keep exact bin matches below, so float rounding cannot drop edge points
+        pad = GRID_DEG * 1e-9
+        boxes = or_(*(
+            and_(models.Profile.latitude >= lat * GRID_DEG - pad, models.Profile.latitude < (lat + 1) * GRID_DEG + pad,
+                 models.Profile.longitude >= lon * GRID_DEG - pad, models.Profile.longitude < (lon + 1) * GRID_DEG + pad)
+            for lat, lon in chunk
+        ))
+        wanted = set(chunk)
+        for lat, lon, juld, pres, temp, psal in _measurements(db, boxes):
+            keep = np.array([c in wanted for c in _cells(lat, lon)], dtype=bool)
+            merge(db, cell_stats(lat[keep], lon[keep], pres[keep], juld[keep],
+                                 {"temp": temp[keep], "psal": psal[keep]}))
+
+
+def rebuild(db: Session) -> int:
+    """Recompute every cell from the measurements; returns the number of cells"""
+    clear(db)
+    for lat, lon, juld, pres, temp, psal in _measurements(db):
+        merge(db, cell_stats(lat, lon, pres, juld, {"temp": temp, "psal": psal}))
+    return db.execute(select(func.count()).select_from(models.ClimatologyCell)).scalar_one()
+
+
+def clear(db: Session):
+    db.execute(delete(models.ClimatologyCell))
+
+
+def _bin_range(low, high, to_bin):
+    return (None if low is None else int(to_bin(low)), None if high is None else int(to_bin(high)))
+
+
+def query(db: Session, by=GROUPS, variables=VARIABLES, lat_min=None, lat_max=None, lon_min=None, lon_max=None,
+          pres_min=None, pres_max=None, months=None) -> list:
+    """Cells overlapping the filters, merged over whatever is not in ``by``.
+
+    ``by`` is a subset of ``("cell", "pres", "month")``: ``("pres",)`` gives
+    a regional depth profile, ``("month",)`` a seasonal cycle.
+    """
+    c = models.ClimatologyCell
+    group = []
+    if "cell" in by:
+        group += [c.lat_bin, c.lon_bin]
+    if "pres" in by:
+        group.append(c.pres_bin)
+    if "month" in by:
+        group.append(c.month)
+
+    measures = []
+    for name in variables:
+        measures += [
+            func.sum(getattr(c, f"{name}_count")), func.sum(getattr(c, f"{name}_sum")),
+            func.sum(getattr(c, f"{name}_sumsq")), func.min(getattr(c, f"{name}_min")),
+            func.max(getattr(c, f"{name}_max")),
+        ]
+    q = select(*group, *measures)
+    for column, (low, high) in (
+        (c.lat_bin, _bin_range(lat_min, lat_max, _bin)),
+        (c.lon_bin, _bin_range(lon_min, lon_max, _bin)),
+        (c.pres_bin, _bin_range(pres_min, pres_max, pressure_bin)),
+    ):
+        if low is not None:
+            q = q.where(column >= low)
+        if high is not None:
+            q = q.where(column <= high)
+    if months:
+        q = q.where(c.month.in_(list(months)))
+    if group:
+        q = q.group_by(*group).order_by(*group)
+
+    cells = []
+    for row in db.execute(q).all():
+        row = list(row)
+        cell = {}
+        if "cell" in by:
+            lat_bin, lon_bin = row.pop(0), row.pop(0)
+            cell.update(lat_min=lat_bin * GRID_DEG, lat_max=(lat_bin + 1) * GRID_DEG,
+                        lon_min=lon_bin * GRID_DEG, lon_max=(lon_bin + 1) * GRID_DEG)
+        if "pres" in by:
+            pres_bin = row.pop(0)
+            upper = pres_bin + 1 < len(PRESSURE_EDGES)
+            cell.update(pres_min=float(PRESSURE_EDGES[pres_bin]),
+                        pres_max=float(PRESSURE_EDGES[pres_bin + 1]) if upper else None)
+        if "month" in by:
+            cell["month"] = row.pop(0)
+        for name in variables:
+            count, total, sumsq, low, high = row[:5]
+            del row[:5]
+            count = int(count or 0)
+            mean = total / count if count else None
+            variance = max((sumsq - total * mean) / (count - 1), 0.0) if count > 1 else None
+            cell[name] = {"count": count, "mean": mean, "min": low, "max": high, "variance": variance}
+        if any(cell[name]["count"] for name in variables):
+            cells.append(cell)
+    return cells
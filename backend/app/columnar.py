@@ -0,0 +1,215 @@
+"""Optional columnar (Parquet) storage tier for measurements.
+
+Enabled by pointing ``COLUMNAR_DIR`` at a writable directory.  Ingest then
+mirrors every float's measurements into ``<dir>/float_id=<id>/data.parquet``
+(hive partitioning), with the profile position denormalized onto each level
+so queries can prune on pressure and lat/lon from Parquet row-group
+statistics and read only the columns they need.  The SQL tables remain the
+source of truth; ``rebuild`` re-exports them.
+
+Ingest only queues its batches on the session (``upsert``); ``flush`` writes
+them once the transaction has committed, so a file whose savepoint or
+transaction rolls back never reaches the Parquet files.
+"""
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models
+
+COLUMNAR_DIR = os.getenv("COLUMNAR_DIR")
+
+# Levels per Parquet row group; smaller groups prune finer on pres/lat/lon
+ROW_GROUP_SIZE = 16384
+
+LEVEL_COLUMNS = ("n_prof", "latitude", "longitude", "n_levels", "pres", "temp", "psal")
+
+# Session.info key of the batches waiting for their transaction to commit
+PENDING = "columnar_pending"
+
+
+def enabled() -> bool:
+    return bool(COLUMNAR_DIR)
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError as e:
+        raise RuntimeError("The columnar tier requires pyarrow (pip install pyarrow)") from e
+    return pyarrow
+
+
+def _partition(float_id: str) -> Path:
+    return Path(COLUMNAR_DIR) / f"float_id={float_id}"
+
+
+def _table(batch: dict):
+    """Arrow table of one batch, sorted by (n_prof, pres)"""
+    pa = _pyarrow()
+    index = batch["profile_index"]
+    order = np.lexsort((batch["pres"], index))
+    index = index[order]
+    return pa.table({
+        "n_prof": pa.array(batch["n_prof"][index].astype(np.int32)),
+        "latitude": pa.array(batch["latitude"][index]),
+        "longitude": pa.array(batch["longitude"][index]),
+        "n_levels": pa.array(batch["n_levels"][order].astype(np.int32)),
+        "pres": pa.array(batch["pres"][order].astype(np.float32)),
+        "temp": pa.array(batch["temp"][order].astype(np.float32)),
+        "psal": pa.array(batch["psal"][order].astype(np.float32)),
+    })
+
+
+def upsert(db: Session, batch: dict, drop_n_prof=()):
+    """Queue a float's profiles for ``flush``, replacing ``drop_n_prof`` and every profile in the batch"""
+    if enabled():
+        db.info.setdefault(PENDING, []).append((batch, tuple(drop_n_prof)))
+
+
+def flush(db: Session):
+    """Write the queued batches (call after the ingest transaction commits).
+
+    A partition that fails to write is re-exported from SQL so it cannot be
+    left disagreeing with the database.
+    """
+    for batch, drop_n_prof in db.info.pop(PENDING, []):
+        try:
+            write(batch, drop_n_prof)
+        except Exception as e:
+            print(f"Parquet write failed for {batch['float_id']}, re-exporting it: {e}")
+            try:
+                export_float(db, batch["float_id"])
+            except Exception as e:
+                print(f"Parquet re-export failed for {batch['float_id']}: {e}")
+
+
+def discard(db: Session):
+    """Drop the queued batches (the transaction rolled back)"""
+    db.info.pop(PENDING, None)
+
+
+def write(batch: dict, drop_n_prof=()):
+    """Write a float's profiles, replacing ``drop_n_prof`` and every profile in the batch"""
+    if not enabled():
+        return
+    pa = _pyarrow()
+    partition = _partition(batch["float_id"])
+    path = partition / "data.parquet"
+    replaced = set(int(n) for n in drop_n_prof) | set(batch["n_prof"].tolist())
+
+    tables = []
+    if path.exists():
+        existing = pa.parquet.read_table(path)
+        keep = pa.compute.invert(pa.compute.is_in(existing["n_prof"], value_set=pa.array(sorted(replaced), pa.int32())))
+        tables.append(existing.filter(keep))
+    if batch["n_prof"].shape[0]:
+        tables.append(_table(batch))
+    if not tables:
+        return
+
+    table = pa.concat_tables(tables)
+    if table.num_rows == 0:
+        path.unlink(missing_ok=True)
+        return
+    table = table.sort_by([("n_prof", "ascending"), ("pres", "ascending")])
+    partition.mkdir(parents=True, exist_ok=True)
+    tmp = partition / "data.parquet.tmp"
+    pa.parquet.write_table(table, tmp, compression="zstd", row_group_size=ROW_GROUP_SIZE)
+    os.replace(tmp, path)
+
+
+def _empty(columns):
+    pa = _pyarrow()
+    types = {"float_id": pa.string(), "n_prof": pa.int32(), "n_levels": pa.int32(),
+             "latitude": pa.float64(), "longitude": pa.float64()}
+    return pa.table({name: pa.array([], types.get(name, pa.float32())) for name in columns})
+
+
+def read_levels(columns=None, float_ids=None, n_prof=None, pres_min=None, pres_max=None,
+                lat_min=None, lat_max=None, lon_min=None, lon_max=None):
+    """Read measurement levels as an Arrow table with filters pushed down to Parquet.
+
+    ``float_ids`` prunes partitions; pressure and lat/lon bounds skip row
+    groups by their statistics.  ``columns`` defaults to every level column
+    plus ``float_id``.
+    """
+    pa = _pyarrow()
+    root = Path(COLUMNAR_DIR)
+    columns = list(columns) if columns else ["float_id", *LEVEL_COLUMNS]
+    if not root.exists():
+        return _empty(columns)
+
+    partitioning = pa.dataset.partitioning(pa.schema([("float_id", pa.string())]), flavor="hive")
+    field = pa.dataset.field
+    conditions = []
+    if float_ids:
+        # Open the partitions directly instead of discovering the whole tree
+        paths = [str(_partition(f) / "data.parquet") for f in float_ids if (_partition(f) / "data.parquet").exists()]
+        if not paths:
+            return _empty(columns)
+        dataset = pa.dataset.dataset(paths, format="parquet", partitioning=partitioning, partition_base_dir=str(root))
+    else:
+        dataset = pa.dataset.dataset(root, format="parquet", partitioning=partitioning)
+    if n_prof is not None:
+        conditions.append(field("n_prof") == int(n_prof))
+    for name, low, high in (("pres", pres_min, pres_max), ("latitude", lat_min, lat_max), ("longitude", lon_min, lon_max)):
+        if low is not None:
+            conditions.append(field(name) >= low)
+        if high is not None:
+            conditions.append(field(name) <= high)
+
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return dataset.to_table(columns=columns, filter=expression)
+
+
+def clear():
+    """Drop every partition (used when the profile tables are reset)"""
+    if enabled() and Path(COLUMNAR_DIR).exists():
+        shutil.rmtree(COLUMNAR_DIR)
+
+
+def export_float(db: Session, float_id: str) -> int:
+    """Rewrite one float's partition from SQL; returns rows written"""
+    _partition(float_id).joinpath("data.parquet").unlink(missing_ok=True)
+    rows = db.execute(
+        select(models.Profile.n_prof, models.Profile.latitude, models.Profile.longitude,
+               models.Measurement.n_levels, models.Measurement.pres,
+               models.Measurement.temp, models.Measurement.psal)
+        .join(models.Measurement, models.Measurement.profile_id == models.Profile.id)
+        .where(models.Profile.float_id == float_id)
+    ).all()
+    if not rows:
+        return 0
+    n_prof, lat, lon, n_levels, pres, temp, psal = (np.asarray(col) for col in zip(*rows))
+    profiles, first, index = np.unique(n_prof, return_index=True, return_inverse=True)
+    write({
+        "float_id": float_id,
+        "n_prof": profiles.astype(np.int64),
+        "latitude": lat[first].astype(np.float64),
+        "longitude": lon[first].astype(np.float64),
+        "profile_index": index.reshape(-1),
+        "n_levels": n_levels.astype(np.int64),
+        "pres": pres.astype(np.float64),
+        "temp": temp.astype(np.float64),
+        "psal": psal.astype(np.float64),
+    })
+    return len(rows)
+
+
+def rebuild(db: Session) -> int:
+    """Re-export all measurements from SQL, one partition per float; returns rows written"""
+    if not enabled():
+        raise RuntimeError("COLUMNAR_DIR is not set")
+    clear()
+    float_ids = db.execute(select(models.Profile.float_id).distinct()).scalars().all()
+    return sum(export_float(db, float_id) for float_id in float_ids)
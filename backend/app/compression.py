@@ -0,0 +1,196 @@
+"""``Content-Encoding`` negotiation and compression (zstd, brotli, gzip).
+
+gzip is always available; ``br`` needs ``brotli`` and ``zstd`` needs
+``zstandard``, and neither is offered when its module is not installed.
+Each coding has two levels: a fast one for responses compressed as they are
+sent (``CompressionMiddleware``) and a stronger one for bodies compressed once
+and stored (response_cache.py), where the extra time is paid once per data
+version instead of per request.
+"""
+import os
+import zlib
+
+import anyio.to_thread
+
+GZIP = "gzip"
+BROTLI = "br"
+ZSTD = "zstd"
+
+# Server preference among codings the client accepts with equal q
+PREFERENCE = (BROTLI, ZSTD, GZIP)
+# (on the fly, stored) compression level per coding.  Stored levels stop below
+# the slow modes: brotli 10-11 and zstd 13+ take ~100x longer for ~15% fewer bytes.
+LEVELS = {BROTLI: (4, 9), ZSTD: (3, 12), GZIP: (6, 9)}
+# Smaller bodies are sent as they are
+MIN_SIZE = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+# Chunks at least this large are compressed on a worker thread, off the event loop
+THREAD_BYTES = 64 * 1024
+# Already compressed or streamed event by event
+SKIPPED_TYPES = ("text/event-stream", "image/", "application/zip", "application/gzip")
+
+
+def _import(name: str):
+    try:
+        return __import__(name)
+    except ImportError:
+        return None
+
+
+# Module implementing each coding that can be produced here, resolved once at import
+MODULES = {coding: module for coding, module in
+           ((BROTLI, _import("brotli")), (ZSTD, _import("zstandard")), (GZIP, zlib)) if module is not None}
+# Those codings in server preference order
+AVAILABLE = tuple(c for c in PREFERENCE if c in MODULES)
+
+
+def available() -> tuple:
+    """Codings that can be produced here, in server preference order"""
+    return AVAILABLE
+
+
+def negotiate(accept_encoding: str = None):
+    """Best available coding for an ``Accept-Encoding`` header, or None to send the body as is"""
+    if not accept_encoding:
+        return None
+    q_values, wildcard = {}, None
+    for part in accept_encoding.split(","):
+        coding, *params = (p.strip() for p in part.split(";"))
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        coding = coding.lower()
+        if coding == "*":
+            wildcard = q
+        elif coding:
+            q_values[coding] = q
+    best, best_q = None, 0.0
+    for coding in AVAILABLE:
+        q = q_values.get(coding, wildcard or 0.0)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(body: bytes, coding: str, stored: bool = False) -> bytes:
+    """``body`` compressed with ``coding`` (the stronger level when the result is ``stored``)"""
+    level = LEVELS[coding][stored]
+    module = MODULES[coding]
+    if coding == BROTLI:
+        return module.compress(body, quality=level)
+    if coding == ZSTD:
+        return module.ZstdCompressor(level=level).compress(body)
+    stream = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return stream.compress(body) + stream.flush()
+
+
+def decompress(body: bytes, coding: str) -> bytes:
+    module = MODULES[coding]
+    if coding == BROTLI:
+        return module.decompress(body)
+    if coding == ZSTD:
+        return module.ZstdDecompressor().decompressobj().decompress(body)
+    return zlib.decompress(body, 31)
+
+
+class Stream:
+    """Incremental compressor; ``compress(chunk, flush=True)`` returns everything the client can decode so far"""
+
+    def __init__(self, coding: str):
+        level = LEVELS[coding][0]
+        module = MODULES[coding]
+        self.coding = coding
+        if coding == BROTLI:
+            self._stream = module.Compressor(quality=level)
+        elif coding == ZSTD:
+            self._stream = module.ZstdCompressor(level=level).compressobj()
+            self._flush_mode = module.COMPRESSOBJ_FLUSH_BLOCK
+        else:
+            self._stream = zlib.compressobj(level, zlib.DEFLATED, 31)
+            self._flush_mode = zlib.Z_SYNC_FLUSH
+
+    def compress(self, chunk: bytes, flush: bool = False) -> bytes:
+        if self.coding == BROTLI:
+            return self._stream.process(chunk) + (self._stream.flush() if flush else b"")
+        out = self._stream.compress(chunk)
+        if flush:
+            out += self._stream.flush(self._flush_mode)
+        return out
+
+    def finish(self, chunk: bytes = b"") -> bytes:
+        if self.coding == BROTLI:
+            return self._stream.process(chunk) + self._stream.finish()
+        return self._stream.compress(chunk) + self._stream.flush()
+
+
+def add_vary(headers: list, value: str = "Accept-Encoding") -> list:
+    """``headers`` with ``value`` appended to ``Vary``"""
+    for i, (k, v) in enumerate(headers):
+        if k.lower() == b"vary":
+            return headers[:i] + [(k, v + b", " + value.encode())] + headers[i + 1:]
+    return headers + [(b"vary", value.encode())]
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses on the fly in the negotiated coding.
+
+    Responses that already carry ``Content-Encoding`` (the response cache's
+    stored bodies) pass through untouched; streamed bodies stay streamed.
+    """
+
+    def __init__(self, app, minimum_size: int = MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        coding = negotiate(dict(scope["headers"]).get(b"accept-encoding", b"").decode("latin-1"))
+        if coding is None:
+            return await self.app(scope, receive, send)
+
+        start, stream = None, None
+        passthrough = False
+
+        async def run(method, *args):
+            if len(args[0]) >= THREAD_BYTES:
+                return await anyio.to_thread.run_sync(method, *args)
+            return method(*args)
+
+        async def compressing_send(message):
+            nonlocal start, stream, passthrough
+            if passthrough:
+                return await send(message)
+            if message["type"] == "http.response.start":
+                start = message
+                headers = {k.lower(): v for k, v in start["headers"]}
+                content_type = headers.get(b"content-type", b"").decode("latin-1")
+                if b"content-encoding" in headers or content_type.startswith(SKIPPED_TYPES):
+                    passthrough = True
+                    await send(start)
+                return
+            body, more_body = message.get("body", b""), message.get("more_body", False)
+            if stream is None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    return await send(message)
+                stream = Stream(coding)
+                headers = [(k, v) for k, v in start["headers"] if k.lower() != b"content-length"]
+                headers = add_vary(headers + [(b"content-encoding", coding.encode())])
+                if not more_body:
+                    body = await run(stream.finish, body)
+                    headers.append((b"content-length", str(len(body)).encode()))
+                    await send(dict(start, headers=headers))
+                    return await send({"type": "http.response.body", "body": body})
+                await send(dict(start, headers=headers))
+            if more_body:
+                body = await run(stream.compress, body, True)
+            else:
+                body = await run(stream.finish, body)
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, compressing_send)
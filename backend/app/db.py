@@ -1,58 +1,19 @@
-from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeout
 from sqlalchemy.orm import sessionmaker, declarative_base
-import os
-import tempfile
-from pathlib import Path
 
-def get_database_url():
-    """Get database URL, handling read-only file systems like Streamlit Cloud"""
-    
-    # If DATABASE_URL is explicitly set, use it
-    if "DATABASE_URL" in os.environ:
-        return os.environ["DATABASE_URL"]
-    
-    # Check if we're likely on Streamlit Cloud (read-only filesystem)
-    if os.getenv("STREAMLIT_SHARING_MODE") or os.getenv("STREAMLIT_CLOUD"):
-        # Use in-memory SQLite for Streamlit Cloud
-        return "sqlite:///:memory:"
-    
-    # Try to create a database in a writable location
-    possible_locations = [
-        # Try temp directory first
-        Path(tempfile.gettempdir()) / "argo.db",
-        # Try user's home directory
-        Path.home() / ".argo" / "argo.db",
-        # Try current working directory
-        Path.cwd() / "argo.db",
-        # Try backend data directory (local development)
-        Path(__file__).parent.parent / "data" / "argo.db"
-    ]
-    
-    for db_path in possible_locations:
-        try:
-            # Create parent directory if needed
-            db_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            # Test if we can write to this location
-            test_file = db_path.parent / "test_write.tmp"
-            test_file.touch()
-            test_file.unlink()
-            
-            return f"sqlite:///{db_path}"
-        except (PermissionError, OSError):
-            continue
-    
-    # Fallback to in-memory database
-    print("Warning: Could not find writable location for database, using in-memory SQLite")
-    return "sqlite:///:memory:"
+from . import storage
 
-DATABASE_URL = get_database_url()
+DATABASE_URL = storage.database_url()
 print(f"Using database: {DATABASE_URL}")
 
-engine = create_engine(
-    DATABASE_URL, 
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {},
-    echo=False  # Set to True for SQL debugging
-)
+# Writes go through ``engine`` (a single serialized connection on SQLite);
+# read-only endpoints use ``read_engine``'s pool, which never waits for it.
+# A session that waited ``SQLITE_WRITER_WAIT`` seconds for the writer raises
+# ``PoolTimeout``; the API answers 503 (routers re-raise it past their handlers).
+engine, read_engine = storage.create_engines(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+# ``async def`` read endpoints; a thread-pool stand-in when no async driver applies
+async_read_engine = storage.create_async_engine(DATABASE_URL)
+AsyncReadSessionLocal = storage.async_sessionmaker(async_read_engine, ReadSessionLocal, storage.read_slots(DATABASE_URL))
 Base = declarative_base()
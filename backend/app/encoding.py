@@ -0,0 +1,168 @@
+"""Response encodings for columnar results, picked from the ``Accept`` header.
+
+- ``application/json`` (default): ``{"rows": n, "columns": {name: [...]}}``
+- ``application/vnd.apache.arrow.stream``: Arrow IPC stream (needs pyarrow)
+- ``application/x-npz``: NumPy ``.npz`` archive, one array per column, with
+  measurements as float32 and ``float_id`` as a unicode array
+- ``application/msgpack``: the JSON document as MessagePack (needs msgpack)
+
+The binary formats skip per-value Python objects entirely, so clients that
+load results into NumPy or pandas get the arrays back as-is.  JSON is written
+by orjson when it is installed, which serializes numeric arrays directly.
+"""
+import io
+import json
+import math
+
+import numpy as np
+from fastapi import HTTPException
+from fastapi.responses import Response
+
+JSON = "application/json"
+ARROW = "application/vnd.apache.arrow.stream"
+NPZ = "application/x-npz"
+MSGPACK = "application/msgpack"
+
+MEDIA_TYPES = (JSON, ARROW, NPZ, MSGPACK)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def negotiate(accept: str = None):
+    """Best supported media type for an ``Accept`` header, or None if nothing matches"""
+    if not accept:
+        return JSON
+    ranges = []
+    for position, part in enumerate(accept.split(",")):
+        media, *params = (p.strip() for p in part.split(";"))
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if media and q > 0:
+            ranges.append((-q, position, media.lower()))
+    for _, _, media in sorted(ranges):
+        if media in MEDIA_TYPES:
+            return media
+        if media in ("*/*", "application/*"):
+            return JSON
+    return None
+
+
+def media_type(accept: str = None) -> str:
+    """``negotiate`` for endpoints: 406 when no supported type is acceptable"""
+    chosen = negotiate(accept)
+    if chosen is None:
+        raise HTTPException(status_code=406, detail=f"Supported media types: {', '.join(MEDIA_TYPES)}")
+    return chosen
+
+
+def json_columns(columns: dict) -> dict:
+    """Columns as lists; float32 values keep their shortest decimal form (0.2, not 0.2000000029)"""
+    out = {}
+    for name, values in columns.items():
+        values = np.asarray(values)
+        if values.dtype == np.float32:
+            values = values.astype(str).astype(np.float64)
+        if values.dtype.kind == "f":
+            # NaN is not valid JSON
+            values = np.where(np.isnan(values), None, values)
+        out[name] = values.tolist()
+    return out
+
+
+def _finite(obj):
+    """``obj`` with NumPy values as Python ones and NaN/inf as None, for the json fallback"""
+    if isinstance(obj, dict):
+        return {k: _finite(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(v) for v in obj]
+    if isinstance(obj, np.ndarray):
+        return _finite(obj.tolist())
+    if isinstance(obj, np.generic):
+        obj = obj.item()
+    if isinstance(obj, float) and not math.isfinite(obj):
+        return None
+    return obj
+
+
+def dumps(obj) -> bytes:
+    """JSON bytes of ``obj`` (orjson if installed; NaN is written as null either way)"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(_finite(obj), separators=(",", ":"), allow_nan=False).encode()
+
+
+def _json(document: dict, columns: dict) -> bytes:
+    if orjson is None:
+        return dumps({**document, "columns": json_columns(columns)})
+    # orjson writes numeric arrays (float32 in shortest form, NaN as null) without lists
+    out = {}
+    for name, values in columns.items():
+        values = np.asarray(values)
+        out[name] = np.ascontiguousarray(values) if values.dtype.kind in "fiub" else values.tolist()
+    return dumps({**document, "columns": out})
+
+
+def msgpack_from_json(body: bytes) -> bytes:
+    """MessagePack of a JSON document"""
+    try:
+        import msgpack
+    except ImportError as e:
+        raise RuntimeError("MessagePack responses require msgpack (pip install msgpack)") from e
+    return msgpack.packb(orjson.loads(body) if orjson is not None else json.loads(body))
+
+
+def _arrow(columns: dict) -> bytes:
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise RuntimeError("Arrow responses require pyarrow (pip install pyarrow)") from e
+    arrays = {}
+    for name, values in columns.items():
+        if values.ndim == 2:
+            # One fixed-size list per row, e.g. a profile's values on standard levels
+            arrays[name] = pa.FixedSizeListArray.from_arrays(pa.array(values.ravel()), values.shape[1])
+        else:
+            arrays[name] = pa.array(values)
+    table = pa.table(arrays)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _npz(columns: dict) -> bytes:
+    buffer = io.BytesIO()
+    arrays = {name: values.astype(str) if values.dtype == object else values for name, values in columns.items()}
+    np.savez(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def encode(columns: dict, media_type: str, **extra) -> Response:
+    """Encode ``{column: ndarray}``; ``extra`` fields go in the JSON body or as ``X-`` headers"""
+    rows = len(next(iter(columns.values()))) if columns else 0
+    if media_type in (JSON, MSGPACK):
+        body = _json({**extra, "rows": rows}, columns)
+        if media_type == JSON:
+            return Response(content=body, media_type=JSON)
+        try:
+            return Response(content=msgpack_from_json(body), media_type=MSGPACK)
+        except RuntimeError as e:
+            raise HTTPException(status_code=406, detail=str(e))
+    headers = {"X-Rows": str(rows)}
+    for key, value in extra.items():
+        if isinstance(value, (list, tuple, np.ndarray)):
+            value = ",".join(str(v) for v in np.asarray(value).tolist())
+        headers[f"X-{key.replace('_', '-').title()}"] = str(value)
+    try:
+        body = _arrow(columns) if media_type == ARROW else _npz(columns)
+    except RuntimeError as e:
+        raise HTTPException(status_code=406, detail=str(e))
+    return Response(content=body, media_type=media_type, headers=headers)
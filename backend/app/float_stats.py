@@ -0,0 +1,84 @@
+"""Per-float trajectory statistics stored in ``float_stats``.
+
+Computed with trajectory.py from the float's profile positions whenever
+ingest, sample data or a rebuild writes its profiles, so serving them is
+a primary-key lookup.  Refreshing reads only the ``profiles`` rows of
+the float (one per cycle), not its measurements.
+"""
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from . import models, trajectory
+
+
+def _positions(db: Session, float_id: str = None):
+    p = models.Profile
+    query = select(p.float_id, p.n_prof, p.latitude, p.longitude, p.juld)
+    if float_id is not None:
+        query = query.where(p.float_id == float_id)
+    return db.execute(query).all()
+
+
+def _compute(rows) -> list:
+    """``float_stats`` rows for profile rows ``(float_id, n_prof, latitude, longitude, juld)``"""
+    if not rows:
+        return []
+    float_ids, n_prof, lat, lon, juld = zip(*rows)
+    names, codes = np.unique(np.asarray(float_ids, dtype=str), return_inverse=True)
+    stats = trajectory.track_stats(
+        codes,
+        np.array([-1 if n is None else n for n in n_prof], dtype=np.int64),
+        np.asarray(lat, dtype=np.float64),
+        np.asarray(lon, dtype=np.float64),
+        np.asarray(juld, dtype=np.float64),
+    )
+    now = datetime.utcnow()
+    result = []
+    for i, code in enumerate(stats["float_code"]):
+        row = {"float_id": str(names[code]), "updated_at": now}
+        for name in trajectory.FIELDS:
+            value = stats[name][i]
+            row[name] = int(value) if name == "n_positions" else (float(value) if np.isfinite(value) else None)
+        result.append(row)
+    return result
+
+
+def refresh(db: Session, float_id: str):
+    """Recompute a float's statistics from its stored profiles"""
+    db.execute(delete(models.FloatStats).where(models.FloatStats.float_id == float_id))
+    rows = _compute(_positions(db, float_id))
+    if rows:
+        db.execute(models.FloatStats.__table__.insert(), rows)
+
+
+def rebuild(db: Session) -> int:
+    """Recompute every float's statistics in one pass; returns the number of floats"""
+    clear(db)
+    rows = _compute(_positions(db))
+    if rows:
+        db.execute(models.FloatStats.__table__.insert(), rows)
+    return len(rows)
+
+
+def clear(db: Session):
+    db.execute(delete(models.FloatStats))
+
+
+def as_dict(row: models.FloatStats) -> dict:
+    return {"float_id": row.float_id, **{name: getattr(row, name) for name in trajectory.FIELDS}}
+
+
+def load(db: Session, float_id: str):
+    """A float's statistics, or None if it has no positioned profiles"""
+    row = db.get(models.FloatStats, float_id)
+    return as_dict(row) if row is not None else None
+
+
+def load_all(db: Session, float_ids=None) -> list:
+    query = select(models.FloatStats).order_by(models.FloatStats.float_id)
+    if float_ids is not None:
+        query = query.where(models.FloatStats.float_id.in_(list(float_ids)))
+    return [as_dict(row) for row in db.execute(query).scalars()]
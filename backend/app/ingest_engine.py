@@ -0,0 +1,442 @@
+"""Columnar ingest engine for Argo profile files.
+
+A file is parsed once into NumPy column arrays (a "batch"), profile ids are
+assigned in bulk and both tables are written with executemany batches (binary
+COPY on PostgreSQL) instead of one ORM object (and one flush) per row.
+
+Argo NetCDF files go through the same path via netcdf_ingest.read_netcdf.
+Parsing is CPU bound and fans out over a process pool; SQLite allows a single
+writer, so parsed batches stream back to the calling thread which performs
+all database writes.
+"""
+import hashlib
+import io
+import os
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from . import models, columnar, climatology, interpolation, retrieval, partition_stats, float_stats, postgres
+from .netcdf_ingest import NETCDF_SUFFIXES, read_netcdf
+
+# Rows per executemany call for the measurements table
+BATCH_SIZE = 20000
+
+# Parser processes for multi-file ingest (<= 1 parses inline)
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", os.cpu_count() or 1))
+
+REQUIRED_COLUMNS = ("N_PROF", "LATITUDE", "LONGITUDE")
+MEASUREMENT_COLUMNS = {"pres": "PRES", "temp": "TEMP", "psal": "PSAL"}
+
+# Batch keys holding one value per profile; every other array is per measurement
+PROFILE_FIELDS = ("n_prof", "latitude", "longitude", "juld", "profile_hash")
+
+# COPY wire types of the columns written by ``write_batch`` on PostgreSQL
+PROFILE_COPY_TYPES = {"id": "int4", "float_id": "text", "n_prof": "int4", "latitude": "float8",
+                      "longitude": "float8", "juld": "float8"}
+MEASUREMENT_COPY_TYPES = {"profile_id": "int4", "n_levels": "int4", "pres": "float8", "temp": "float8",
+                          "psal": "float8"}
+
+# Argo JULD epoch; ``juld`` is days since this instant
+JULD_EPOCH = pd.Timestamp("1950-01-01")
+
+
+def float_id_from_filename(name: str) -> str:
+    """Best-effort float id from a file name such as ``nodc_7902246_prof.csv``"""
+    stem = os.path.splitext(name)[0]
+    return stem.split("_")[-2] if "_" in stem else stem
+
+
+def _float_column(df: pd.DataFrame, name: str) -> np.ndarray:
+    """Column as float64 with NaN (or a missing column) mapped to 0.0"""
+    if name not in df.columns:
+        return np.zeros(len(df), dtype=np.float64)
+    values = pd.to_numeric(df[name], errors="coerce").to_numpy(dtype=np.float64)
+    return np.where(np.isnan(values), 0.0, values)
+
+
+def _juld_column(df: pd.DataFrame) -> np.ndarray:
+    """JULD as days since 1950-01-01 (NaN when absent); accepts day numbers or dates"""
+    if "JULD" not in df.columns:
+        return np.full(len(df), np.nan)
+    values = pd.to_numeric(df["JULD"], errors="coerce")
+    if values.isna().all() and df["JULD"].notna().any():
+        # xarray decodes JULD, so converted CSVs hold timestamps
+        dates = pd.to_datetime(df["JULD"], errors="coerce", utc=True).dt.tz_localize(None)
+        values = (dates - JULD_EPOCH) / pd.Timedelta(days=1)
+    return values.to_numpy(dtype=np.float64)
+
+
+def batch_from_frame(df: pd.DataFrame, float_id: str) -> dict:
+    """Group a flat profile/level frame into a columnar batch.
+
+    The batch holds one entry per profile (``n_prof``, ``latitude``,
+    ``longitude``) and one entry per measurement, linked through
+    ``profile_index`` (the position of the owning profile).  Profiles are
+    ordered by ``N_PROF`` and keep the position of their first row, matching
+    ``df.groupby("N_PROF")``.
+    """
+    n_prof_col = pd.to_numeric(df["N_PROF"], errors="coerce").to_numpy(dtype=np.float64)
+    valid = ~np.isnan(n_prof_col)
+    if not valid.all():
+        df = df.loc[valid]
+        n_prof_col = n_prof_col[valid]
+
+    order = np.argsort(n_prof_col, kind="stable")
+    n_prof, first, profile_index = np.unique(n_prof_col[order], return_index=True, return_inverse=True)
+    rows = order  # measurement rows in profile order
+    lat = pd.to_numeric(df["LATITUDE"], errors="coerce").to_numpy(dtype=np.float64)
+    lon = pd.to_numeric(df["LONGITUDE"], errors="coerce").to_numpy(dtype=np.float64)
+
+    batch = {
+        "float_id": str(float_id),
+        "n_prof": n_prof.astype(np.int64),
+        "latitude": lat[rows[first]],
+        "longitude": lon[rows[first]],
+        "juld": _juld_column(df)[rows[first]],
+        "profile_index": profile_index.reshape(-1).astype(np.int64),
+        "n_levels": _float_column(df, "N_LEVELS")[rows].astype(np.int64),
+    }
+    for key, column in MEASUREMENT_COLUMNS.items():
+        batch[key] = _float_column(df, column)[rows]
+    return batch
+
+
+def parse_csv(path, name: str = None) -> dict:
+    """Read one CSV (path or file object) into a batch; returns None when required columns are missing"""
+    df = pd.read_csv(path)
+    if any(column not in df.columns for column in REQUIRED_COLUMNS):
+        return None
+    return batch_from_frame(df, float_id_from_filename(name or os.path.basename(str(path))))
+
+
+def batch_rows(batch: dict) -> int:
+    return int(batch["profile_index"].shape[0])
+
+
+def profile_bounds(batch: dict) -> np.ndarray:
+    """Row offsets of each profile: rows ``bounds[i]:bounds[i + 1]`` belong to profile ``i``"""
+    return np.searchsorted(batch["profile_index"], np.arange(batch["n_prof"].shape[0] + 1))
+
+
+def profile_hashes(batch: dict) -> list:
+    """Content hash per profile (position, date and every level), used to detect changed profiles"""
+    bounds = profile_bounds(batch)
+    levels = np.column_stack([
+        batch["n_levels"].astype(np.float64), batch["pres"], batch["temp"], batch["psal"],
+    ])
+    juld = batch.get("juld")
+    if juld is None:
+        juld = np.full(batch["n_prof"].shape[0], np.nan)
+    position = np.column_stack([batch["latitude"], batch["longitude"], juld])
+    return [
+        hashlib.blake2b(position[i].tobytes() + levels[bounds[i]:bounds[i + 1]].tobytes(), digest_size=16).hexdigest()
+        for i in range(len(bounds) - 1)
+    ]
+
+
+def subset_batch(batch: dict, keep: np.ndarray) -> dict:
+    """Batch restricted to the profiles where the boolean mask ``keep`` is set"""
+    keep = np.asarray(keep, dtype=bool)
+    remap = np.full(keep.shape[0], -1, dtype=np.int64)
+    remap[keep] = np.arange(int(keep.sum()))
+    row_keep = keep[batch["profile_index"]]
+
+    subset = {}
+    for key, value in batch.items():
+        if key == "float_id":
+            subset[key] = value
+        elif key == "profile_index":
+            subset[key] = remap[value[row_keep]]
+        elif key in PROFILE_FIELDS:
+            subset[key] = value[keep] if isinstance(value, np.ndarray) else [v for v, k in zip(value, keep) if k]
+        else:
+            subset[key] = value[row_keep]
+    return subset
+
+
+def delete_profiles(db: Session, profile_ids, chunk_size: int = 500) -> int:
+    """Delete profiles and their measurements by id"""
+    profile_ids = list(profile_ids)
+    for lo in range(0, len(profile_ids), chunk_size):
+        chunk = profile_ids[lo:lo + chunk_size]
+        db.execute(delete(models.Measurement).where(models.Measurement.profile_id.in_(chunk)))
+        db.execute(delete(models.Profile).where(models.Profile.id.in_(chunk)))
+    return len(profile_ids)
+
+
+def _executemany(db: Session, table, columns: dict, total: int, chunk_size: int):
+    """Insert column arrays in chunks.
+
+    Positional drivers (sqlite3) get plain tuples through the DBAPI
+    ``executemany``, which skips building a dict per row; other drivers go
+    through Core ``insert()`` with parameter dicts.
+    """
+    names = list(columns)
+    conn = db.connection()
+    stmt = table.insert()
+    if conn.dialect.positional:
+        compiled = stmt.compile(dialect=conn.dialect, column_keys=names)
+        order = [columns[name] for name in compiled.positiontup]
+        for lo in range(0, total, chunk_size):
+            hi = min(lo + chunk_size, total)
+            rows = list(zip(*(column[lo:hi].tolist() for column in order)))
+            conn.exec_driver_sql(str(compiled), rows)
+        return
+    for lo in range(0, total, chunk_size):
+        hi = min(lo + chunk_size, total)
+        chunk = zip(*(columns[name][lo:hi].tolist() for name in names))
+        conn.execute(stmt, [dict(zip(names, values)) for values in chunk])
+
+
+def write_batch(db: Session, batch: dict, chunk_size: int = BATCH_SIZE) -> tuple:
+    """Insert a batch and return ``(profiles_written, rows_written)``.
+
+    Profile ids are reserved in one step (``max(id) + 1 ...``, or the id
+    sequence on PostgreSQL) so measurements can reference them without a
+    flush per profile.  PostgreSQL streams both tables through binary COPY.
+    Callers own the transaction; nothing is committed here.
+    """
+    n_profiles = int(batch["n_prof"].shape[0])
+    if n_profiles == 0:
+        return 0, 0
+
+    use_copy = db.get_bind().dialect.name == "postgresql"
+    if use_copy:
+        profile_ids = postgres.reserve_ids(db, models.Profile.__tablename__, n_profiles)
+    else:
+        start = db.execute(select(func.coalesce(func.max(models.Profile.id), 0))).scalar_one() + 1
+        profile_ids = np.arange(start, start + n_profiles, dtype=np.int64)
+
+    float_id = batch["float_id"]
+    juld = batch.get("juld")
+    if juld is None:
+        juld = np.full(n_profiles, np.nan)
+    columns = {
+        "profile_id": profile_ids[batch["profile_index"]],
+        "n_levels": batch["n_levels"],
+        "pres": batch["pres"],
+        "temp": batch["temp"],
+        "psal": batch["psal"],
+    }
+    total = batch_rows(batch)
+
+    if use_copy:
+        profiles = {
+            "id": profile_ids,
+            "float_id": [float_id] * n_profiles,
+            "n_prof": batch["n_prof"],
+            "latitude": batch["latitude"],
+            "longitude": batch["longitude"],
+            "juld": juld,
+        }
+        postgres.copy_rows(db, models.Profile.__tablename__, profiles, PROFILE_COPY_TYPES, n_profiles)
+        postgres.copy_rows(db, models.Measurement.__tablename__, columns, MEASUREMENT_COPY_TYPES, total)
+        return n_profiles, total
+
+    profile_rows = [
+        {"id": pid, "float_id": float_id, "n_prof": n, "latitude": lat, "longitude": lon, "juld": d}
+        for pid, n, lat, lon, d in zip(
+            profile_ids.tolist(),
+            batch["n_prof"].tolist(),
+            batch["latitude"].tolist(),
+            batch["longitude"].tolist(),
+            [None if np.isnan(d) else d for d in juld.tolist()],
+        )
+    ]
+    db.execute(models.Profile.__table__.insert(), profile_rows)
+    _executemany(db, models.Measurement.__table__, columns, total, chunk_size)
+
+    return n_profiles, total
+
+
+def read_batch(db: Session, float_id: str) -> dict:
+    """A float's stored profiles and measurements as a batch (the inverse of ``write_batch``)"""
+    p, m = models.Profile, models.Measurement
+    rows = db.execute(
+        select(p.n_prof, p.latitude, p.longitude, p.juld, m.n_levels, m.pres, m.temp, m.psal)
+        .join(m, m.profile_id == p.id)
+        .where(p.float_id == float_id)
+        .order_by(p.n_prof, m.pres)
+    ).all()
+    if not rows:
+        return None
+    n_prof = np.array([-1 if r[0] is None else r[0] for r in rows], dtype=np.int64)
+    lat, lon, juld, n_levels, pres, temp, psal = (np.asarray(col, dtype=np.float64) for col in list(zip(*rows))[1:])
+    profiles, first, index = np.unique(n_prof, return_index=True, return_inverse=True)
+    return {
+        "float_id": float_id,
+        "n_prof": profiles,
+        "latitude": lat[first],
+        "longitude": lon[first],
+        "juld": juld[first],
+        "profile_index": index.reshape(-1).astype(np.int64),
+        "n_levels": np.nan_to_num(n_levels).astype(np.int64),
+        "pres": pres,
+        "temp": temp,
+        "psal": psal,
+    }
+
+
+def _sha256(path, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def parse_file(path) -> dict:
+    """Process-pool entry point: parse one CSV or NetCDF file and report the outcome as a dict.
+
+    CSVs are read once for both their fingerprint (size, mtime, sha256) and
+    the parse; NetCDF files are hashed in a streaming pass and then sliced
+    lazily.  Per-profile hashes are computed here so the writer only compares
+    strings.  Exceptions are flattened to strings so results always pickle
+    cleanly.
+    """
+    name = os.path.basename(str(path))
+    result = {"file": name, "path": str(path), "status": "ok", "error": None, "batch": None, "fingerprint": None}
+    try:
+        stat = os.stat(path)
+        if os.path.splitext(name)[1].lower() in NETCDF_SUFFIXES:
+            content_hash = _sha256(path)
+            batch = read_netcdf(path, float_id_from_filename(name))
+        else:
+            with open(path, "rb") as fh:
+                data = fh.read()
+            content_hash = hashlib.sha256(data).hexdigest()
+            batch = parse_csv(io.BytesIO(data), name=name)
+        result["fingerprint"] = {"size": stat.st_size, "mtime": stat.st_mtime, "content_hash": content_hash}
+    except Exception as e:
+        return dict(result, status="error", error=str(e))
+    if batch is None:
+        return dict(result, status="skipped", error="missing required columns")
+    batch["profile_hash"] = profile_hashes(batch)
+    return dict(result, batch=batch)
+
+
+def _parsed(paths, workers: int):
+    """Yield parse results as they complete, keeping at most ``2 * workers`` in flight"""
+    if workers <= 1 or len(paths) <= 1:
+        for path in paths:
+            yield parse_file(path)
+        return
+
+    pending_paths = iter(paths)
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        in_flight = set()
+        for path in pending_paths:
+            in_flight.add(pool.submit(parse_file, path))
+            if len(in_flight) >= 2 * workers:
+                break
+        while in_flight:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+                next_path = next(pending_paths, None)
+                if next_path is not None:
+                    in_flight.add(pool.submit(parse_file, next_path))
+    finally:
+        # Also reached when the consumer stops early (e.g. a cancelled job)
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+@contextmanager
+def file_savepoint(db: Session):
+    """``db.begin_nested()`` for one file; side effects it queued (Parquet, search index) are dropped if it rolls back"""
+    marks = {key: len(db.info.get(key, ())) for key in (columnar.PENDING, retrieval.PENDING)}
+    try:
+        with db.begin_nested():
+            yield
+    except Exception:
+        for key, mark in marks.items():
+            del db.info.get(key, [])[mark:]
+        raise
+
+
+def after_commit(db: Session):
+    """Apply the side effects queued by committed files (call right after ``db.commit()``)"""
+    columnar.flush(db)
+    retrieval.apply(db)
+
+
+def after_rollback(db: Session):
+    """Drop the side effects queued by files whose writes were rolled back"""
+    columnar.discard(db)
+    retrieval.discard(db)
+
+
+def ingest_files(paths, db: Session, workers: int = None, progress=None, incremental: bool = True,
+                 force: bool = False) -> list:
+    """Parse ``paths`` in parallel and write every batch through ``db``.
+
+    Returns one result dict per file (``file``, ``status``, ``profiles``,
+    ``rows``, ``error``) in completion order.  ``progress`` is called with each
+    result as soon as its file is written; an exception raised from it stops
+    the ingest (pending parses are cancelled).  Each file is written inside its own
+    savepoint; committing is left to the caller, who then calls ``after_commit``
+    (or ``after_rollback``).
+
+    With ``incremental`` the ingest manifest is consulted: files whose size
+    and mtime (or content hash) are unchanged are reported as ``unchanged``
+    without being written, and only new or changed profiles of other files are
+    upserted on ``(float_id, n_prof)``.  ``force`` rewrites every profile.
+    """
+    # Imported here: manifest builds on the batch helpers in this module
+    from . import manifest
+
+    paths = list(paths)
+    results = []
+
+    def report(result):
+        if result["status"] not in ("ok", "unchanged"):
+            print(f"{result['status'].capitalize()} {result['file']}: {result['error']}")
+        results.append(result)
+        if progress is not None:
+            progress(result)
+
+    to_parse = paths
+    if incremental and not force:
+        known = manifest.stat_index(db)
+        to_parse = []
+        for path in paths:
+            if manifest.stat_unchanged(known, path):
+                report({"file": os.path.basename(str(path)), "status": "unchanged", "error": None, "profiles": 0, "rows": 0})
+            else:
+                to_parse.append(path)
+
+    workers = INGEST_WORKERS if workers is None else workers
+    workers = max(1, min(workers, len(to_parse)))
+
+    for parsed in _parsed(to_parse, workers):
+        batch = parsed.pop("batch")
+        path = parsed.pop("path")
+        fingerprint = parsed.pop("fingerprint")
+        result = dict(parsed, profiles=0, rows=0)
+        if batch is not None:
+            try:
+                with file_savepoint(db):
+                    if incremental:
+                        written = manifest.apply(db, path, fingerprint, batch, force=force)
+                        if written is None:
+                            result["status"] = "unchanged"
+                        else:
+                            result["profiles"], result["rows"] = written
+                    else:
+                        result["profiles"], result["rows"] = write_batch(db, batch)
+                        columnar.upsert(db, batch)
+                        climatology.add_batch(db, batch)
+                        interpolation.upsert(db, batch)
+                        partition_stats.upsert(db, batch)
+                        float_stats.refresh(db, batch["float_id"])
+                        retrieval.upsert(db, batch)
+            except Exception as e:
+                result.update(status="error", error=str(e))
+        report(result)
+    return results
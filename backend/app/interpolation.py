@@ -0,0 +1,170 @@
+"""Vertical interpolation of profiles onto standard pressure levels.
+
+Argo profiles sample irregular pressures, so comparing or averaging them
+level by level needs a common grid.  Every profile of a float is linearly
+interpolated onto ``STANDARD_LEVELS`` (no extrapolation: levels outside a
+profile's sampled range are NaN) and stored as one dense
+``profiles x levels`` float32 array per variable in ``float_grids``.
+Sections, level means and T-S diagrams then become array slices.
+
+All profiles of a batch are interpolated at once: samples are keyed by
+``profile * span + pressure`` so a single ``searchsorted`` brackets every
+target level of every profile.
+
+``STANDARD_LEVELS`` is read from the environment as ``start:stop:step``
+or a comma-separated list (default ``0:2000:10``).  Grids stored with a
+different level set are recomputed when read.
+"""
+import os
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from . import models, ingest_engine
+
+VARIABLES = ("temp", "psal")
+
+
+def parse_levels(value: str = None) -> np.ndarray:
+    if not value:
+        return np.arange(0.0, 2000.0 + 5.0, 10.0)
+    if ":" in value:
+        start, stop, step = (float(v) for v in value.split(":"))
+        return np.arange(start, stop + step / 2, step)
+    return np.array(sorted(float(v) for v in value.split(",") if v.strip()))
+
+
+STANDARD_LEVELS = parse_levels(os.getenv("STANDARD_LEVELS"))
+
+
+def interpolate(profile_index, pres, values, n_profiles: int, levels=None) -> np.ndarray:
+    """Interpolate every profile's ``values`` onto ``levels``; returns ``(n_profiles, len(levels))`` float32"""
+    levels = STANDARD_LEVELS if levels is None else np.asarray(levels, dtype=np.float64)
+    out = np.full((n_profiles, levels.shape[0]), np.nan, dtype=np.float32)
+    profile_index = np.asarray(profile_index, dtype=np.int64)
+    pres = np.asarray(pres, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    ok = np.isfinite(pres) & np.isfinite(values)
+    if n_profiles == 0 or not ok.any() or levels.shape[0] == 0:
+        return out
+
+    order = np.lexsort((pres[ok], profile_index[ok]))
+    prof, pres, values = profile_index[ok][order], pres[ok][order], values[ok][order]
+    low = min(pres.min(), levels[0])
+    span = max(pres.max(), levels[-1]) - low + 1.0
+    keys = prof * span + (pres - low)
+
+    target_prof = np.repeat(np.arange(n_profiles), levels.shape[0])
+    target_pres = np.tile(levels, n_profiles)
+    above = np.searchsorted(keys, target_prof * span + (target_pres - low), side="left")
+    j = np.minimum(above, keys.shape[0] - 1)  # first sample at or deeper than the target
+    i = np.maximum(j - 1, 0)  # its shallower neighbour
+    same = (above < keys.shape[0]) & (prof[j] == target_prof)
+    exact = same & (pres[j] == target_pres)
+    bracketed = same & (above > 0) & (prof[i] == target_prof)
+
+    gap = pres[j] - pres[i]
+    weight = np.where(gap > 0, (target_pres - pres[i]) / np.where(gap > 0, gap, 1.0), 0.0)
+    result = np.where(exact, values[j], np.where(bracketed, values[i] + weight * (values[j] - values[i]), np.nan))
+    return result.reshape(n_profiles, levels.shape[0]).astype(np.float32)
+
+
+def grid_from_batch(batch: dict, levels=None) -> dict:
+    """Grid arrays of a batch: per-row ``n_prof``/``latitude``/``longitude``/``juld`` plus one 2-D array per variable"""
+    levels = STANDARD_LEVELS if levels is None else levels
+    n = int(batch["n_prof"].shape[0])
+    juld = batch.get("juld")
+    grid = {
+        "levels": np.asarray(levels, dtype=np.float64),
+        "n_prof": batch["n_prof"].astype(np.int32),
+        "latitude": np.asarray(batch["latitude"], dtype=np.float64),
+        "longitude": np.asarray(batch["longitude"], dtype=np.float64),
+        "juld": np.full(n, np.nan) if juld is None else np.asarray(juld, dtype=np.float64),
+    }
+    for name in VARIABLES:
+        grid[name] = interpolate(batch["profile_index"], batch["pres"], batch[name], n, levels)
+    return grid
+
+
+def _decode(row: models.FloatGrid) -> dict:
+    levels = np.frombuffer(row.levels, dtype=np.float64)
+    grid = {
+        "levels": levels,
+        "n_prof": np.frombuffer(row.n_prof, dtype=np.int32),
+        "latitude": np.frombuffer(row.latitude, dtype=np.float64),
+        "longitude": np.frombuffer(row.longitude, dtype=np.float64),
+        "juld": np.frombuffer(row.juld, dtype=np.float64),
+    }
+    for name in VARIABLES:
+        grid[name] = np.frombuffer(getattr(row, name), dtype=np.float32).reshape(-1, levels.shape[0])
+    return grid
+
+
+def _save(db: Session, float_id: str, grid):
+    row = db.get(models.FloatGrid, float_id)
+    if grid is None or grid["n_prof"].shape[0] == 0:
+        if row is not None:
+            db.delete(row)
+        return
+    if row is None:
+        row = models.FloatGrid(float_id=float_id)
+        db.add(row)
+    for name, values in grid.items():
+        setattr(row, name, np.ascontiguousarray(values).tobytes())
+    row.updated_at = datetime.utcnow()
+
+
+def upsert(db: Session, batch: dict, drop_n_prof=()):
+    """Interpolate a batch into its float's grid, replacing ``drop_n_prof`` and the batch's profiles"""
+    float_id = batch["float_id"]
+    row = db.get(models.FloatGrid, float_id)
+    old = _decode(row) if row is not None else None
+    if old is not None and not np.array_equal(old["levels"], STANDARD_LEVELS):
+        # Built for another level set: start over from the stored measurements
+        _save(db, float_id, refresh(db, float_id, save=False))
+        return
+    new = grid_from_batch(batch)
+    if old is not None:
+        replaced = np.concatenate([np.asarray(list(drop_n_prof), dtype=np.int64), batch["n_prof"]])
+        keep = ~np.isin(old["n_prof"], replaced)
+        merged = {name: np.concatenate([old[name][keep], new[name]]) for name in new if name != "levels"}
+        order = np.argsort(merged["n_prof"], kind="stable")
+        new = dict({name: values[order] for name, values in merged.items()}, levels=new["levels"])
+    _save(db, float_id, new)
+
+
+def refresh(db: Session, float_id: str, save: bool = True):
+    """Recompute a float's grid from its stored measurements; None if it has none"""
+    batch = ingest_engine.read_batch(db, float_id)
+    grid = grid_from_batch(batch) if batch is not None else None
+    if save:
+        _save(db, float_id, grid)
+    return grid
+
+
+def load(db: Session, float_id: str):
+    """A float's grid; None if the float has no data.
+
+    Read-only: a grid that is missing or built for other levels is computed
+    from the stored measurements but not saved (ingest and ``rebuild`` do that).
+    """
+    row = db.get(models.FloatGrid, float_id)
+    grid = _decode(row) if row is not None else None
+    if grid is None or not np.array_equal(grid["levels"], STANDARD_LEVELS):
+        grid = refresh(db, float_id, save=False)
+    return grid
+
+
+def rebuild(db: Session) -> int:
+    """Recompute every float's grid; returns the number of floats"""
+    clear(db)
+    float_ids = db.execute(select(models.Profile.float_id).distinct()).scalars().all()
+    for float_id in float_ids:
+        refresh(db, float_id)
+    return len(float_ids)
+
+
+def clear(db: Session):
+    db.execute(delete(models.FloatGrid))
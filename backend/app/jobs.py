@@ -0,0 +1,153 @@
+"""Background ingest jobs.
+
+Jobs are rows in ``ingest_jobs``.  A single worker thread runs them one at a
+time (SQLite has one writer), so the HTTP request only inserts the job row and
+returns.  Every file is committed on its own, which means a cancelled or
+failed job keeps the files it finished and other writes get the writer between
+files; the cancel flag is read through the reader pool.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import select
+
+from .db import SessionLocal, ReadSessionLocal
+from . import models, retrieval, ingest_engine
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-job")
+
+FINISHED_STATES = ("completed", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def submit(folder: str, workers: Optional[int] = None, force: bool = False, source: str = "csv") -> int:
+    """Queue an ingest of ``folder`` (``source`` is ``csv`` or ``netcdf``) and return the new job id"""
+    db = SessionLocal()
+    try:
+        job = models.IngestJob(folder=folder, source=source, status="queued")
+        db.add(job)
+        db.commit()
+        job_id = job.id
+    finally:
+        db.close()
+    _executor.submit(_run, job_id, folder, workers, force, source)
+    return job_id
+
+
+def active(db) -> bool:
+    """True while a job is queued or running"""
+    return db.execute(
+        select(models.IngestJob.id).where(models.IngestJob.status.in_(("queued", "running"))).limit(1)
+    ).first() is not None
+
+
+def cancel(job_id: int) -> Optional[models.IngestJob]:
+    """Flag a job for cancellation; the worker stops after the current file"""
+    db = SessionLocal()
+    try:
+        job = db.get(models.IngestJob, job_id)
+        if job is not None and job.status not in FINISHED_STATES:
+            job.cancel_requested = True
+            db.commit()
+            db.refresh(job)
+        return job
+    finally:
+        db.close()
+
+
+def _cancel_requested(job_id: int) -> bool:
+    db = ReadSessionLocal()
+    try:
+        return bool(db.execute(
+            select(models.IngestJob.cancel_requested).where(models.IngestJob.id == job_id)
+        ).scalar())
+    finally:
+        db.close()
+
+
+def _run(job_id: int, folder: str, workers: Optional[int], force: bool, source: str):
+    # Imported here: the ingest router imports this module
+    from .routers.ingest import FILE_FINDERS, INGESTERS
+
+    db = SessionLocal()
+    job = db.get(models.IngestJob, job_id)
+    try:
+        if job.cancel_requested:
+            raise JobCancelled()
+        job.status = "running"
+        job.started_at = datetime.utcnow()
+        job.files_total = len(FILE_FINDERS[source](folder))
+        db.commit()
+
+        def progress(result):
+            # The file itself is already committed (routers.ingest.commit_file)
+            job.files_done += 1
+            job.rows_written += result["rows"]
+            db.commit()
+            if _cancel_requested(job_id):
+                raise JobCancelled()
+
+        INGESTERS[source](folder, db, workers=workers, progress=progress, force=force)
+        job.status = "completed"
+    except JobCancelled:
+        db.rollback()
+        ingest_engine.after_rollback(db)
+        job.status = "cancelled"
+    except Exception as e:
+        db.rollback()
+        ingest_engine.after_rollback(db)
+        print(f"Ingest job {job_id} failed: {e}")
+        job.status = "failed"
+        job.error = str(e)
+    finally:
+        job.finished_at = datetime.utcnow()
+        db.commit()
+        try:
+            # Files committed before a cancel or failure are indexed too
+            retrieval.flush(db)
+        finally:
+            db.close()
+
+
+def fail_interrupted_jobs():
+    """Mark jobs left queued/running by a previous process as failed"""
+    db = SessionLocal()
+    try:
+        stale = db.query(models.IngestJob).filter(models.IngestJob.status.in_(("queued", "running")))
+        for job in stale:
+            job.status = "failed"
+            job.error = "Interrupted by server restart"
+            job.finished_at = datetime.utcnow()
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Could not recover ingest jobs: {e}")
+    finally:
+        db.close()
+
+
+def job_status(job: models.IngestJob) -> dict:
+    """Job row plus derived elapsed time and throughput"""
+    elapsed = None
+    if job.started_at is not None:
+        elapsed = ((job.finished_at or datetime.utcnow()) - job.started_at).total_seconds()
+    return {
+        "id": job.id,
+        "folder": job.folder,
+        "source": job.source,
+        "status": job.status,
+        "files_total": job.files_total,
+        "files_done": job.files_done,
+        "rows_written": job.rows_written,
+        "rows_per_sec": round(job.rows_written / elapsed, 1) if elapsed else 0.0,
+        "elapsed_seconds": elapsed,
+        "cancel_requested": bool(job.cancel_requested),
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
@@ -1,11 +1,27 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pathlib import Path
-from .db import Base, engine
-from .routers import profiles, ingest, chat
+from .db import Base, engine, SessionLocal, PoolTimeout
+from .routers import profiles, ingest, chat, measurements, aggregates, floats, stats
+from . import jobs, spatial, models, cache, response_cache, compression, retrieval
 
 app = FastAPI(title="FloatChat API", version="0.1.0")
 
+# Cached until the next ingest or reset (/health: for HEALTH_MAX_AGE seconds).
+# Added before CORS so CORS wraps it and cached entries hold no per-origin headers.
+HEALTH_MAX_AGE = 5
+app.add_middleware(response_cache.ResponseCacheMiddleware, routes={
+    r"/health": HEALTH_MAX_AGE,
+    r"/profiles": None,
+    r"/profiles/trajectories": None,
+    r"/profiles/trajectories/\d+/\d+/\d+": None,
+    r"/floats/stats": None,
+})
+
+# Other responses are compressed as they are sent; cached ones are stored compressed
+app.add_middleware(compression.CompressionMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -14,21 +30,39 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Seconds clients are asked to wait when the writer stays busy
+WRITER_BUSY_RETRY_AFTER = 5
+
+
+@app.exception_handler(PoolTimeout)
+async def writer_busy(request, exc):
+    # Another write held the single writer connection for SQLITE_WRITER_WAIT seconds
+    return JSONResponse(status_code=503, content={"detail": "The database is busy with another write; retry shortly"},
+                        headers={"Retry-After": str(WRITER_BUSY_RETRY_AFTER)})
+
 # ensure tables (idempotent)
 Base.metadata.create_all(bind=engine, checkfirst=True)
+models.add_missing_columns(engine)
+spatial.ensure_spatial_index(engine)
+jobs.fail_interrupted_jobs()
+with SessionLocal() as db:
+    cache.ensure_version(db)
+# Load (or build) the chat retrieval index off the request path
+retrieval.warm()
 
 @app.get("/health")
 async def health():
-    from .db import DATABASE_URL, SessionLocal
+    from sqlalchemy import text
+    from .db import DATABASE_URL, ReadSessionLocal
     
-    # Test database connection
+    # Test database connection (reader pool: answers during an ingest)
     db_status = "ok"
     db_info = DATABASE_URL
     
     try:
-        db = SessionLocal()
+        db = ReadSessionLocal()
         # Try a simple query
-        db.execute("SELECT 1")
+        db.execute(text("SELECT 1"))
         db.close()
     except Exception as e:
         db_status = f"error: {str(e)}"
@@ -43,4 +77,8 @@ async def health():
 
 app.include_router(ingest.router)
 app.include_router(profiles.router)
+app.include_router(measurements.router)
+app.include_router(aggregates.router)
+app.include_router(floats.router)
+app.include_router(stats.router)
 app.include_router(chat.router)
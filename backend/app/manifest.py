@@ -0,0 +1,123 @@
+"""Ingest manifest: which files were ingested and what they produced.
+
+Each file is recorded with its size, mtime and content hash, plus one row per
+``(float_id, n_prof)`` profile it produced with that profile's content hash.
+Re-ingesting a folder skips unchanged files outright and upserts only the
+profiles whose content changed, so a nightly sync costs only the delta.
+"""
+import os
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from . import models, columnar, climatology, interpolation, retrieval, partition_stats, float_stats
+from .ingest_engine import delete_profiles, subset_batch, write_batch
+
+# Bound for IN (...) lists
+CHUNK_SIZE = 500
+
+
+def manifest_key(path) -> str:
+    return str(Path(path).resolve())
+
+
+def stat_index(db: Session) -> dict:
+    """``{path: (size, mtime)}`` for every file in the manifest"""
+    rows = db.execute(select(models.IngestManifest.path, models.IngestManifest.size, models.IngestManifest.mtime))
+    return {path: (size, mtime) for path, size, mtime in rows}
+
+
+def stat_unchanged(index: dict, path) -> bool:
+    """Cheap pre-parse check: same size and mtime as when last ingested"""
+    entry = index.get(manifest_key(path))
+    if entry is None:
+        return False
+    stat = os.stat(path)
+    return entry == (stat.st_size, stat.st_mtime)
+
+
+def _chunks(values):
+    values = list(values)
+    for lo in range(0, len(values), CHUNK_SIZE):
+        yield values[lo:lo + CHUNK_SIZE]
+
+
+def apply(db: Session, path, fingerprint: dict, batch: dict, force: bool = False):
+    """Upsert the changed profiles of a parsed file and update its manifest entry.
+
+    Returns ``None`` when the file content is unchanged, otherwise
+    ``(profiles_written, rows_written)``.  Profiles are replaced on
+    ``(float_id, n_prof)`` whichever file wrote them, so archives ingested
+    before the manifest existed are not duplicated either.
+    """
+    key = manifest_key(path)
+    entry = db.get(models.IngestManifest, key)
+    if entry is not None and entry.content_hash == fingerprint["content_hash"] and not force:
+        entry.size = fingerprint["size"]
+        entry.mtime = fingerprint["mtime"]
+        return None
+
+    float_id = batch["float_id"]
+    previous = dict(db.execute(
+        select(models.ManifestProfile.n_prof, models.ManifestProfile.profile_hash)
+        .where(models.ManifestProfile.path == key)
+    ).all())
+    n_profs = batch["n_prof"].tolist()
+    hashes = batch["profile_hash"]
+    changed = np.array([force or previous.get(n) != h for n, h in zip(n_profs, hashes)], dtype=bool)
+    removed = set(previous) - set(n_profs)
+    stale = [n for n, c in zip(n_profs, changed) if c] + sorted(removed)
+
+    stale_cells = set()
+    # Profiles this file replaces, as opposed to ones it adds
+    replaced = []
+    for chunk in _chunks(stale):
+        stored = db.execute(
+            select(models.Profile.id, models.Profile.n_prof)
+            .where(models.Profile.float_id == float_id, models.Profile.n_prof.in_(chunk))
+        ).all()
+        profile_ids = [profile_id for profile_id, _ in stored]
+        replaced.extend(n for _, n in stored)
+        stale_cells |= climatology.grid_cells(db, profile_ids)
+        delete_profiles(db, profile_ids)
+        db.execute(delete(models.ManifestProfile).where(
+            models.ManifestProfile.path == key, models.ManifestProfile.n_prof.in_(chunk)
+        ))
+
+    subset = subset_batch(batch, changed)
+    written = write_batch(db, subset)
+    columnar.upsert(db, subset, drop_n_prof=stale)
+    interpolation.upsert(db, subset, drop_n_prof=stale)
+    # New profiles merge into the float's sketch; only replaced ones force a re-sketch
+    partition_stats.upsert(db, subset, drop_n_prof=sorted(set(replaced)))
+    float_stats.refresh(db, float_id)
+    # Cells that lost profiles are recomputed (new rows included); the rest are merged
+    climatology.rebuild_cells(db, stale_cells)
+    climatology.add_batch(db, subset, skip_cells=stale_cells)
+
+    manifest_rows = [
+        {"path": key, "float_id": float_id, "n_prof": n, "profile_hash": h}
+        for n, h, c in zip(n_profs, hashes, changed) if c
+    ]
+    if manifest_rows:
+        db.execute(models.ManifestProfile.__table__.insert(), manifest_rows)
+
+    if entry is None:
+        entry = models.IngestManifest(path=key)
+        db.add(entry)
+    entry.size = fingerprint["size"]
+    entry.mtime = fingerprint["mtime"]
+    entry.content_hash = fingerprint["content_hash"]
+    entry.float_id = float_id
+    entry.ingested_at = datetime.utcnow()
+    retrieval.upsert(db, subset, drop_n_prof=stale)
+    return written
+
+
+def clear(db: Session):
+    """Forget every ingested file (used when the profile tables are reset)"""
+    db.execute(delete(models.ManifestProfile))
+    db.execute(delete(models.IngestManifest))
@@ -0,0 +1,105 @@
+"""Filtered measurement reads shared by the levels and measurements endpoints.
+
+Results are ``{column: ndarray}`` so they can be encoded as JSON, Arrow or
+NumPy without a per-row Python object in between.  Reads go to the Parquet
+tier when it is enabled (profile ids and dates, which only SQL holds,
+excepted) and to SQL otherwise.
+"""
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import columnar, models
+
+LEVEL_FIELDS = {
+    "float_id": models.Profile.float_id,
+    "n_prof": models.Profile.n_prof,
+    "latitude": models.Profile.latitude,
+    "longitude": models.Profile.longitude,
+    "juld": models.Profile.juld,
+    "profile_id": models.Measurement.profile_id,
+    "n_levels": models.Measurement.n_levels,
+    "pres": models.Measurement.pres,
+    "temp": models.Measurement.temp,
+    "psal": models.Measurement.psal,
+}
+
+VARIABLES = ("pres", "temp", "psal")
+
+# Columns the Parquet tier does not store
+SQL_ONLY = {"profile_id", "juld"}
+
+DTYPES = {
+    "float_id": object,
+    "n_prof": np.int32,
+    "profile_id": np.int64,
+    "n_levels": np.int32,
+    "latitude": np.float64,
+    "longitude": np.float64,
+    "juld": np.float64,
+    "pres": np.float32,
+    "temp": np.float32,
+    "psal": np.float32,
+}
+
+
+def parse_columns(columns) -> list:
+    """Validate a column list (or comma-separated string); raises ValueError"""
+    if isinstance(columns, str):
+        columns = columns.split(",")
+    selected = [c.strip() for c in columns if c and c.strip()]
+    unknown = [c for c in selected if c not in LEVEL_FIELDS]
+    if unknown or not selected:
+        raise ValueError(f"Unknown columns: {unknown}. Available: {list(LEVEL_FIELDS)}")
+    return selected
+
+
+def _as_array(values, name: str) -> np.ndarray:
+    dtype = DTYPES[name]
+    try:
+        return np.asarray(values, dtype=dtype)
+    except (TypeError, ValueError):
+        # NULLs in an integer column
+        return np.asarray(values, dtype=np.float64)
+
+
+def _query_sql(db: Session, columns, float_ids, profile_ids, n_prof, bounds, limit):
+    q = select(*(LEVEL_FIELDS[c] for c in columns)).select_from(models.Profile).join(
+        models.Measurement, models.Measurement.profile_id == models.Profile.id
+    )
+    if float_ids:
+        q = q.where(models.Profile.float_id.in_(float_ids))
+    if profile_ids:
+        q = q.where(models.Measurement.profile_id.in_(profile_ids))
+    if n_prof is not None:
+        q = q.where(models.Profile.n_prof == n_prof)
+    for name, (low, high) in bounds.items():
+        if low is not None:
+            q = q.where(LEVEL_FIELDS[name] >= low)
+        if high is not None:
+            q = q.where(LEVEL_FIELDS[name] <= high)
+    q = q.order_by(models.Profile.float_id, models.Profile.n_prof, models.Measurement.pres)
+    if limit is not None:
+        q = q.limit(limit)
+    rows = db.execute(q).all()
+    values = list(zip(*rows)) if rows else [()] * len(columns)
+    return {name: _as_array(col, name) for name, col in zip(columns, values)}
+
+
+def query_levels(db: Session, columns, float_ids=None, profile_ids=None, n_prof=None,
+                 pres_min=None, pres_max=None, lat_min=None, lat_max=None, lon_min=None, lon_max=None,
+                 limit=None):
+    """Measurement levels matching every given filter; returns ``(columns, source)``"""
+    columns = parse_columns(columns)
+    if columnar.enabled() and not profile_ids and not SQL_ONLY.intersection(columns):
+        table = columnar.read_levels(
+            columns=columns, float_ids=float_ids, n_prof=n_prof,
+            pres_min=pres_min, pres_max=pres_max, lat_min=lat_min, lat_max=lat_max,
+            lon_min=lon_min, lon_max=lon_max,
+        )
+        if limit is not None:
+            table = table.slice(0, limit)
+        return {name: _as_array(table[name].to_numpy(), name) for name in columns}, "parquet"
+
+    bounds = {"pres": (pres_min, pres_max), "latitude": (lat_min, lat_max), "longitude": (lon_min, lon_max)}
+    return _query_sql(db, columns, float_ids, profile_ids, n_prof, bounds, limit), "sql"
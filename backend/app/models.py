@@ -1,6 +1,8 @@
-from sqlalchemy import Column, Integer, Float, String, ForeignKey
+from datetime import datetime
+from sqlalchemy import Column, Integer, BigInteger, Float, String, ForeignKey, Boolean, DateTime, Index, LargeBinary, event, inspect
 from sqlalchemy.orm import relationship
 from .db import Base
+from . import postgres
 
 class Profile(Base):
     __tablename__ = "profiles"
@@ -9,11 +11,15 @@ class Profile(Base):
     n_prof = Column(Integer, index=True)
     latitude = Column(Float, index=True)
     longitude = Column(Float, index=True)
+    juld = Column(Float, nullable=True)  # days since 1950-01-01 UTC (Argo JULD)
     measurements = relationship("Measurement", back_populates="profile", cascade="all, delete-orphan")
 
+    # upsert key for incremental ingest
+    __table_args__ = (Index("ix_profiles_float_id_n_prof", "float_id", "n_prof"),)
+
 class Measurement(Base):
     __tablename__ = "measurements"
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer().with_variant(BigInteger, "postgresql"), primary_key=True, index=True)
     profile_id = Column(Integer, ForeignKey("profiles.id"), index=True)
     n_levels = Column(Integer)
     pres = Column(Float)
@@ -21,3 +27,119 @@ class Measurement(Base):
     psal = Column(Float)
 
     profile = relationship("Profile", back_populates="measurements")
+
+    # PostgreSQL: hash partitions on profile_id (see postgres.py); ignored elsewhere
+    __table_args__ = {"postgresql_partition_by": "HASH (profile_id)", "info": {"partition_columns": ("profile_id",)}}
+
+event.listen(Measurement.__table__, "after_create", postgres.create_partitions)
+
+class IngestJob(Base):
+    __tablename__ = "ingest_jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    folder = Column(String)
+    source = Column(String, default="csv")  # csv or netcdf
+    status = Column(String, index=True)  # queued, running, completed, failed, cancelled
+    files_total = Column(Integer, default=0)
+    files_done = Column(Integer, default=0)
+    rows_written = Column(Integer, default=0)
+    cancel_requested = Column(Boolean, default=False)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+class IngestManifest(Base):
+    __tablename__ = "ingest_manifest"
+    path = Column(String, primary_key=True)
+    size = Column(Integer)
+    mtime = Column(Float)
+    content_hash = Column(String)
+    float_id = Column(String, index=True)
+    ingested_at = Column(DateTime, default=datetime.utcnow)
+
+class ManifestProfile(Base):
+    __tablename__ = "ingest_manifest_profiles"
+    id = Column(Integer, primary_key=True)
+    path = Column(String, ForeignKey("ingest_manifest.path"), index=True)
+    float_id = Column(String)
+    n_prof = Column(Integer)
+    profile_hash = Column(String)
+
+class ClimatologyCell(Base):
+    """Running TEMP/PSAL statistics per (grid cell, pressure bin, month); see climatology.py"""
+    __tablename__ = "climatology"
+    lat_bin = Column(Integer, primary_key=True)
+    lon_bin = Column(Integer, primary_key=True)
+    pres_bin = Column(Integer, primary_key=True)
+    month = Column(Integer, primary_key=True)  # 1-12, 0 when the profile has no date
+    temp_count = Column(Integer, default=0)
+    temp_sum = Column(Float, default=0.0)
+    temp_sumsq = Column(Float, default=0.0)
+    temp_min = Column(Float, nullable=True)
+    temp_max = Column(Float, nullable=True)
+    psal_count = Column(Integer, default=0)
+    psal_sum = Column(Float, default=0.0)
+    psal_sumsq = Column(Float, default=0.0)
+    psal_min = Column(Float, nullable=True)
+    psal_max = Column(Float, nullable=True)
+
+class FloatGrid(Base):
+    """A float's profiles interpolated onto standard pressure levels; see interpolation.py"""
+    __tablename__ = "float_grids"
+    float_id = Column(String, primary_key=True)
+    levels = Column(LargeBinary)  # float64 standard pressures (dbar)
+    n_prof = Column(LargeBinary)  # int32, one per grid row
+    latitude = Column(LargeBinary)  # float64 per row
+    longitude = Column(LargeBinary)  # float64 per row
+    juld = Column(LargeBinary)  # float64 per row, NaN when undated
+    temp = Column(LargeBinary)  # float32 (rows x levels), NaN outside the sampled range
+    psal = Column(LargeBinary)  # float32 (rows x levels)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class FloatStats(Base):
+    """A float's trajectory statistics (haversine along-track distance, drift speed, duration); see float_stats.py"""
+    __tablename__ = "float_stats"
+    float_id = Column(String, primary_key=True)
+    n_positions = Column(Integer)
+    first_juld = Column(Float, nullable=True)  # days since 1950-01-01 UTC
+    last_juld = Column(Float, nullable=True)
+    duration_days = Column(Float, nullable=True)
+    distance_km = Column(Float)  # sum of great-circle legs between consecutive profiles
+    displacement_km = Column(Float)  # great-circle distance first -> last position
+    speed_km_per_day = Column(Float, nullable=True)
+    max_leg_km = Column(Float)
+    start_latitude = Column(Float)
+    start_longitude = Column(Float)
+    end_latitude = Column(Float)
+    end_longitude = Column(Float)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class FloatSketch(Base):
+    """A float's statistics sketch per (month, depth band) partition; see partition_stats.py"""
+    __tablename__ = "float_sketches"
+    float_id = Column(String, primary_key=True)
+    data = Column(LargeBinary)  # .npz of the sketch arrays (sketches.to_bytes)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class DataVersion(Base):
+    """Single row naming the current state of the data; replaced on every write (see cache.bump_version)"""
+    __tablename__ = "data_version"
+    id = Column(Integer, primary_key=True)
+    token = Column(String)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+def add_missing_columns(engine):
+    """Add nullable columns introduced after a table was created (``create_all`` never alters tables)"""
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        missing = [c for c in table.columns if c.name not in existing and c.nullable and not c.primary_key]
+        if not missing:
+            continue
+        with engine.begin() as conn:
+            for column in missing:
+                conn.exec_driver_sql(
+                    f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"
+                )
@@ -0,0 +1,81 @@
+"""Direct Argo NetCDF reader.
+
+Reads ``PRES/TEMP/PSAL/LATITUDE/LONGITUDE`` (and ``JULD`` when present) straight from ``*_prof.nc`` files
+into the same columnar batch the CSV parser produces, replacing the
+changecsv.py -> cleancsv.py -> CSV ingest round-trip.  Variables are sliced
+lazily ``CHUNK_PROFILES`` profiles at a time, and levels with any missing
+value are dropped with a vectorized mask (the ``dropna()`` of cleancsv.py).
+"""
+import numpy as np
+
+NETCDF_SUFFIXES = (".nc",)
+LEVEL_VARIABLES = ("PRES", "TEMP", "PSAL")
+POSITION_VARIABLES = ("LATITUDE", "LONGITUDE")
+
+# Profiles read per slice; bounds peak memory on large multi-profile files
+CHUNK_PROFILES = 256
+
+
+def _netcdf4():
+    try:
+        import netCDF4
+    except ImportError as e:
+        raise RuntimeError("NetCDF ingest requires the netCDF4 package (pip install netCDF4)") from e
+    return netCDF4
+
+
+def _read(variable, rows: slice) -> np.ndarray:
+    """Slice a variable as float64 with fill values as NaN"""
+    values = variable[rows]
+    return np.ma.filled(np.ma.asarray(values, dtype=np.float64), np.nan)
+
+
+def read_netcdf(path, float_id: str, chunk_profiles: int = CHUNK_PROFILES) -> dict:
+    """Read one Argo profile file into a batch; returns None when variables are missing.
+
+    ``n_prof`` is the ``N_PROF`` index and ``n_levels`` the ``N_LEVELS``
+    index, matching the columns ``xr.Dataset.to_dataframe()`` wrote to CSV.
+    """
+    netCDF4 = _netcdf4()
+    with netCDF4.Dataset(str(path)) as ds:
+        if any(name not in ds.variables for name in LEVEL_VARIABLES + POSITION_VARIABLES):
+            return None
+        total = len(ds.dimensions["N_PROF"])
+
+        prof_parts, level_parts = [], []
+        columns = {name: [] for name in LEVEL_VARIABLES}
+        latitude = np.empty(total, dtype=np.float64)
+        longitude = np.empty(total, dtype=np.float64)
+        juld = np.full(total, np.nan)
+        for lo in range(0, total, chunk_profiles):
+            rows = slice(lo, min(lo + chunk_profiles, total))
+            lat = _read(ds["LATITUDE"], rows)
+            lon = _read(ds["LONGITUDE"], rows)
+            latitude[rows], longitude[rows] = lat, lon
+            if "JULD" in ds.variables:
+                juld[rows] = _read(ds["JULD"], rows)
+            levels = {name: _read(ds[name], rows) for name in LEVEL_VARIABLES}
+
+            valid = ~(np.isnan(lat) | np.isnan(lon))[:, None]
+            for values in levels.values():
+                valid = valid & ~np.isnan(values)
+            prof, level = np.nonzero(valid)  # row-major: by profile, then level
+            prof_parts.append(prof + lo)
+            level_parts.append(level)
+            for name, values in levels.items():
+                columns[name].append(values[valid])
+
+    prof = np.concatenate(prof_parts) if prof_parts else np.empty(0, dtype=np.int64)
+    n_prof, profile_index = np.unique(prof, return_inverse=True)
+    batch = {
+        "float_id": str(float_id),
+        "n_prof": n_prof.astype(np.int64),
+        "latitude": latitude[n_prof],
+        "longitude": longitude[n_prof],
+        "juld": juld[n_prof],
+        "profile_index": profile_index.reshape(-1).astype(np.int64),
+        "n_levels": (np.concatenate(level_parts) if level_parts else np.empty(0)).astype(np.int64),
+    }
+    for name in LEVEL_VARIABLES:
+        batch[name.lower()] = np.concatenate(columns[name]) if columns[name] else np.empty(0)
+    return batch
@@ -0,0 +1,129 @@
+"""Precomputed statistics per float × month × depth band.
+
+Each float's measurements are summarized into one mergeable sketch (see
+sketches.py) with a partition per (month, depth band), stored in
+``float_sketches``.  Ingest keeps them current: new profiles are merged
+into the stored sketch, and a float whose profiles were replaced is
+re-sketched from its measurements.  Queries merge the partitions matching
+the float/month/depth filters, so their cost depends on the number of
+partitions, not measurements.
+
+Answers are exact for whole partitions: a pressure range covers every band
+it touches (``DEPTH_BANDS``) and a date range every month it touches.
+Distinct profile counts are HyperLogLog estimates.
+"""
+import zlib
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from . import models, ingest_engine, sketches, cache
+
+VARIABLES = ("temp", "psal")
+
+# Lower edges (dbar) of the depth bands; the last band is open-ended
+DEPTH_BANDS = np.array([0.0, 50.0, 100.0, 200.0, 300.0, 500.0, 700.0, 1000.0, 1500.0, 2000.0])
+
+
+def profile_ids(float_id: str, n_prof) -> np.ndarray:
+    """Integer identity of (float, profile) for distinct counts across floats"""
+    return (np.int64(zlib.crc32(float_id.encode())) << 32) | np.asarray(n_prof, dtype=np.int64)
+
+
+def sketch_batch(batch: dict) -> dict:
+    """Sketch of a columnar batch keyed by month and depth band"""
+    profile = np.asarray(batch["profile_index"], dtype=np.int64)
+    return sketches.build(
+        {
+            "month": sketches.month_key(juld=np.asarray(batch["juld"], dtype=np.float64)[profile]),
+            "band": sketches.depth_band(batch["pres"], DEPTH_BANDS),
+        },
+        {name: batch[name] for name in VARIABLES},
+        distinct={"profiles": profile_ids(batch["float_id"], np.asarray(batch["n_prof"])[profile])},
+    )
+
+
+def _save(db: Session, float_id: str, sketch):
+    row = db.get(models.FloatSketch, float_id)
+    if sketch is None or sketches.size(sketch) == 0:
+        if row is not None:
+            db.delete(row)
+        return
+    if row is None:
+        row = models.FloatSketch(float_id=float_id)
+        db.add(row)
+    row.data = sketches.to_bytes(sketch)
+    row.updated_at = datetime.utcnow()
+
+
+def upsert(db: Session, batch: dict, drop_n_prof=()):
+    """Merge a batch into its float's sketch; re-sketch the float when profiles were replaced"""
+    float_id = batch["float_id"]
+    row = db.get(models.FloatSketch, float_id)
+    if len(drop_n_prof) or row is None:
+        # Sketches cannot subtract rows: rebuild from the stored measurements
+        refresh(db, float_id)
+        return
+    _save(db, float_id, sketches.combine(sketches.concat([sketches.from_bytes(row.data), sketch_batch(batch)])))
+
+
+def refresh(db: Session, float_id: str):
+    """Recompute a float's sketch from its stored measurements"""
+    batch = ingest_engine.read_batch(db, float_id)
+    _save(db, float_id, sketch_batch(batch) if batch is not None else None)
+
+
+def rebuild(db: Session) -> int:
+    """Recompute every float's sketch; returns the number of floats"""
+    clear(db)
+    float_ids = db.execute(select(models.Profile.float_id).distinct()).scalars().all()
+    for float_id in float_ids:
+        refresh(db, float_id)
+    return len(float_ids)
+
+
+def clear(db: Session):
+    db.execute(delete(models.FloatSketch))
+
+
+def _load_all(db: Session):
+    float_ids, parts = [], []
+    for float_id, data in db.execute(select(models.FloatSketch.float_id, models.FloatSketch.data)).all():
+        sketch = sketches.from_bytes(data)
+        sketch["key_float"] = np.full(sketches.size(sketch), len(float_ids), dtype=np.int64)
+        float_ids.append(float_id)
+        parts.append(sketch)
+    if not parts:
+        empty = sketches.build({"month": [], "band": []}, {name: [] for name in VARIABLES}, distinct={"profiles": []})
+        parts.append(dict(empty, key_float=np.empty(0, dtype=np.int64)))
+    return float_ids, sketches.concat(parts)
+
+
+def load_all(db: Session):
+    """``(float_ids, sketch)``: every float's partitions with a ``float`` key indexing ``float_ids``"""
+    return cache.cached("partition_stats", lambda: _load_all(db))
+
+
+def summary(db: Session, float_ids=None, start=None, end=None, pres_min=None, pres_max=None) -> dict:
+    """Merged statistics of the partitions matching the filters (None means no restriction)"""
+    all_floats, sketch = load_all(db)
+    codes = None
+    if float_ids is not None:
+        lookup = {f: i for i, f in enumerate(all_floats)}
+        codes = [lookup[f] for f in float_ids if f in lookup]
+    months = None
+    if start is not None or end is not None:
+        months = (None if start is None else sketches.month_of(start), None if end is None else sketches.month_of(end))
+    bands = None
+    if pres_min is not None or pres_max is not None:
+        bands = sketches.bands_overlapping(DEPTH_BANDS, pres_min, pres_max)
+    mask = sketches.select(sketch, float=codes, month=months, band=bands)
+    result = sketches.summarize(sketch, mask)
+    result["floats"] = int(np.unique(sketch["key_float"][mask]).shape[0])
+    if bands is not None:
+        # The pressures actually covered: whole bands
+        first, last = bands
+        result["pressure_range"] = [float(DEPTH_BANDS[first]), float(DEPTH_BANDS[last + 1]) if last + 1 < len(DEPTH_BANDS) else None]
+    return result
@@ -0,0 +1,508 @@
+"""Offline text-to-SQL for the chat endpoint.
+
+A question is normalized into a template (lower case, punctuation dropped,
+numbers replaced by numbered slots such as ``#0``, with a ``lat``/``lon``
+marker for hemisphere suffixes) and compiled by the rule grammar below into
+a parameterized SQL plan over ``profiles`` and ``measurements``.  Plans are
+cached by template, so "average temperature below 500 m" and "... below
+1000 m" share one compiled plan and only the bound values differ.
+
+Every SQL fragment comes from these rules; text from the question only
+reaches the database as bound parameters.
+"""
+import functools
+import re
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+PLAN_CACHE_SIZE = 1024
+
+# Rows returned with grouped answers
+MAX_ROWS = 50
+# Rows sent in the first ``rows`` event of a streamed answer
+FIRST_ROWS = 10
+
+JULD_EPOCH = date(1950, 1, 1)
+
+VARIABLES = {"temp": ("temperature", "°C"), "psal": ("salinity", "PSU"), "pres": ("pressure", "dbar")}
+
+VARIABLE_WORDS = (
+    ("temp", r"temperatures?|temps?|warm(?:er|est)?|hot(?:ter|test)?|cold(?:er|est)?"),
+    ("psal", r"salinity|salinities|salt(?:y|ier|iest)?|saline|psal|fresh(?:er|est)?"),
+    ("pres", r"pressures?|depths?|deep(?:er|est)?|shallow(?:er|est)?"),
+)
+
+AGGREGATE_WORDS = (
+    ("avg", r"average|mean|avg|typical"),
+    ("max", r"max(?:imum)?|highest|warmest|hottest|saltiest|deepest|most saline"),
+    ("min", r"min(?:imum)?|lowest|coldest|freshest|shallowest|least saline"),
+)
+
+# (lat_min, lat_max, lon_min, lon_max) boxes; two boxes where a basin crosses the antimeridian
+REGIONS = {
+    "arabian sea": [(5, 25, 50, 78)],
+    "bay of bengal": [(5, 23, 78, 100)],
+    "equatorial indian ocean": [(-5, 5, 40, 100)],
+    "indian ocean": [(-60, 30, 20, 147)],
+    "north atlantic": [(0, 70, -80, 0)],
+    "south atlantic": [(-60, 0, -70, 20)],
+    "north pacific": [(0, 66, 120, 180), (0, 66, -180, -100)],
+    "south pacific": [(-60, 0, 147, 180), (-60, 0, -180, -70)],
+    "southern ocean": [(-90, -60, -180, 180)],
+    "equator": [(-5, 5, -180, 180)],
+}
+
+MONTHS = ("january", "february", "march", "april", "may", "june", "july",
+          "august", "september", "october", "november", "december")
+
+UNIT = r"(?: (?:m|meters?|metres?|dbar|db|decibars?))?"
+DEPTH_WORDS = r"(?: (?:depth|pressure))?"
+
+HELP = (
+    "I can answer questions about the profiles and measurements in the database, for example:\n"
+    "- How many floats are there?\n"
+    "- What is the average temperature below 500 m in the Arabian Sea?\n"
+    "- Where is the warmest water in 2024?\n"
+    "- Average salinity by depth for float 7902246\n"
+    "- Temperature per float north of 10N\n"
+    "- Describe the dataset"
+)
+
+
+class QueryNotUnderstood(ValueError):
+    pass
+
+
+def normalize(question: str):
+    """``(template, values)``: the question with numbers replaced by ``#<slot>`` and the slot values"""
+    q = question.lower().replace("°", " ")
+    q = re.sub(r"(\d)([a-z])", r"\1 \2", q)
+    q = re.sub(r"[^a-z0-9_#.\- ]+", " ", q)
+    values = []
+
+    def slot(match):
+        value = float(match.group(1))
+        hemisphere = match.group(2)
+        if hemisphere in ("s", "south", "w", "west"):
+            value = -value
+        values.append(value)
+        marker = ""
+        if hemisphere:
+            marker = " lat" if hemisphere[0] in "ns" else " lon"
+        return f" #{len(values) - 1}{marker} "
+
+    q = re.sub(r"(?<![\w.])(-?\d+(?:\.\d+)?)(?: (n|s|e|w|north|south|east|west)\b(?! of))?", slot, q)
+    q = re.sub(r"(?<=\w)\.(?!\d)|(?<!\d)\.", " ", q)
+    return " ".join(q.split()), values
+
+
+def _juld(day: date) -> float:
+    return float((day - JULD_EPOCH).days)
+
+
+def _year(value) -> int:
+    year = int(value)
+    if year != value or not 1900 <= year <= 2100:
+        raise QueryNotUnderstood(f"{value:g} is not a year")
+    return year
+
+
+def _fmt(value) -> str:
+    return str(int(value)) if value == int(value) else f"{value:g}"
+
+
+def _lat(value) -> str:
+    return f"{abs(value):g}°{'N' if value >= 0 else 'S'}"
+
+
+def _lon(value) -> str:
+    return f"{abs(value):g}°{'E' if value >= 0 else 'W'}"
+
+
+# Filter rules: (pattern, builder).  A builder gets the match and returns
+# (sql, uses_measurements, bind) where bind(values) -> (params, description).
+
+def _float_filter(m):
+    s = m.group(1)
+    return "p.float_id = :float_id", False, lambda v: (
+        {"float_id": _fmt(v[int(s)])}, f"for float {_fmt(v[int(s)])}")
+
+
+def _named_float_filter(m):
+    float_id = m.group(1)
+    return "p.float_id = :float_id", False, lambda v: ({"float_id": float_id}, f"for float {float_id}")
+
+
+def _range_filter(column, uses_m, describe):
+    def build(m):
+        lo, hi = m.group(1), m.group(2)
+        names = (f"v{lo}", f"v{hi}")
+
+        def bind(v):
+            a, b = sorted((v[int(lo)], v[int(hi)]))
+            return {names[0]: a, names[1]: b}, describe(a, b)
+        return f"{column} BETWEEN :{names[0]} AND :{names[1]}", uses_m, bind
+    return build
+
+
+def _bound_filter(column, op, uses_m, describe):
+    def build(m):
+        s = m.group(m.lastindex)
+        return f"{column} {op} :v{s}", uses_m, lambda v: ({f"v{s}": v[int(s)]}, describe(v[int(s)]))
+    return build
+
+
+def _compass_filter(m):
+    direction, s = m.group(1), m.group(2)
+    column = "p.latitude" if direction in ("north", "south") else "p.longitude"
+    op = ">=" if direction in ("north", "east") else "<="
+    show = _lat if column == "p.latitude" else _lon
+    return f"{column} {op} :v{s}", False, lambda v: ({f"v{s}": v[int(s)]}, f"{direction} of {show(v[int(s)])}")
+
+
+def _near_filter(m):
+    la, lo = m.group(1), m.group(2)
+
+    def bind(v):
+        lat, lon = v[int(la)], v[int(lo)]
+        return ({f"v{la}_lo": lat - 2, f"v{la}_hi": lat + 2, f"v{lo}_lo": lon - 2, f"v{lo}_hi": lon + 2},
+                f"near {_lat(lat)} {_lon(lon)}")
+    sql = f"p.latitude BETWEEN :v{la}_lo AND :v{la}_hi AND p.longitude BETWEEN :v{lo}_lo AND :v{lo}_hi"
+    return sql, False, bind
+
+
+def _at_depth_filter(m):
+    s = m.group(1)
+
+    def bind(v):
+        depth = v[int(s)]
+        tolerance = max(5.0, depth * 0.05)
+        return {f"v{s}_lo": depth - tolerance, f"v{s}_hi": depth + tolerance}, f"at about {_fmt(depth)} dbar"
+    return f"m.pres BETWEEN :v{s}_lo AND :v{s}_hi", True, bind
+
+
+def _surface_filter(m):
+    return "m.pres <= 10", True, lambda v: ({}, "near the surface")
+
+
+def _month_filter(m):
+    month, s = MONTHS.index(m.group(1)) + 1, m.group(2)
+
+    def bind(v):
+        year = _year(v[int(s)])
+        start = date(year, month, 1)
+        end = date(year + month // 12, month % 12 + 1, 1)
+        return {f"v{s}_lo": _juld(start), f"v{s}_hi": _juld(end)}, f"in {start:%B %Y}"
+    return f"p.juld >= :v{s}_lo AND p.juld < :v{s}_hi", False, bind
+
+
+def _year_filter(m):
+    s = m.group(1)
+
+    def bind(v):
+        year = _year(v[int(s)])
+        return {f"v{s}_lo": _juld(date(year, 1, 1)), f"v{s}_hi": _juld(date(year + 1, 1, 1))}, f"in {year}"
+    return f"p.juld >= :v{s}_lo AND p.juld < :v{s}_hi", False, bind
+
+
+def _since_filter(op, word):
+    def build(m):
+        s = m.group(1)
+
+        def bind(v):
+            year = _year(v[int(s)])
+            boundary = year + 1 if word == "after" else year
+            return {f"v{s}": _juld(date(boundary, 1, 1))}, f"{word} {year}"
+        return f"p.juld {op} :v{s}", False, bind
+    return build
+
+
+def _region_filter(m):
+    name = m.group(1)
+    boxes = REGIONS[name]
+    key = name.replace(" ", "_")
+    clauses, params = [], {}
+    for i, (lat_min, lat_max, lon_min, lon_max) in enumerate(boxes):
+        clauses.append(
+            f"(p.latitude BETWEEN :{key}{i}_lat_lo AND :{key}{i}_lat_hi "
+            f"AND p.longitude BETWEEN :{key}{i}_lon_lo AND :{key}{i}_lon_hi)"
+        )
+        params.update({f"{key}{i}_lat_lo": lat_min, f"{key}{i}_lat_hi": lat_max,
+                       f"{key}{i}_lon_lo": lon_min, f"{key}{i}_lon_hi": lon_max})
+    return f"({' OR '.join(clauses)})", False, lambda v: (params, f"in the {name.title().replace(' Of ', ' of ')}")
+
+
+REGION_NAMES = "|".join(sorted(REGIONS, key=len, reverse=True))
+
+FILTERS = (
+    (r"\bfloats? (?:id |number |no |#)?#(\d+)(?! (?:lat|lon)\b)", _float_filter),
+    (r"\bfloats? (?:id )?([a-z][a-z0-9]*_[a-z0-9_]+)", _named_float_filter),
+    (r"\b(?:latitudes?|lat) (?:between|from) #(\d+)(?: lat)? (?:and|to) #(\d+)(?: lat)?",
+     _range_filter("p.latitude", False, lambda a, b: f"between {_lat(a)} and {_lat(b)}")),
+    (r"\b(?:longitudes?|lon) (?:between|from) #(\d+)(?: lon)? (?:and|to) #(\d+)(?: lon)?",
+     _range_filter("p.longitude", False, lambda a, b: f"between {_lon(a)} and {_lon(b)}")),
+    (r"\bbetween #(\d+) lat and #(\d+) lat",
+     _range_filter("p.latitude", False, lambda a, b: f"between {_lat(a)} and {_lat(b)}")),
+    (r"\bbetween #(\d+) lon and #(\d+) lon",
+     _range_filter("p.longitude", False, lambda a, b: f"between {_lon(a)} and {_lon(b)}")),
+    (r"\bnear #(\d+) lat #(\d+) lon", _near_filter),
+    (r"\b(north|south|east|west) of #(\d+)(?: lat| lon)?", _compass_filter),
+    (r"\b(?:in|during) (" + "|".join(MONTHS) + r") (?:of )?#(\d+)", _month_filter),
+    (r"\b(?:since|from) #(\d+)(?! (?:lat|lon|m|meters?|metres?|dbar|db)\b)", _since_filter(">=", "since")),
+    (r"\bafter #(\d+)(?! (?:lat|lon|m|meters?|metres?|dbar|db)\b)", _since_filter(">=", "after")),
+    (r"\bbefore #(\d+)(?! (?:lat|lon|m|meters?|metres?|dbar|db)\b)", _since_filter("<", "before")),
+    (r"\b(?:depths? |pressures? )?between #(\d+) and #(\d+)" + UNIT,
+     _range_filter("m.pres", True, lambda a, b: f"between {_fmt(a)} and {_fmt(b)} dbar")),
+    (r"\b(?:below|deeper than|under|beneath|greater than) #(\d+)" + UNIT + DEPTH_WORDS,
+     _bound_filter("m.pres", ">=", True, lambda x: f"below {_fmt(x)} dbar")),
+    (r"\b(?:above|shallower than|within(?: the)?(?: top)?|in the (?:top|upper)) #(\d+)" + UNIT + DEPTH_WORDS,
+     _bound_filter("m.pres", "<=", True, lambda x: f"above {_fmt(x)} dbar")),
+    (r"\bat(?: a)?(?: depth| pressure)?(?: of)? #(\d+)(?! (?:lat|lon)\b)" + UNIT, _at_depth_filter),
+    (r"\b(?:in|during) #(\d+)(?! (?:lat|lon|m|meters?|metres?|dbar|db)\b)", _year_filter),
+    (r"\b(?:at |near )?(?:the )?(?:sea )?surface\b", _surface_filter),
+    (r"\b(?:in |within |across |over )?(?:the )?(" + REGION_NAMES + r")\b", _region_filter),
+)
+
+COUNT_SUBJECTS = {
+    "float": "COUNT(DISTINCT p.float_id)", "profile": "COUNT(DISTINCT p.id)",
+    "measurement": "COUNT(m.id)", "observation": "COUNT(m.id)", "reading": "COUNT(m.id)",
+}
+
+
+def _depth_bin(dialect: str) -> str:
+    if dialect == "postgresql":
+        return "FLOOR(m.pres / 100) * 100"
+    return "CAST(m.pres / 100 AS INTEGER) * 100"
+
+
+def _from(uses_measurements: bool) -> str:
+    if uses_measurements:
+        return "FROM profiles p JOIN measurements m ON m.profile_id = p.id"
+    return "FROM profiles p"
+
+
+def _statement(select, uses_measurements, where, group=None, order=None, limit=None) -> str:
+    parts = [f"SELECT {select}", _from(uses_measurements)]
+    if where:
+        parts.append("WHERE " + " AND ".join(where))
+    if group:
+        parts.append(f"GROUP BY {group}")
+    if order:
+        parts.append(f"ORDER BY {order}")
+    if limit:
+        parts.append(f"LIMIT {limit}")
+    return " ".join(parts)
+
+
+def _find(table, words: str):
+    for key, pattern in table:
+        if re.search(rf"\b(?:{pattern})\b", words):
+            return key
+    return None
+
+
+@functools.lru_cache(maxsize=PLAN_CACHE_SIZE)
+def compile_plan(template: str, dialect: str = "sqlite") -> dict:
+    """Compile a normalized question into ``{intent, sql, binders}``; raises QueryNotUnderstood"""
+    rest = f" {template} "
+    where, binders, uses_m = [], [], False
+    for pattern, build in FILTERS:
+        for match in list(re.finditer(pattern, rest)):
+            sql, needs_m, bind = build(match)
+            where.append(sql)
+            binders.append(bind)
+            uses_m = uses_m or needs_m
+        rest = re.sub(pattern, " ", rest)
+
+    if re.search(r"\b(?:describe|overview|summar(?:y|ise|ize)|tell me about)\b.*\b(?:data ?set|data|archive|database)\b", rest):
+        sql = ("SELECT (SELECT COUNT(DISTINCT float_id) FROM profiles) AS floats, "
+               "(SELECT COUNT(*) FROM profiles) AS profiles, (SELECT COUNT(*) FROM measurements) AS measurements, "
+               "(SELECT MIN(latitude) FROM profiles) AS lat_min, (SELECT MAX(latitude) FROM profiles) AS lat_max, "
+               "(SELECT MIN(longitude) FROM profiles) AS lon_min, (SELECT MAX(longitude) FROM profiles) AS lon_max, "
+               "(SELECT MIN(juld) FROM profiles) AS juld_min, (SELECT MAX(juld) FROM profiles) AS juld_max, "
+               "(SELECT MAX(pres) FROM measurements) AS pres_max")
+        return {"intent": {"kind": "overview"}, "sql": sql, "binders": ()}
+
+    by_float = re.search(r"\b(?:by|per|for each|each|for every) float\b", rest) is not None
+    by_depth = re.search(r"\b(?:by|per|vs|versus|against|with|at each) (?:depth|pressure)s?\b|\b(?:depth|vertical) profile\b", rest) is not None
+    if by_float:
+        rest = re.sub(r"\b(?:by|per|for each|each|for every) float\b", " ", rest)
+    if by_depth:
+        rest = re.sub(r"\b(?:by|per|vs|versus|against|with|at each) (?:depth|pressure)s?\b|\b(?:depth|vertical) profile\b", " ", rest)
+        uses_m = True
+
+    count = re.search(r"\b(?:how many|number of|count(?: of)?|total) (float|profile|measurement|observation|reading)s?\b", rest)
+    if count:
+        subject = count.group(1)
+        uses_m = uses_m or COUNT_SUBJECTS[subject].startswith("COUNT(m.")
+        select = f"{COUNT_SUBJECTS[subject]} AS value"
+        intent = {"kind": "count", "subject": subject}
+        if by_float:
+            intent["group"] = "float"
+            return {"intent": intent, "binders": tuple(binders), "sql": _statement(
+                f"p.float_id, {select}", uses_m, where, "p.float_id", "p.float_id", MAX_ROWS)}
+        if by_depth:
+            intent["group"] = "depth"
+            bin_ = _depth_bin(dialect)
+            return {"intent": intent, "binders": tuple(binders), "sql": _statement(
+                f"{bin_} AS pres_bin, {select}", True, where, "pres_bin", "pres_bin", MAX_ROWS)}
+        return {"intent": intent, "binders": tuple(binders), "sql": _statement(select, uses_m, where)}
+
+    if re.search(r"\b(?:list|show|which|what|name)(?: me)?(?: all)?(?: the)? floats\b|\bfloats (?:are there|exist)\b", rest):
+        select = ("p.float_id, COUNT(DISTINCT p.id) AS profiles, AVG(p.latitude) AS latitude, "
+                  "AVG(p.longitude) AS longitude, MIN(p.juld) AS juld_min, MAX(p.juld) AS juld_max")
+        return {"intent": {"kind": "floats"}, "binders": tuple(binders), "sql": _statement(
+            select, uses_m, where, "p.float_id", "p.float_id", MAX_ROWS)}
+
+    variable = _find(VARIABLE_WORDS, rest)
+    if variable is None:
+        raise QueryNotUnderstood("no variable, count or listing found in the question")
+    aggregate = _find(AGGREGATE_WORDS, rest)
+    column = f"m.{variable}"
+    where = where + [f"{column} IS NOT NULL"]
+    intent = {"kind": "stat", "variable": variable, "aggregate": aggregate}
+
+    if by_float or by_depth:
+        func = (aggregate or "avg").upper()
+        select = f"{func}({column}) AS value, COUNT({column}) AS n"
+        if by_float:
+            intent["group"] = "float"
+            sql = _statement(f"p.float_id, {select}", True, where, "p.float_id", "p.float_id", MAX_ROWS)
+        else:
+            intent["group"] = "depth"
+            bin_ = _depth_bin(dialect)
+            sql = _statement(f"{bin_} AS pres_bin, {select}", True, where, "pres_bin", "pres_bin", MAX_ROWS)
+        return {"intent": intent, "binders": tuple(binders), "sql": sql}
+
+    if aggregate in ("max", "min"):
+        select = f"p.float_id, p.n_prof, p.latitude, p.longitude, p.juld, m.pres, {column} AS value"
+        order = f"{column} {'DESC' if aggregate == 'max' else 'ASC'}"
+        return {"intent": intent, "binders": tuple(binders), "sql": _statement(select, True, where, order=order, limit=1)}
+    if aggregate == "avg":
+        select = f"AVG({column}) AS value, COUNT({column}) AS n"
+    else:
+        intent["kind"] = "summary"
+        select = f"AVG({column}) AS mean, MIN({column}) AS min, MAX({column}) AS max, COUNT({column}) AS n"
+    return {"intent": intent, "binders": tuple(binders), "sql": _statement(select, True, where)}
+
+
+def _date(juld) -> str:
+    return (JULD_EPOCH + timedelta(days=float(juld))).isoformat() if juld is not None else "unknown date"
+
+
+def _number(value, digits: int = 3) -> str:
+    return "n/a" if value is None else f"{value:,.{digits}f}".rstrip("0").rstrip(".")
+
+
+def _answer(intent: dict, rows: list, where: str) -> str:
+    kind = intent["kind"]
+    scope = f" {where}" if where else ""
+    if kind == "overview":
+        r = rows[0]
+        if not r["profiles"]:
+            return "The database is empty. Ingest some Argo files first."
+        dates = f", dated {_date(r['juld_min'])} to {_date(r['juld_max'])}" if r["juld_min"] is not None else ""
+        return (f"The archive holds {r['floats']:,} floats, {r['profiles']:,} profiles and "
+                f"{r['measurements']:,} measurements{dates}. Profiles span {_lat(r['lat_min'])} to {_lat(r['lat_max'])} "
+                f"and {_lon(r['lon_min'])} to {_lon(r['lon_max'])}, down to {_number(r['pres_max'], 1)} dbar.")
+    if kind == "floats":
+        if not rows:
+            return f"No floats found{scope}."
+        listed = ", ".join(f"{r['float_id']} ({r['profiles']} profile{'' if r['profiles'] == 1 else 's'})" for r in rows)
+        return f"{len(rows)} float{'s' if len(rows) != 1 else ''}{scope}: {listed}."
+    if kind == "count":
+        subject = intent["subject"]
+        if "group" in intent:
+            label = "float" if intent["group"] == "float" else "depth bin"
+            key = "float_id" if intent["group"] == "float" else "pres_bin"
+            parts = ", ".join(f"{r[key]}{' dbar' if key == 'pres_bin' else ''}: {r['value']:,}" for r in rows)
+            return f"Number of {subject}s per {label}{scope}: {parts or 'none'}."
+        value = rows[0]["value"] if rows else 0
+        return f"There {'is' if value == 1 else 'are'} {value:,} {subject}{'' if value == 1 else 's'}{scope}."
+
+    name, unit = VARIABLES[intent["variable"]]
+    if "group" in intent:
+        label = {"avg": "Average", "max": "Maximum", "min": "Minimum"}[intent["aggregate"] or "avg"]
+        if not rows:
+            return f"No {name} measurements{scope}."
+        if intent["group"] == "float":
+            parts = ", ".join(f"{r['float_id']}: {_number(r['value'])} {unit}" for r in rows)
+            return f"{label} {name} per float{scope}: {parts}."
+        parts = ", ".join(f"{r['pres_bin']}-{r['pres_bin'] + 100} dbar: {_number(r['value'])} {unit}" for r in rows)
+        return f"{label} {name} by depth{scope}: {parts}."
+    if kind == "summary":
+        r = rows[0]
+        if not r["n"]:
+            return f"No {name} measurements{scope}."
+        return (f"{name.capitalize()}{scope}: mean {_number(r['mean'])} {unit}, range {_number(r['min'])} to "
+                f"{_number(r['max'])} {unit} over {r['n']:,} measurements.")
+    if intent["aggregate"] == "avg":
+        r = rows[0]
+        if not r["n"]:
+            return f"No {name} measurements{scope}."
+        return f"The average {name}{scope} is {_number(r['value'])} {unit} (from {r['n']:,} measurements)."
+    if not rows:
+        return f"No {name} measurements{scope}."
+    r = rows[0]
+    word = "highest" if intent["aggregate"] == "max" else "lowest"
+    depth = "" if intent["variable"] == "pres" else f" at {_number(r['pres'], 1)} dbar"
+    return (f"The {word} {name}{scope} is {_number(r['value'])} {unit}, recorded by float {r['float_id']} "
+            f"(profile {r['n_prof']}){depth}, {_lat(r['latitude'])} {_lon(r['longitude'])}"
+            f"{', ' + _date(r['juld']) if r['juld'] is not None else ''}.")
+
+
+def stream(db: Session, question: str):
+    """Answer a question in stages, yielding ``(event, data)`` as each part is ready.
+
+    Events: ``intent`` (parsed intent, plan cache hit), ``sql`` (statement and
+    bound parameters), ``rows`` (the first ``FIRST_ROWS``, then the rest if any)
+    and ``answer``.  Unanswerable questions go straight from ``intent`` to the
+    help text.  Every event carries ``elapsed_ms`` since the question arrived.
+    """
+    start = time.perf_counter()
+
+    def elapsed():
+        return round((time.perf_counter() - start) * 1000, 3)
+
+    template, values = normalize(question or "")
+    dialect = db.get_bind().dialect.name
+    hits = compile_plan.cache_info().hits
+    try:
+        plan = compile_plan(template, dialect)
+        params, described = {}, []
+        for bind in plan["binders"]:
+            p, description = bind(values)
+            params.update(p)
+            described.append(description)
+    except QueryNotUnderstood:
+        yield "intent", {"intent": None, "cached": False, "elapsed_ms": elapsed()}
+        yield "answer", {"answer": HELP, "elapsed_ms": elapsed()}
+        return
+    yield "intent", {"intent": plan["intent"], "cached": compile_plan.cache_info().hits > hits, "elapsed_ms": elapsed()}
+    yield "sql", {"sql": plan["sql"], "params": params, "elapsed_ms": elapsed()}
+
+    result = db.execute(text(plan["sql"]), params)
+    columns = list(result.keys())
+    rows = [dict(zip(columns, row)) for row in result.fetchmany(FIRST_ROWS)]
+    yield "rows", {"columns": columns, "rows": rows, "elapsed_ms": elapsed()}
+    more = [dict(zip(columns, row)) for row in result.fetchall()]
+    if more:
+        yield "rows", {"columns": columns, "rows": more, "elapsed_ms": elapsed()}
+    yield "answer", {"answer": _answer(plan["intent"], rows + more, " ".join(described)), "elapsed_ms": elapsed()}
+
+
+def answer(db: Session, question: str) -> dict:
+    """Answer a question: ``{answer, sql, params, intent, columns, rows, cached, elapsed_ms}``"""
+    result = {"answer": None, "sql": None, "params": {}, "intent": None, "columns": [], "rows": [],
+              "cached": False, "elapsed_ms": None}
+    for event, data in stream(db, question):
+        if event == "rows":
+            result["columns"] = data["columns"]
+            result["rows"] += data["rows"]
+            result["elapsed_ms"] = data["elapsed_ms"]
+        else:
+            result.update(data)
+    return result
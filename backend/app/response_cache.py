@@ -0,0 +1,325 @@
+"""HTTP response cache for read endpoints whose payload only changes with the data.
+
+``ResponseCacheMiddleware`` stores complete ``200`` responses of the
+configured ``GET`` routes under (data version, path + query, ``Accept``,
+content coding).  Bodies are kept in the form they are sent: converted to
+MessagePack when ``Accept`` prefers it, and compressed once at the stored
+level of the coding ``Accept-Encoding`` negotiates (compression.py), so a
+hit sends the bytes as they are.
+The data version is the token ``cache.bump_version`` replaces on every
+ingest or reset, so a write makes every older entry unreachable and nothing
+has to be purged; writes by another process are seen once the version is
+re-read (``cache.VERSION_TTL``).  Each entry carries a strong ``ETag`` (a hash of the
+body): a client sending it back in ``If-None-Match`` gets ``304 Not
+Modified`` without the route running or the database being queried.
+
+Entries live in an in-process LRU bounded by ``RESPONSE_CACHE_BYTES``.  With
+``RESPONSE_CACHE_DIR`` set, they are also written to disk (up to
+``RESPONSE_CACHE_DISK_BYTES``), which serves memory misses and survives
+restarts.  Responses larger than ``RESPONSE_CACHE_MAX_ENTRY`` are streamed
+through uncached.  Concurrent misses on one key wait for the first to finish
+instead of all computing it.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import anyio.to_thread
+
+from . import cache, compression, encoding
+from .db import ReadSessionLocal
+
+MEMORY_BYTES = int(os.getenv("RESPONSE_CACHE_BYTES", str(64 * 1024 * 1024)))
+MAX_ENTRY_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRY", str(16 * 1024 * 1024)))
+DISK_DIR = os.getenv("RESPONSE_CACHE_DIR")
+DISK_BYTES = int(os.getenv("RESPONSE_CACHE_DISK_BYTES", str(1024 * 1024 * 1024)))
+
+# Response headers that are recomputed rather than stored
+_DROPPED_HEADERS = {b"content-length", b"etag", b"transfer-encoding"}
+# Bodies that are converted to MessagePack when Accept asks for it
+_JSON_TYPES = (b"application/json", b"application/geo+json")
+
+
+class Entry:
+    __slots__ = ("status", "headers", "body", "etag", "stored_at")
+
+    def __init__(self, status: int, headers: list, body: bytes, etag: str = None, stored_at: float = None):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.etag = etag or '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        self.stored_at = time.time() if stored_at is None else stored_at
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + sum(len(k) + len(v) for k, v in self.headers)
+
+
+class LRUCache:
+    """Entries by key, least recently used evicted first once ``max_bytes`` is exceeded"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry: Entry):
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old.size
+            self._entries[key] = entry
+            self.bytes += entry.size
+            while self.bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= evicted.size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DiskCache:
+    """Entries as files under ``root/<version>/``; other versions' directories are removed on first use"""
+
+    def __init__(self, root, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _dir(self, version: str) -> Path:
+        directory = self.root / (version or "initial")
+        with self._lock:
+            if self._version != version:
+                self._version = version
+                directory.mkdir(parents=True, exist_ok=True)
+                for other in self.root.iterdir():
+                    if other != directory:
+                        shutil.rmtree(other, ignore_errors=True)
+        return directory
+
+    @staticmethod
+    def _name(key) -> str:
+        return hashlib.sha256(repr(key).encode()).hexdigest()
+
+    def get(self, version: str, key):
+        path = self._dir(version) / self._name(key)
+        try:
+            data = path.read_bytes()
+        except OSError:
+            return None
+        header_size = int.from_bytes(data[:4], "big")
+        meta = json.loads(data[4:4 + header_size])
+        headers = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in meta["headers"]]
+        return Entry(meta["status"], headers, data[4 + header_size:], meta["etag"], meta["stored_at"])
+
+    def put(self, version: str, key, entry: Entry):
+        directory = self._dir(version)
+        meta = json.dumps({
+            "status": entry.status,
+            "headers": [(k.decode("latin-1"), v.decode("latin-1")) for k, v in entry.headers],
+            "etag": entry.etag,
+            "stored_at": entry.stored_at,
+        }).encode()
+        path = directory / self._name(key)
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        try:
+            tmp.write_bytes(len(meta).to_bytes(4, "big") + meta + entry.body)
+            os.replace(tmp, path)
+            self._evict(directory)
+        except OSError as e:
+            print(f"Response cache disk write failed: {e}")
+
+    def _evict(self, directory: Path):
+        files = [(f.stat().st_mtime, f.stat().st_size, f) for f in directory.iterdir() if f.suffix != ".tmp"]
+        total = sum(size for _, size, _ in files)
+        for _, size, f in sorted(files):
+            if total <= self.max_bytes:
+                break
+            f.unlink(missing_ok=True)
+            total -= size
+
+
+memory = LRUCache(MEMORY_BYTES)
+disk = DiskCache(DISK_DIR, DISK_BYTES) if DISK_DIR else None
+
+
+def current_version() -> str:
+    """The data version token (a database read at most every ``cache.VERSION_TTL`` seconds)"""
+    db = ReadSessionLocal()
+    try:
+        return cache.data_version(db)
+    finally:
+        db.close()
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """``If-None-Match`` comparison (weak, as RFC 9110 specifies for it)"""
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+class ResponseCacheMiddleware:
+    """ASGI middleware caching the ``GET`` routes in ``routes`` (path regex -> max age in seconds or None)"""
+
+    def __init__(self, app, routes: dict):
+        self.app = app
+        self.routes = [(re.compile(pattern + r"\Z"), max_age) for pattern, max_age in routes.items()]
+        self._inflight = {}
+
+    def _max_age(self, path: str):
+        for pattern, max_age in self.routes:
+            if pattern.match(path):
+                return True, max_age
+        return False, None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            return await self.app(scope, receive, send)
+        cacheable, max_age = self._max_age(scope["path"])
+        if not cacheable:
+            return await self.app(scope, receive, send)
+        try:
+            version = cache.fresh_version()
+            if version is None:
+                version = await anyio.to_thread.run_sync(current_version)
+        except Exception as e:
+            print(f"Response cache bypassed: {e}")
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        accept = headers.get(b"accept", b"")
+        key = (scope["path"], scope["query_string"], accept)
+        coding = compression.negotiate(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if_none_match = headers.get(b"if-none-match", b"").decode("latin-1")
+
+        entry = await self._lookup(version, key + (coding,), max_age)
+        while entry is None and key in self._inflight:
+            await self._inflight[key].wait()
+            entry = await self._lookup(version, key + (coding,), max_age)
+        if entry is not None:
+            return await self._send(send, entry, if_none_match)
+
+        done = self._inflight[key] = asyncio.Event()
+        try:
+            entry = await self._lookup(version, key + (None,), max_age) if coding else None
+            if entry is None:
+                entry = await self._run(scope, receive, send)
+                if entry is None:
+                    return
+                if encoding.negotiate(accept.decode("latin-1")) == encoding.MSGPACK:
+                    entry = await anyio.to_thread.run_sync(_to_msgpack, entry)
+                await self._store(version, key + (None,), entry)
+            if coding:
+                entry = await anyio.to_thread.run_sync(_compressed, entry, coding)
+                await self._store(version, key + (coding,), entry)
+            await self._send(send, entry, if_none_match)
+        finally:
+            del self._inflight[key]
+            done.set()
+
+    async def _store(self, version: str, key, entry: Entry):
+        memory.put((version, key), entry)
+        if disk is not None:
+            await anyio.to_thread.run_sync(disk.put, version, key, entry)
+
+    async def _lookup(self, version: str, key, max_age):
+        entry = memory.get((version, key))
+        if entry is None and disk is not None:
+            entry = await anyio.to_thread.run_sync(disk.get, version, key)
+            if entry is not None:
+                memory.put((version, key), entry)
+        if entry is not None and max_age is not None and time.time() - entry.stored_at > max_age:
+            return None
+        return entry
+
+    @staticmethod
+    async def _send(send, entry: Entry, if_none_match: str):
+        validators = [(b"etag", entry.etag.encode()), (b"cache-control", b"no-cache"),
+                      (b"vary", b"Accept, Accept-Encoding")]
+        if if_none_match and etag_matches(if_none_match, entry.etag):
+            await send({"type": "http.response.start", "status": 304, "headers": validators})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        headers = entry.headers + validators + [(b"content-length", str(len(entry.body)).encode())]
+        await send({"type": "http.response.start", "status": entry.status, "headers": headers})
+        await send({"type": "http.response.body", "body": entry.body})
+
+    async def _run(self, scope, receive, send):
+        """Run the route, buffering up to ``MAX_ENTRY_BYTES``; the entry to store, or None if it was sent"""
+        start, chunks, size = None, [], 0
+        passthrough = False
+
+        async def capture(message):
+            nonlocal start, size, passthrough
+            if passthrough:
+                return await send(message)
+            if message["type"] == "http.response.start":
+                start = message
+                if start["status"] != 200:
+                    passthrough = True
+                    await send(start)
+                return
+            chunks.append(message.get("body", b""))
+            size += len(chunks[-1])
+            if size > MAX_ENTRY_BYTES:
+                # Too large to keep: stream what was held back and the rest as it comes
+                passthrough = True
+                await send(start)
+                await send({"type": "http.response.body", "body": b"".join(chunks),
+                            "more_body": message.get("more_body", False)})
+
+        await self.app(scope, receive, capture)
+        if passthrough or start is None:
+            return None
+        headers = [(k, v) for k, v in start["headers"] if k.lower() not in _DROPPED_HEADERS]
+        return Entry(200, headers, b"".join(chunks))
+
+
+def _header(entry: Entry, name: bytes) -> bytes:
+    return next((v for k, v in entry.headers if k.lower() == name), b"")
+
+
+def _to_msgpack(entry: Entry) -> Entry:
+    """``entry`` with a JSON body converted to MessagePack (other bodies unchanged)"""
+    if not _header(entry, b"content-type").startswith(_JSON_TYPES):
+        return entry
+    try:
+        body = encoding.msgpack_from_json(entry.body)
+    except RuntimeError as e:
+        print(f"Response cache sends JSON: {e}")
+        return entry
+    headers = [(k, v) for k, v in entry.headers if k.lower() != b"content-type"]
+    return Entry(entry.status, headers + [(b"content-type", encoding.MSGPACK.encode())], body)
+
+
+def _compressed(entry: Entry, coding: str) -> Entry:
+    """``entry`` compressed at the stored level of ``coding`` (unchanged if too small to gain)"""
+    if len(entry.body) < compression.MIN_SIZE or _header(entry, b"content-encoding"):
+        return entry
+    body = compression.compress(entry.body, coding, stored=True)
+    return Entry(entry.status, entry.headers + [(b"content-encoding", coding.encode())], body,
+                 stored_at=entry.stored_at)
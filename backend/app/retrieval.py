@@ -0,0 +1,529 @@
+"""In-process retrieval index over per-profile summaries for the chat path.
+
+Every profile gets a short text summary (float, position and named
+regions, date, depth range, surface and mean TEMP/PSAL with coarse
+descriptors such as "warm" or "deep").  Summaries are embedded locally
+with the hashing trick: unigrams and bigrams hashed into ``DIM`` signed
+buckets with log term frequencies, L2-normalized.  Queries are weighted
+by inverse document frequency (document frequencies are counted per
+bucket as profiles are added), so stored vectors never need reweighting
+and inserts stay incremental.
+
+Search is exact over all vectors until ``IVF_MIN_VECTORS``; beyond that an
+IVF index (spherical k-means centroids, ``NPROBE`` probed lists) keeps a
+top-k lookup in the low milliseconds.  New vectors join their nearest
+list; the centroids are retrained when the index has grown ``RETRAIN_GROWTH``
+times since training.  Entries are keyed by ``(float_id, n_prof)`` like
+the ingest manifest.
+
+Ingest queues its updates on the session (``upsert``); ``apply`` adds them
+once the transaction has committed, so rolled-back files never show up in
+search results.  ``flush`` also persists the index to ``INDEX_DIR/index.npz``
+together with the data version it reflects; a file saved for another
+version (or another database) is rebuilt from the database instead of loaded.
+Loading or rebuilding happens on a background thread (``warm``, started with
+the app); until it finishes ``search`` returns no profiles rather than making
+chat requests wait.
+"""
+import os
+import re
+import tempfile
+import threading
+import zlib
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+
+from .query_engine import MONTHS, REGIONS
+
+INDEX_DIR = os.getenv("RETRIEVAL_INDEX_DIR", str(Path(tempfile.gettempdir()) / "argo_retrieval"))
+DIM = int(os.getenv("RETRIEVAL_DIM", "256"))
+
+IVF_MIN_VECTORS = 4096
+NPROBE = 8
+RETRAIN_GROWTH = 4
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE = 50000
+ASSIGN_CHUNK = 65536
+
+JULD_EPOCH = date(1950, 1, 1)
+
+STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "at", "to", "for", "and", "or", "is", "are", "was", "were", "with",
+    "what", "which", "where", "show", "me", "find", "profiles", "profile", "any", "some", "there", "by",
+}
+
+TOKEN_PATTERN = re.compile(
+    r"(?P<date>\b\d{4}-\d{2}-\d{2}\b)"
+    r"|(?P<depth>\b\d+(?:\.\d+)?) ?(?:dbar|db|m|meters?|metres?)\b"
+    r"|(?P<coord>-?\b\d+(?:\.\d+)?) ?(?P<hemi>[nsew])\b"
+    r"|(?P<year>\b(?:19|20)\d{2}\b)"
+    r"|(?P<word>\b[a-z][a-z0-9_]*|\b\d{5,}\b)"
+)
+
+DEPTH_BANDS = (200.0, 500.0, 1000.0, 1500.0)
+
+# Session.info key of the batches waiting for their transaction to commit
+PENDING = "retrieval_pending"
+
+_lock = threading.RLock()
+_index = None
+# Thread loading or building the index (``warm``)
+_warm_lock = threading.Lock()
+_warming = None
+
+
+def _coord_tokens(value: float, hemisphere: str) -> list:
+    """Whole-degree and 5-degree band tokens for a coordinate"""
+    axis = "lat" if hemisphere in "ns" else "lon"
+    return [f"{axis}_{int(value)}{hemisphere}", f"{axis}5_{int(value) // 5 * 5}{hemisphere}"]
+
+
+def tokens(text_: str) -> list:
+    """Index terms of a summary or question: words, bigrams of adjacent words, and date/position/depth tokens"""
+    terms, run = [], []
+    for match in TOKEN_PATTERN.finditer(text_.lower()):
+        word = match.group("word")
+        if word and word not in STOPWORDS and word not in MONTHS:
+            if run:
+                terms.append(f"{run[-1]} {word}")
+            run.append(word)
+            terms.append(word)
+            continue
+        if word in MONTHS:
+            terms.append(f"month_{word}")
+        elif match.group("date"):
+            year, month, _ = match.group("date").split("-")
+            terms += [f"year_{year}", f"month_{MONTHS[int(month) - 1]}"]
+        elif match.group("depth"):
+            band = int(np.searchsorted(DEPTH_BANDS, float(match.group("depth")), side="right"))
+            terms.append(f"depth_{band}")
+        elif match.group("coord"):
+            terms += _coord_tokens(abs(float(match.group("coord"))), match.group("hemi"))
+        elif match.group("year"):
+            terms.append(f"year_{match.group('year')}")
+        if not word:
+            run = []  # structured tokens break bigrams; stopwords do not ("bay of bengal")
+    return terms
+
+
+def _hash(term: str):
+    h = zlib.crc32(term.encode())
+    return h % DIM, 1.0 if (h >> 31) & 1 else -1.0
+
+
+def term_counts(text_: str) -> np.ndarray:
+    """Signed hashed term frequencies (log-scaled) of a text"""
+    vector = np.zeros(DIM, dtype=np.float32)
+    for term in tokens(text_):
+        bucket, sign = _hash(term)
+        vector[bucket] += sign
+    return np.sign(vector) * np.log1p(np.abs(vector))
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1.0)
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Nearest centroid of each vector (all zeros before the IVF layer is trained)"""
+    if not centroids.shape[0]:
+        return np.zeros(vectors.shape[0], dtype=np.int32)
+    return np.concatenate([
+        np.argmax(vectors[i:i + ASSIGN_CHUNK] @ centroids.T, axis=1).astype(np.int32)
+        for i in range(0, vectors.shape[0], ASSIGN_CHUNK)
+    ] or [np.empty(0, dtype=np.int32)])
+
+
+def _lat(value: float) -> str:
+    return f"{abs(value):.2f}{'N' if value >= 0 else 'S'}"
+
+
+def _lon(value: float) -> str:
+    return f"{abs(value):.2f}{'E' if value >= 0 else 'W'}"
+
+
+def _regions(lat: float, lon: float) -> list:
+    return [name for name, boxes in REGIONS.items()
+            if any(a <= lat <= b and c <= lon <= d for a, b, c, d in boxes)]
+
+
+def summarize(float_id: str, n_prof: int, lat: float, lon: float, juld, pres, temp, psal) -> str:
+    """One-line description of a profile from its levels"""
+    parts = [f"Float {float_id} profile {n_prof}"]
+    if np.isfinite(lat) and np.isfinite(lon):
+        where = f"at {_lat(lat)} {_lon(lon)}"
+        regions = _regions(lat, lon)
+        if regions:
+            where += " in the " + ", ".join(regions)
+        parts.append(where)
+    if juld is not None and np.isfinite(juld):
+        parts.append(f"on {(JULD_EPOCH + timedelta(days=float(juld))).isoformat()}")
+    ok = np.isfinite(pres) & np.isfinite(temp) & np.isfinite(psal)
+    pres, temp, psal = pres[ok], temp[ok], psal[ok]
+    if pres.shape[0]:
+        top = int(np.argmin(pres))
+        depth = "deep" if pres.max() >= 1500 else "mid-depth" if pres.max() >= 500 else "shallow"
+        parts.append(f"{depth} profile from {pres.min():.0f} dbar to {pres.max():.0f} dbar ({pres.shape[0]} levels)")
+        sst, sss = temp[top], psal[top]
+        temp_word = "warm" if sst >= 25 else "cold" if sst < 10 else "temperate"
+        salt_word = "salty high salinity" if sss >= 35.5 else "fresh low salinity" if sss < 34 else "moderate salinity"
+        parts.append(f"surface temperature {sst:.2f} C ({temp_word}), surface salinity {sss:.2f} PSU ({salt_word})")
+        parts.append(f"mean temperature {np.mean(temp):.2f} C, mean salinity {np.mean(psal):.2f} PSU")
+    return "; ".join(parts)
+
+
+def batch_summaries(batch: dict) -> list:
+    """Summary per profile of a batch"""
+    from .ingest_engine import profile_bounds
+
+    bounds = profile_bounds(batch)
+    juld = batch.get("juld")
+    summaries = []
+    for i in range(len(bounds) - 1):
+        rows = slice(bounds[i], bounds[i + 1])
+        summaries.append(summarize(
+            batch["float_id"], int(batch["n_prof"][i]), float(batch["latitude"][i]), float(batch["longitude"][i]),
+            None if juld is None else float(juld[i]),
+            np.asarray(batch["pres"][rows], dtype=np.float64), np.asarray(batch["temp"][rows], dtype=np.float64),
+            np.asarray(batch["psal"][rows], dtype=np.float64),
+        ))
+    return summaries
+
+
+class VectorIndex:
+    """Vector store with tombstones and an optional IVF layer.
+
+    Row arrays grow by doubling so adding a file's profiles is amortized
+    O(profiles added); ``rows`` maps each float id to its row numbers.
+    """
+
+    ARRAYS = ("vectors", "n_prof", "alive", "cluster")
+
+    def __init__(self):
+        self.count = 0
+        self.vectors = np.empty((0, DIM), dtype=np.float32)
+        self.n_prof = np.empty(0, dtype=np.int64)
+        self.alive = np.empty(0, dtype=bool)
+        self.cluster = np.empty(0, dtype=np.int32)
+        self.float_ids = []
+        self.summaries = []
+        self.rows = {}
+        self.df = np.zeros(DIM, dtype=np.float64)
+        self.centroids = np.empty((0, DIM), dtype=np.float32)
+        self.trained_n = 0
+        self.version = ""
+        self.dirty = False
+        self._lists = None  # (row order by cluster, list offsets), rebuilt lazily
+
+    @property
+    def size(self) -> int:
+        return int(self.alive[:self.count].sum())
+
+    def _reserve(self, n: int):
+        needed = self.count + n
+        if needed <= self.alive.shape[0]:
+            return
+        capacity = max(needed, 2 * self.alive.shape[0], 1024)
+        for name in self.ARRAYS:
+            old = getattr(self, name)
+            grown = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            grown[:self.count] = old[:self.count]
+            setattr(self, name, grown)
+
+    def remove(self, float_id: str, n_profs=None):
+        rows = self.rows.get(float_id)
+        if rows is None:
+            return
+        rows = rows[self.alive[rows]]
+        if n_profs is not None:
+            rows = rows[np.isin(self.n_prof[rows], np.asarray(list(n_profs), dtype=np.int64))]
+        if rows.shape[0]:
+            self.df -= (self.vectors[rows] != 0).sum(axis=0)
+            self.alive[rows] = False
+            self.dirty = True
+            self._lists = None
+
+    def add(self, float_id: str, n_profs, summaries: list):
+        if not summaries:
+            return
+        vectors = _normalize(np.vstack([term_counts(s) for s in summaries])).astype(np.float32)
+        n = vectors.shape[0]
+        self._reserve(n)
+        new = slice(self.count, self.count + n)
+        self.vectors[new] = vectors
+        self.n_prof[new] = np.asarray(n_profs, dtype=np.int64)
+        self.alive[new] = True
+        self.cluster[new] = _assign(vectors, self.centroids)
+        self.float_ids += [float_id] * n
+        self.summaries += list(summaries)
+        previous = self.rows.get(float_id)
+        rows = np.arange(new.start, new.stop)
+        self.rows[float_id] = rows if previous is None else np.concatenate([previous[self.alive[previous]], rows])
+        self.count += n
+        self.df += (vectors != 0).sum(axis=0)
+        self.dirty = True
+        self._lists = None
+
+    def compact(self):
+        keep = np.flatnonzero(self.alive[:self.count])
+        for name in self.ARRAYS:
+            setattr(self, name, getattr(self, name)[keep])
+        self.float_ids = [self.float_ids[i] for i in keep]
+        self.summaries = [self.summaries[i] for i in keep]
+        self.count = keep.shape[0]
+        self._index_rows()
+        self._lists = None
+
+    def _index_rows(self):
+        ids = np.asarray(self.float_ids, dtype=str)
+        order = np.argsort(ids, kind="stable")
+        names, starts = np.unique(ids[order], return_index=True)
+        self.rows = {str(name): rows for name, rows in zip(names, np.split(order, starts[1:]))}
+
+    def train(self):
+        """Spherical k-means over (a sample of) the live vectors"""
+        self.compact()
+        n = self.count
+        self.dirty = True
+        if n < IVF_MIN_VECTORS:
+            self.centroids = np.empty((0, DIM), dtype=np.float32)
+            self.cluster[:] = 0
+            self.trained_n = 0
+            return
+        rng = np.random.default_rng(0)
+        n_lists = int(np.clip(np.sqrt(n), 16, 4096))
+        sample = self.vectors[rng.choice(n, size=min(n, 40 * n_lists, KMEANS_SAMPLE), replace=False)]
+        centroids = sample[rng.choice(sample.shape[0], size=n_lists, replace=False)]
+        for _ in range(KMEANS_ITERATIONS):
+            assign = _assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            empty = np.bincount(assign, minlength=n_lists) == 0
+            sums[empty] = centroids[empty]
+            centroids = _normalize(sums).astype(np.float32)
+        self.centroids = centroids
+        self.cluster = _assign(self.vectors, centroids)
+        self.trained_n = n
+        self._lists = None
+
+    def maintain(self):
+        """Compact tombstones and (re)train the IVF layer when the index has outgrown it"""
+        size = self.size
+        if size >= IVF_MIN_VECTORS and (self.trained_n == 0 or size >= RETRAIN_GROWTH * self.trained_n):
+            self.train()
+        elif self.count - size > 0.25 * max(self.count, 1):
+            self.compact()
+            self.dirty = True
+
+    def _inverted_lists(self):
+        if self._lists is None:
+            order = np.argsort(self.cluster[:self.count], kind="stable")
+            offsets = np.searchsorted(self.cluster[order], np.arange(self.centroids.shape[0] + 1))
+            self._lists = (order, offsets)
+        return self._lists
+
+    def query_vector(self, question: str) -> np.ndarray:
+        n_docs = max(self.size, 1)
+        idf = np.log((1 + n_docs) / (1 + np.maximum(self.df, 0))) + 1.0
+        return _normalize(term_counts(question) * idf).astype(np.float32)
+
+    def search(self, question: str, k: int = 5) -> list:
+        if self.count == 0:
+            return []
+        q = self.query_vector(question)
+        if not q.any():
+            return []
+        if self.centroids.shape[0]:
+            order, offsets = self._inverted_lists()
+            probes = np.argsort(self.centroids @ q)[::-1][:NPROBE]
+            candidates = np.concatenate([order[offsets[c]:offsets[c + 1]] for c in probes])
+        else:
+            candidates = np.arange(self.count)
+        candidates = candidates[self.alive[candidates]]
+        scores = self.vectors[candidates] @ q
+        if scores.shape[0] > k:
+            best = np.argpartition(scores, -k)[-k:]
+        else:
+            best = np.arange(scores.shape[0])
+        best = best[np.argsort(scores[best])[::-1]]
+        return [
+            {"float_id": self.float_ids[candidates[i]], "n_prof": int(self.n_prof[candidates[i]]),
+             "score": round(float(scores[i]), 4), "summary": self.summaries[candidates[i]]}
+            for i in best if scores[i] > 0
+        ]
+
+    def save(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp.npz")
+        n = self.count
+        np.savez(tmp, float_ids=np.asarray(self.float_ids, dtype=str), summaries=np.asarray(self.summaries, dtype=str),
+                 vectors=self.vectors[:n], n_prof=self.n_prof[:n], alive=self.alive[:n], cluster=self.cluster[:n],
+                 df=self.df, centroids=self.centroids, trained_n=np.int64(self.trained_n), dim=np.int64(DIM),
+                 version=np.asarray(self.version))
+        os.replace(tmp, path)
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path: Path):
+        index = cls()
+        with np.load(path) as data:
+            if int(data["dim"]) != DIM:
+                return None
+            for name in cls.ARRAYS + ("df", "centroids"):
+                setattr(index, name, data[name])
+            index.float_ids = data["float_ids"].tolist()
+            index.summaries = data["summaries"].tolist()
+            index.trained_n = int(data["trained_n"])
+            index.version = str(data["version"]) if "version" in data else ""
+        index.count = index.alive.shape[0]
+        index._index_rows()
+        return index
+
+
+def _path() -> Path:
+    return Path(INDEX_DIR) / "index.npz"
+
+
+def _version(db) -> str:
+    from . import cache
+    return cache.read_version(db)
+
+
+def get_index(db) -> VectorIndex:
+    """The process-wide index: loaded from disk if saved at the database's current version, else built from it"""
+    global _index
+    with _lock:
+        if _index is None:
+            index = None
+            version = _version(db)
+            if _path().exists():
+                try:
+                    index = VectorIndex.load(_path())
+                except Exception as e:
+                    print(f"Retrieval index unreadable, rebuilding: {e}")
+                if index is not None and index.version != version:
+                    index = None
+            if index is None:
+                index = VectorIndex()
+                _build(index, db)
+                index.version = version
+            _index = index
+        return _index
+
+
+def _build(index: VectorIndex, db):
+    from sqlalchemy import select
+    from . import models
+    from .ingest_engine import read_batch
+
+    for float_id in db.execute(select(models.Profile.float_id).distinct()).scalars().all():
+        batch = read_batch(db, float_id)
+        if batch is not None:
+            index.add(float_id, batch["n_prof"], batch_summaries(batch))
+    index.maintain()
+    index.dirty = True
+
+
+def upsert(db, batch: dict, drop_n_prof=()):
+    """Queue a written batch for ``apply``, replacing ``drop_n_prof`` and the batch's profiles of its float"""
+    db.info.setdefault(PENDING, []).append((batch, tuple(drop_n_prof)))
+
+
+def apply(db):
+    """Index the queued batches (call after the ingest transaction commits)"""
+    pending = db.info.pop(PENDING, [])
+    if not pending:
+        return
+    with _lock:
+        index = get_index(db)
+        for batch, drop_n_prof in pending:
+            replaced = set(int(n) for n in drop_n_prof) | set(batch["n_prof"].tolist())
+            index.remove(batch["float_id"], replaced)
+            index.add(batch["float_id"], batch["n_prof"], batch_summaries(batch))
+
+
+def discard(db):
+    """Drop the queued batches (the transaction rolled back)"""
+    db.info.pop(PENDING, None)
+
+
+def refresh(db, float_id: str):
+    """Re-index a float from its stored profiles"""
+    from .ingest_engine import read_batch
+
+    with _lock:
+        index = get_index(db)
+        index.remove(float_id)
+        batch = read_batch(db, float_id)
+        if batch is not None:
+            index.add(float_id, batch["n_prof"], batch_summaries(batch))
+
+
+def ready() -> bool:
+    """True once the index is loaded; ``search`` returns nothing before that"""
+    return _index is not None
+
+
+def warm():
+    """Load or build the index on a background thread unless it is ready or already loading"""
+    global _warming
+    with _warm_lock:
+        if ready() or (_warming is not None and _warming.is_alive()):
+            return
+        _warming = threading.Thread(target=_warm, name="retrieval-warm", daemon=True)
+        _warming.start()
+
+
+def _warm():
+    from .db import ReadSessionLocal
+
+    db = ReadSessionLocal()
+    try:
+        with _lock:
+            index = get_index(db)
+            # Save a freshly built index so the next start loads it
+            if index.dirty:
+                index.save(_path())
+    except Exception as e:
+        print(f"Retrieval index warm-up failed: {e}")
+    finally:
+        db.close()
+
+
+def search(db, question: str, k: int = 5) -> list:
+    """Best matching profiles; empty while the index is still loading (``warm``)"""
+    if not ready():
+        warm()
+        return []
+    with _lock:
+        return _index.search(question, k)
+
+
+def flush(db):
+    """Apply queued batches and persist the index if it changed (call after the ingest transaction commits)"""
+    apply(db)
+    with _lock:
+        if _index is not None and _index.dirty:
+            _index.maintain()
+            _index.version = _version(db)
+            _index.save(_path())
+
+
+def rebuild(db) -> int:
+    global _index
+    with _lock:
+        _index = VectorIndex()
+        _build(_index, db)
+        _index.version = _version(db)
+        _index.save(_path())
+        return _index.size
+
+
+def clear():
+    global _index
+    with _lock:
+        _index = VectorIndex()
+        _path().unlink(missing_ok=True)
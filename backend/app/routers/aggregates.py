@@ -0,0 +1,77 @@
+from fastapi import APIRouter, Depends, Query, HTTPException
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from ..db import SessionLocal, ReadSessionLocal, PoolTimeout
+from .. import climatology, cache
+
+router = APIRouter(prefix="/aggregates", tags=["aggregates"])
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_read_db():
+    """Session on the reader pool (query-only; never waits for an ingest)"""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def _parse_list(value: str, allowed, label: str) -> list:
+    selected = [v.strip() for v in value.split(",") if v.strip()]
+    unknown = [v for v in selected if v not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown {label}: {unknown}. Available: {list(allowed)}")
+    return selected
+
+
+@router.get("")
+def aggregates(
+    by: str = "cell,pres,month",
+    variables: str = "temp,psal",
+    lat_min: Optional[float] = None,
+    lat_max: Optional[float] = None,
+    lon_min: Optional[float] = None,
+    lon_max: Optional[float] = None,
+    pres_min: Optional[float] = None,
+    pres_max: Optional[float] = None,
+    month: List[int] = Query(default=[]),
+    db: Session = Depends(get_read_db),
+):
+    """Climatology cells (count, mean, min, max, variance) overlapping the filters.
+
+    ``by`` keeps any of ``cell``, ``pres`` and ``month`` as separate groups and
+    merges the rest: ``by=pres`` with a lat/lon box is a regional depth profile.
+    """
+    group = _parse_list(by, climatology.GROUPS, "groups")
+    selected = _parse_list(variables, climatology.VARIABLES, "variables")
+    if not selected:
+        raise HTTPException(status_code=400, detail="No variables selected")
+    cells = climatology.query(
+        db, by=group, variables=selected, lat_min=lat_min, lat_max=lat_max, lon_min=lon_min, lon_max=lon_max,
+        pres_min=pres_min, pres_max=pres_max, months=month,
+    )
+    return {"grid_deg": climatology.GRID_DEG, "by": group, "count": len(cells), "cells": cells}
+
+
+@router.post("/rebuild")
+def rebuild_aggregates(db: Session = Depends(get_db)):
+    """Recompute every climatology cell from the measurements"""
+    try:
+        cells = climatology.rebuild(db)
+        db.commit()
+        cache.invalidate()
+        return {"status": "ok", "cells": cells}
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        db.rollback()
+        print(f"Climatology rebuild error: {e}")
+        raise HTTPException(status_code=500, detail=f"Error rebuilding aggregates: {e}")
@@ -1,9 +1,98 @@
-from fastapi import APIRouter
+import json
+import time
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from ..db import ReadSessionLocal
+from .. import query_engine, retrieval
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
+# Bounds of ``k``, the number of matching profiles returned with an answer
+DEFAULT_K = 5
+MAX_K = 100
+
+
+def get_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def _k(value) -> int:
+    """``k`` from a request body, clamped to 1..MAX_K; 400 when it is not an integer"""
+    try:
+        k = int(value)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"k must be an integer, got {value!r}")
+    return min(max(k, 1), MAX_K)
+
+
 @router.post("/query")
-def query(payload: dict):
+def query(payload: dict, db: Session = Depends(get_db)):
+    """Answer a question about the archive with SQL compiled offline from the question.
+
+    ``profiles`` lists the ``k`` (default 5, at most 100) profiles whose summaries best match the question;
+    it stays empty, with ``retrieval_ready`` false, while the retrieval index is still loading.
+    """
     question = payload.get("question", "")
-    # Placeholder: echo until RAG is wired
-    return {"answer": f"Received: {question}", "sql": None}
+    k = _k(payload.get("k", DEFAULT_K))
+    try:
+        result = query_engine.answer(db, question)
+        started = time.perf_counter()
+        result["profiles"] = retrieval.search(db, question, k=k)
+        result["retrieval_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        result["retrieval_ready"] = retrieval.ready()
+        return result
+    except Exception as e:
+        print(f"Chat query error: {e}")
+        raise HTTPException(status_code=500, detail=f"Error answering question: {e}")
+
+
+def _event(name: str, data: dict) -> str:
+    return f"event: {name}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _stream_answer(question: str, k: int):
+    # Own session: the response body is produced after the endpoint returns
+    db = ReadSessionLocal()
+    try:
+        for name, data in query_engine.stream(db, question):
+            yield _event(name, data)
+        started = time.perf_counter()
+        profiles = retrieval.search(db, question, k=k)
+        yield _event("profiles", {"profiles": profiles, "retrieval_ms": round((time.perf_counter() - started) * 1000, 3),
+                                  "retrieval_ready": retrieval.ready()})
+        yield _event("done", {})
+    except Exception as e:
+        print(f"Chat stream error: {e}")
+        yield _event("error", {"detail": f"Error answering question: {e}"})
+    finally:
+        db.close()
+
+
+@router.get("/stream")
+def stream(question: str, k: int = Query(DEFAULT_K, ge=1, le=MAX_K)):
+    """Server-Sent Events version of ``/chat/query``.
+
+    Emits ``intent``, ``sql``, ``rows`` (first rows, then the rest), ``answer``,
+    ``profiles`` and finally ``done`` (or ``error``), each as soon as it is ready.
+    """
+    return StreamingResponse(
+        _stream_answer(question, k),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/index/rebuild")
+def rebuild_index(db: Session = Depends(get_db)):
+    """Re-embed every profile summary (after changing RETRIEVAL_DIM or restoring a database)"""
+    try:
+        profiles = retrieval.rebuild(db)
+        return {"status": "ok", "profiles": profiles, "directory": retrieval.INDEX_DIR}
+    except Exception as e:
+        print(f"Retrieval index rebuild error: {e}")
+        raise HTTPException(status_code=500, detail=f"Error rebuilding retrieval index: {e}")
@@ -0,0 +1,112 @@
+from fastapi import APIRouter, Depends, Header, HTTPException
+from sqlalchemy.orm import Session
+from typing import Optional
+import numpy as np
+from ..db import SessionLocal, ReadSessionLocal, PoolTimeout
+from .. import encoding, interpolation, cache, float_stats
+
+router = APIRouter(prefix="/floats", tags=["floats"])
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_read_db():
+    """Session on the reader pool (query-only; never waits for an ingest)"""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@router.get("/stats")
+def list_float_stats(float_ids: Optional[str] = None, db: Session = Depends(get_read_db)):
+    """Trajectory statistics of every float (or the comma-separated ``float_ids``)"""
+    selected = [f.strip() for f in float_ids.split(",") if f.strip()] if float_ids else None
+    items = float_stats.load_all(db, selected)
+    return {"items": items, "total": len(items)}
+
+
+@router.get("/{float_id}/stats")
+def get_float_stats(float_id: str, db: Session = Depends(get_read_db)):
+    """Haversine along-track distance, drift speed and mission duration of a float, precomputed at ingest"""
+    stats = float_stats.load(db, float_id)
+    if stats is None:
+        raise HTTPException(status_code=404, detail="Float not found")
+    return stats
+
+
+@router.post("/stats/rebuild")
+def rebuild_float_stats(db: Session = Depends(get_db)):
+    """Recompute every float's trajectory statistics from the stored profiles"""
+    try:
+        floats = float_stats.rebuild(db)
+        # GET /floats/stats is served from the response cache
+        cache.bump_version(db)
+        db.commit()
+        cache.invalidate()
+        return {"status": "ok", "floats": floats}
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        db.rollback()
+        print(f"Float stats rebuild error: {e}")
+        raise HTTPException(status_code=500, detail=f"Error rebuilding float statistics: {e}")
+
+
+@router.get("/{float_id}/grid")
+def float_grid(
+    float_id: str,
+    variables: str = "temp,psal",
+    pres_min: Optional[float] = None,
+    pres_max: Optional[float] = None,
+    accept: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db),
+):
+    """A float's profiles on standard pressure levels: one row per profile, one column per level.
+
+    JSON returns nested lists; Arrow returns fixed-size list columns and
+    ``.npz`` the 2-D float32 arrays.  The levels are in the ``levels`` field
+    (``X-Levels`` header for binary formats).
+    """
+    fmt = encoding.media_type(accept)
+    selected = [v.strip() for v in variables.split(",") if v.strip()]
+    unknown = [v for v in selected if v not in interpolation.VARIABLES]
+    if unknown or not selected:
+        raise HTTPException(status_code=400, detail=f"Unknown variables: {unknown}. Available: {list(interpolation.VARIABLES)}")
+
+    grid = interpolation.load(db, float_id)
+    if grid is None:
+        raise HTTPException(status_code=404, detail="Float not found")
+    levels = grid["levels"]
+    keep = np.ones(levels.shape[0], dtype=bool)
+    if pres_min is not None:
+        keep &= levels >= pres_min
+    if pres_max is not None:
+        keep &= levels <= pres_max
+
+    columns = {name: grid[name] for name in ("n_prof", "latitude", "longitude", "juld")}
+    columns.update({name: grid[name][:, keep] for name in selected})
+    return encoding.encode(columns, fmt, float_id=float_id, levels=levels[keep].tolist())
+
+
+@router.post("/grids/rebuild")
+def rebuild_grids(db: Session = Depends(get_db)):
+    """Re-interpolate every float onto the configured standard levels"""
+    try:
+        floats = interpolation.rebuild(db)
+        db.commit()
+        cache.invalidate()
+        return {"status": "ok", "floats": floats, "levels": len(interpolation.STANDARD_LEVELS)}
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        db.rollback()
+        print(f"Grid rebuild error: {e}")
+        raise HTTPException(status_code=500, detail=f"Error rebuilding grids: {e}")
@@ -1,9 +1,10 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse
+from typing import List, Optional
 from sqlalchemy.orm import Session
-from ..db import SessionLocal, Base, engine
-from .. import models
-import os
-import pandas as pd
+from ..db import SessionLocal, ReadSessionLocal, Base, engine, PoolTimeout
+from .. import models, schemas, ingest_engine, jobs, columnar, cache, climatology, interpolation, retrieval, partition_stats, float_stats
+from ..netcdf_ingest import NETCDF_SUFFIXES
 
 router = APIRouter(prefix="/ingest", tags=["ingest"])
 
@@ -11,7 +12,7 @@ router = APIRouter(prefix="/ingest", tags=["ingest"])
 Base.metadata.create_all(bind=engine, checkfirst=True)
 
 
-def ingest_csv_folder(folder: str, db: Session):
+def resolve_folder(folder: str):
     # Try to resolve the path
     import pathlib
     
@@ -49,53 +50,69 @@ def ingest_csv_folder(folder: str, db: Session):
     if not folder_path.is_dir():
         raise FileNotFoundError(f"Path exists but is not a directory: {folder_path}")
 
-    processed_files = 0
-    csv_files = list(folder_path.glob("*.csv"))
+    return folder_path
+
+
+def find_files(folder: str, suffixes=(".csv",), label: str = "CSV"):
+    folder_path = resolve_folder(folder)
+    files = sorted(p for p in folder_path.iterdir() if p.is_file() and p.suffix.lower() in suffixes)
     
-    if not csv_files:
-        raise FileNotFoundError(f"No CSV files found in directory: {folder_path}")
+    if not files:
+        raise FileNotFoundError(f"No {label} files found in directory: {folder_path}")
     
-    for csv_file in csv_files:
-        name = csv_file.name
-        
-        try:
-            df = pd.read_csv(csv_file)
-            # Best-effort float_id from filename
-            float_id = os.path.splitext(name)[0].split("_")[-2] if "_" in name else os.path.splitext(name)[0]
-
-            # group by N_PROF to form profiles
-            if "N_PROF" not in df.columns or "LATITUDE" not in df.columns or "LONGITUDE" not in df.columns:
-                print(f"Skipping {name}: missing required columns")
-                continue
-                
-            for n_prof, g in df.groupby("N_PROF"):
-                try:
-                    lat = float(g["LATITUDE"].iloc[0])
-                    lon = float(g["LONGITUDE"].iloc[0])
-                    profile = models.Profile(float_id=str(float_id), n_prof=int(n_prof), latitude=lat, longitude=lon)
-                    db.add(profile)
-                    db.flush()
-                    
-                    for _, row in g.iterrows():
-                        m = models.Measurement(
-                            profile_id=profile.id,
-                            n_levels=int(row.get("N_LEVELS", 0)),
-                            pres=float(row.get("PRES", 0.0)) if pd.notna(row.get("PRES")) else 0.0,
-                            temp=float(row.get("TEMP", 0.0)) if pd.notna(row.get("TEMP")) else 0.0,
-                            psal=float(row.get("PSAL", 0.0)) if pd.notna(row.get("PSAL")) else 0.0,
-                        )
-                        db.add(m)
-                except Exception as e:
-                    print(f"Error processing profile {n_prof} in {name}: {e}")
-                    continue
-                    
-            processed_files += 1
-        except Exception as e:
-            print(f"Error processing file {name}: {e}")
-            continue
-            
+    return files
+
+
+def find_csv_files(folder: str):
+    return find_files(folder, (".csv",), "CSV")
+
+
+def find_netcdf_files(folder: str):
+    return find_files(folder, NETCDF_SUFFIXES, "NetCDF")
+
+
+def commit_file(db: Session, result: dict):
+    """Commit one ingested file with its deferred writes; unchanged and failed files keep the data version"""
+    written = result["rows"] or result["profiles"]
+    if written:
+        cache.bump_version(db)
     db.commit()
-    return processed_files
+    ingest_engine.after_commit(db)
+    if written:
+        cache.invalidate()
+
+
+def ingest_files(files, db: Session, workers: Optional[int] = None, progress=None, force: bool = False):
+    """Ingest ``files``, committing after each one so other writes get the writer in between.
+
+    ``progress`` is called with each file's result once it is committed.
+    """
+    def committed(result):
+        commit_file(db, result)
+        if progress is not None:
+            progress(result)
+
+    results = ingest_engine.ingest_files(files, db, workers=workers, progress=committed, force=force)
+    retrieval.flush(db)
+    return {
+        "processed_files": sum(1 for f in results if f["status"] == "ok"),
+        "unchanged_files": sum(1 for f in results if f["status"] == "unchanged"),
+        "rows_written": sum(f["rows"] for f in results),
+        "files": results,
+    }
+
+
+def ingest_csv_folder(folder: str, db: Session, workers: Optional[int] = None, progress=None, force: bool = False):
+    return ingest_files(find_csv_files(folder), db, workers=workers, progress=progress, force=force)
+
+
+def ingest_netcdf_folder(folder: str, db: Session, workers: Optional[int] = None, progress=None, force: bool = False):
+    """Ingest Argo ``.nc`` files directly, without the CSV conversion scripts"""
+    return ingest_files(find_netcdf_files(folder), db, workers=workers, progress=progress, force=force)
+
+
+FILE_FINDERS = {"csv": find_csv_files, "netcdf": find_netcdf_files}
+INGESTERS = {"csv": ingest_csv_folder, "netcdf": ingest_netcdf_folder}
 
 
 @router.get("/debug")
@@ -164,6 +181,7 @@ def create_sample_data():
         
         profiles_created = 0
         measurements_created = 0
+        profile_ids = []
         
         for data in sample_data:
             profile = models.Profile(
@@ -175,6 +193,7 @@ def create_sample_data():
             db.add(profile)
             db.flush()  # Get the profile ID
             profiles_created += 1
+            profile_ids.append(profile.id)
             
             for meas_data in data["measurements"]:
                 measurement = models.Measurement(
@@ -187,13 +206,26 @@ def create_sample_data():
                 db.add(measurement)
                 measurements_created += 1
         
+        db.flush()
+        climatology.rebuild_cells(db, climatology.grid_cells(db, profile_ids))
+        for data in sample_data:
+            interpolation.refresh(db, data["float_id"])
+            partition_stats.refresh(db, data["float_id"])
+            float_stats.refresh(db, data["float_id"])
+        cache.bump_version(db)
         db.commit()
+        cache.invalidate()
+        for data in sample_data:
+            retrieval.refresh(db, data["float_id"])
+        retrieval.flush(db)
         
         return {
             "status": "ok",
             "message": f"Created {profiles_created} sample profiles with {measurements_created} measurements"
         }
         
+    except PoolTimeout:
+        raise
     except Exception as e:
         try:
             db.rollback()
@@ -212,16 +244,29 @@ def create_sample_data():
             pass
 
 
-@router.post("/csv")
-def ingest_csv(folder: str):
+def _run_ingest(source: str, folder: str, workers: Optional[int], background: bool, force: bool):
+    if background:
+        # Hand the folder to the job worker; poll GET /ingest/jobs/{id}
+        try:
+            job_id = jobs.submit(folder, workers=workers, force=force, source=source)
+        except PoolTimeout:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return JSONResponse(status_code=202, content={"status": "queued", "job_id": job_id})
+    
     # Create a fresh session
     db = SessionLocal()
     try:
         # Ensure tables exist
         Base.metadata.create_all(bind=engine, checkfirst=True)
         
-        processed_files = ingest_csv_folder(folder, db)
-        return {"status": "ok", "processed_files": processed_files, "message": f"Successfully processed {processed_files} CSV files"}
+        summary = INGESTERS[source](folder, db, workers=workers, force=force)
+        processed_files = summary["processed_files"]
+        label = "CSV" if source == "csv" else "NetCDF"
+        return {"status": "ok", **summary, "message": f"Successfully processed {processed_files} {label} files"}
+    except PoolTimeout:
+        raise
     except Exception as e:
         try:
             db.rollback()
@@ -239,3 +284,62 @@ def ingest_csv(folder: str):
             db.close()
         except Exception:
             pass  # Ignore close errors
+
+
+@router.post("/csv")
+def ingest_csv(folder: str, workers: Optional[int] = None, background: bool = False, force: bool = False):
+    """Ingest new and changed CSV files; ``force`` rewrites every profile"""
+    return _run_ingest("csv", folder, workers, background, force)
+
+
+@router.post("/netcdf")
+def ingest_netcdf(folder: str = "data/.nc files", workers: Optional[int] = None, background: bool = False,
+                  force: bool = False):
+    """Ingest Argo ``*_prof.nc`` files directly (no CSV conversion)"""
+    return _run_ingest("netcdf", folder, workers, background, force)
+
+
+@router.post("/columnar/rebuild")
+def rebuild_columnar():
+    """Re-export all measurements to the Parquet tier (after enabling COLUMNAR_DIR on an existing database)"""
+    db = SessionLocal()
+    try:
+        rows = columnar.rebuild(db)
+        return {"status": "ok", "rows_written": rows, "directory": columnar.COLUMNAR_DIR}
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        db.close()
+
+
+@router.get("/jobs", response_model=List[schemas.IngestJobOut])
+def list_jobs(limit: int = 20):
+    db = ReadSessionLocal()
+    try:
+        rows = db.query(models.IngestJob).order_by(models.IngestJob.id.desc()).limit(limit).all()
+        return [jobs.job_status(job) for job in rows]
+    finally:
+        db.close()
+
+
+@router.get("/jobs/{job_id}", response_model=schemas.IngestJobOut)
+def get_job(job_id: int):
+    db = ReadSessionLocal()
+    try:
+        job = db.get(models.IngestJob, job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Ingest job {job_id} not found")
+        return jobs.job_status(job)
+    finally:
+        db.close()
+
+
+@router.post("/jobs/{job_id}/cancel", response_model=schemas.IngestJobOut)
+def cancel_job(job_id: int):
+    """Request cancellation; the job stops after the file it is currently writing"""
+    job = jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Ingest job {job_id} not found")
+    return jobs.job_status(job)
@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends, Header, HTTPException
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
+from ..db import AsyncReadSessionLocal
+from .. import schemas, encoding, measurement_query
+
+router = APIRouter(prefix="/measurements", tags=["measurements"])
+
+
+async def get_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+
+@router.post("/query")
+async def query_measurements(
+    query: schemas.MeasurementQuery,
+    accept: Optional[str] = Header(None),
+    db=Depends(get_db, scope="function"),
+):
+    """Batch measurement retrieval across floats/profiles with pressure and lat/lon filters.
+
+    Encoded as JSON, Arrow IPC or NumPy ``.npz`` depending on ``Accept``.
+    """
+    fmt = encoding.media_type(accept)
+    if query.limit is not None and query.limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be positive")
+    try:
+        data, source = await db.run_sync(
+            measurement_query.query_levels, query.variables, float_ids=query.float_ids, profile_ids=query.profile_ids,
+            pres_min=query.pres_min, pres_max=query.pres_max,
+            lat_min=query.lat_min, lat_max=query.lat_max,
+            lon_min=query.lon_min, lon_max=query.lon_max,
+            limit=query.limit,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await run_in_threadpool(encoding.encode, data, fmt, source=source)
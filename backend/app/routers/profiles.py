@@ -1,8 +1,13 @@
-from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi import APIRouter, Depends, Header, Query, HTTPException
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from typing import List
-from ..db import SessionLocal
-from .. import models, schemas
+from typing import List, Optional
+import base64
+import json
+from ..db import SessionLocal, ReadSessionLocal, AsyncReadSessionLocal, PoolTimeout
+from .. import models, schemas, jobs, manifest, columnar, spatial, cache, encoding, measurement_query, climatology, interpolation, retrieval, partition_stats, float_stats
 
 router = APIRouter(prefix="/profiles", tags=["profiles"])
 
@@ -15,26 +20,170 @@ def get_db():
         db.close()
 
 
+def get_read_db():
+    """Session on the reader pool (query-only; never waits for an ingest)"""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db():
+    """Async session on the reader pool: waiting for the database holds no thread"""
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"id": last_id}).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return int(json.loads(base64.urlsafe_b64decode(padded))["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 @router.get("", response_model=schemas.ProfilesResponse)
-def list_profiles(skip: int = 0, limit: int = 50, db: Session = Depends(get_db)):
-    q = db.query(models.Profile)
-    total = q.count()
-    items = q.offset(skip).limit(limit).all()
-    return {"items": items, "total": total}
+async def list_profiles(
+    skip: int = 0,
+    limit: int = Query(50, ge=1),
+    cursor: Optional[str] = None,
+    db=Depends(get_async_read_db, scope="function"),
+):
+    """Profiles ordered by id.
+
+    Pass the returned ``next_cursor`` back as ``cursor`` for the next page:
+    it seeks on the primary key, so deep pages cost the same as the first.
+    ``skip`` (OFFSET paging) is still accepted.  ``total`` is cached until
+    the next ingest or reset.
+    """
+    q = select(models.Profile).order_by(models.Profile.id)
+    if cursor:
+        q = q.where(models.Profile.id > decode_cursor(cursor))
+    elif skip:
+        q = q.offset(skip)
+    items = (await db.execute(q.limit(limit + 1))).scalars().all()
+    next_cursor = encode_cursor(items[limit - 1].id) if len(items) > limit else None
+    return {"items": items[:limit], "total": await cache.profile_count_async(db), "next_cursor": next_cursor}
+
+
+@router.get("/nearest", response_model=schemas.NearestProfilesResponse)
+def nearest_profiles(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    k: int = Query(10, ge=1, le=1000),
+    db: Session = Depends(get_read_db),
+):
+    """The k profiles closest to a point, by great-circle distance"""
+    return {"items": spatial.nearest(db, lat, lon, k)}
+
+
+@router.get("/bbox", response_model=schemas.BBoxProfilesResponse)
+def bbox_profiles(
+    lat_min: float = Query(..., ge=-90, le=90),
+    lat_max: float = Query(..., ge=-90, le=90),
+    lon_min: float = Query(..., ge=-180, le=180),
+    lon_max: float = Query(..., ge=-180, le=180),
+    limit: int = Query(1000, ge=1, le=100000),
+    db: Session = Depends(get_read_db),
+):
+    """Profiles inside a lat/lon box; lon_min > lon_max crosses the antimeridian"""
+    if lat_min > lat_max:
+        raise HTTPException(status_code=400, detail="lat_min must not exceed lat_max")
+    items = spatial.bbox(db, lat_min, lat_max, lon_min, lon_max, limit)
+    return {"items": items, "count": len(items)}
+
+
+# Features serialized per chunk of the streamed FeatureCollection
+TRAJECTORY_CHUNK = 1000
+
+
+def _point_feature(float_id, n_prof, lat, lon) -> dict:
+    return {
+        "type": "Feature",
+        "properties": {"float_id": float_id, "n_prof": n_prof},
+        "geometry": {"type": "Point", "coordinates": [lon, lat]},
+    }
+
+
+async def _stream_trajectories():
+    """Yield a FeatureCollection from a streaming cursor, a chunk of features at a time"""
+    async with AsyncReadSessionLocal() as db:
+        rows = await db.stream(
+            select(models.Profile.float_id, models.Profile.n_prof, models.Profile.latitude, models.Profile.longitude)
+            .order_by(models.Profile.id)
+            .execution_options(yield_per=TRAJECTORY_CHUNK)
+        )
+        yield b'{"type":"FeatureCollection","features":['
+        separator = b""
+        async for chunk in rows.partitions():
+            # One encoder call per chunk; strip the list's brackets
+            features = encoding.dumps([_point_feature(*r) for r in chunk])[1:-1]
+            yield separator + features
+            separator = b","
+        yield b"]}"
 
 
 @router.get("/trajectories")
-def trajectories(db: Session = Depends(get_db)):
-    rows = db.query(models.Profile).all()
-    features = [
-        {
-            "type": "Feature",
-            "properties": {"float_id": r.float_id, "n_prof": r.n_prof},
-            "geometry": {"type": "Point", "coordinates": [r.longitude, r.latitude]},
-        }
-        for r in rows
-    ]
-    return {"type": "FeatureCollection", "features": features}
+async def trajectories():
+    """All profile positions as GeoJSON points, streamed instead of built in memory"""
+    return StreamingResponse(_stream_trajectories(), media_type="application/geo+json")
+
+
+@router.get("/trajectories/{z}/{x}/{y}")
+def trajectory_tile(z: int, x: int, y: int, cell_px: int = Query(4, ge=1, le=64), db: Session = Depends(get_read_db)):
+    """Points and per-float tracks inside one XYZ map tile, thinned by zoom level"""
+    if not 0 <= z <= spatial.MAX_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=400, detail=f"Invalid tile {z}/{x}/{y}")
+
+    features, tracks = [], {}
+    for _, float_id, n_prof, lat, lon in spatial.tile_rows(db, z, x, y, cell_px):
+        features.append(_point_feature(float_id, n_prof, lat, lon))
+        tracks.setdefault(float_id, []).append([lon, lat])
+    for float_id, coordinates in tracks.items():
+        if len(coordinates) > 1:
+            features.append({
+                "type": "Feature",
+                "properties": {"float_id": float_id},
+                "geometry": {"type": "LineString", "coordinates": coordinates},
+            })
+    return Response(content=encoding.dumps({"type": "FeatureCollection", "features": features}),
+                    media_type="application/geo+json")
+
+
+@router.get("/levels")
+async def depth_levels(
+    float_id: List[str] = Query(default=[]),
+    n_prof: Optional[int] = None,
+    pres_min: Optional[float] = None,
+    pres_max: Optional[float] = None,
+    lat_min: Optional[float] = None,
+    lat_max: Optional[float] = None,
+    lon_min: Optional[float] = None,
+    lon_max: Optional[float] = None,
+    columns: str = "float_id,n_prof,pres,temp,psal",
+    accept: Optional[str] = Header(None),
+    db=Depends(get_async_read_db, scope="function"),
+):
+    """Measurement levels (depth-profile scan) with column projection.
+
+    Served from the Parquet tier when ``COLUMNAR_DIR`` is set, otherwise from
+    SQL; encoded as JSON, Arrow or NumPy depending on ``Accept``.
+    """
+    fmt = encoding.media_type(accept)
+    try:
+        data, source = await db.run_sync(
+            measurement_query.query_levels, columns, float_ids=float_id, n_prof=n_prof,
+            pres_min=pres_min, pres_max=pres_max, lat_min=lat_min, lat_max=lat_max,
+            lon_min=lon_min, lon_max=lon_max,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await run_in_threadpool(encoding.encode, data, fmt, source=source)
 
 
 @router.delete("/reset")
@@ -45,16 +194,30 @@ def reset_database(db: Session = Depends(get_db)):
         profile_count = db.query(models.Profile).count()
         measurement_count = db.query(models.Measurement).count()
         
-        # Delete all profiles (cascade will handle measurements)
+        # Bulk deletes bypass the ORM cascade, so clear measurements explicitly
+        db.query(models.Measurement).delete(synchronize_session=False)
         db.query(models.Profile).delete(synchronize_session=False)
         
+        # Forget ingested files so the next ingest reloads them
+        manifest.clear(db)
+        columnar.clear()
+        climatology.clear(db)
+        interpolation.clear(db)
+        partition_stats.clear(db)
+        float_stats.clear(db)
+        cache.bump_version(db)
+        
         # Commit the transaction
         db.commit()
+        cache.invalidate()
+        retrieval.clear()
         
         return {
             "status": "success", 
             "message": f"Successfully deleted {profile_count} profiles and {measurement_count} measurements"
         }
+    except PoolTimeout:
+        raise
     except Exception as e:
         db.rollback()
         error_msg = str(e)
@@ -62,9 +225,18 @@ def reset_database(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Error resetting database: {error_msg}")
 
 
+# Tables recreated by reset-tables; job history, the manifest table and the data version survive
+DATA_TABLES = [
+    models.Profile.__table__, models.Measurement.__table__, models.ClimatologyCell.__table__,
+    models.FloatGrid.__table__, models.FloatStats.__table__, models.FloatSketch.__table__,
+]
+
+
 @router.post("/reset-tables")
 def reset_tables(db: Session = Depends(get_db)):
-    """Alternative reset method - recreate database tables"""
+    """Alternative reset method - recreate the data tables"""
+    if jobs.active(db):
+        raise HTTPException(status_code=409, detail="An ingest job is queued or running; cancel it or wait before resetting")
     try:
         from ..db import Base, engine
         
@@ -76,14 +248,47 @@ def reset_tables(db: Session = Depends(get_db)):
         db.close()
         
         # Drop and recreate tables
-        Base.metadata.drop_all(bind=engine)
-        Base.metadata.create_all(bind=engine)
+        Base.metadata.drop_all(bind=engine, tables=DATA_TABLES)
+        Base.metadata.create_all(bind=engine, tables=DATA_TABLES)
+        spatial.ensure_spatial_index(engine)
+        columnar.clear()
+        # Forget ingested files so the next ingest reloads them
+        manifest.clear(db)
+        cache.bump_version(db)
+        db.commit()
+        cache.invalidate()
+        retrieval.clear()
         
         return {
             "status": "success", 
             "message": f"Successfully reset database (removed {profile_count} profiles and {measurement_count} measurements)"
         }
+    except PoolTimeout:
+        raise
     except Exception as e:
         error_msg = str(e)
         print(f"Reset tables error: {error_msg}")  # For debugging
         raise HTTPException(status_code=500, detail=f"Error resetting tables: {error_msg}")
+
+
+@router.get("/{profile_id}/measurements")
+async def profile_measurements(
+    profile_id: int,
+    variables: str = "pres,temp,psal",
+    pres_min: Optional[float] = None,
+    pres_max: Optional[float] = None,
+    accept: Optional[str] = Header(None),
+    db=Depends(get_async_read_db, scope="function"),
+):
+    """Measurements of one profile, shallowest first; ``variables`` picks the columns"""
+    fmt = encoding.media_type(accept)
+    if await db.get(models.Profile, profile_id) is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    try:
+        data, _ = await db.run_sync(
+            measurement_query.query_levels, variables, profile_ids=[profile_id], pres_min=pres_min, pres_max=pres_max,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Encoding is CPU work: keep it off the event loop
+    return await run_in_threadpool(encoding.encode, data, fmt, profile_id=profile_id)
@@ -0,0 +1,77 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from typing import Optional
+from ..db import SessionLocal, ReadSessionLocal, PoolTimeout
+from .. import partition_stats, cache
+
+router = APIRouter(prefix="/stats", tags=["stats"])
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_read_db():
+    """Session on the reader pool (query-only; never waits for an ingest)"""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@router.get("/summary")
+def summary(
+    float_ids: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    pres_min: Optional[float] = None,
+    pres_max: Optional[float] = None,
+    variables: str = "temp,psal",
+    db: Session = Depends(get_read_db),
+):
+    """Count, mean, std, min, max and histogram per variable plus float/profile counts for any filter combination.
+
+    Merged from precomputed float × month × depth band sketches: ``start``/``end``
+    (``YYYY-MM`` or ``YYYY-MM-DD``) select whole months and ``pres_min``/``pres_max``
+    whole depth bands (see ``pressure_range``).  ``distinct_profiles`` is an estimate.
+    """
+    selected = [v.strip() for v in variables.split(",") if v.strip()]
+    unknown = [v for v in selected if v not in partition_stats.VARIABLES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown variables: {unknown}. Available: {list(partition_stats.VARIABLES)}")
+    try:
+        result = partition_stats.summary(
+            db,
+            float_ids=[f.strip() for f in float_ids.split(",") if f.strip()] if float_ids else None,
+            start=start,
+            end=end,
+            pres_min=pres_min,
+            pres_max=pres_max,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid date: {e}")
+    for name in partition_stats.VARIABLES:
+        if name not in selected:
+            result.pop(name, None)
+    return result
+
+
+@router.post("/rebuild")
+def rebuild(db: Session = Depends(get_db)):
+    """Recompute every float's statistics sketch from its measurements"""
+    try:
+        floats = partition_stats.rebuild(db)
+        db.commit()
+        cache.invalidate()
+        return {"status": "ok", "floats": floats}
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        db.rollback()
+        print(f"Statistics rebuild error: {e}")
+        raise HTTPException(status_code=500, detail=f"Error rebuilding statistics: {e}")
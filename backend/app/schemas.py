@@ -1,3 +1,4 @@
+from datetime import datetime
 from pydantic import BaseModel
 from typing import List, Optional
 
@@ -20,13 +21,53 @@ class ProfileOut(BaseModel):
     n_prof: int
     latitude: float
     longitude: float
+    juld: Optional[float] = None
     class Config:
         from_attributes = True
 
+class NearestProfileOut(ProfileOut):
+    distance_km: float
+
+class NearestProfilesResponse(BaseModel):
+    items: List[NearestProfileOut]
+
+class BBoxProfilesResponse(BaseModel):
+    items: List[ProfileOut]
+    count: int
+
 class ProfilesResponse(BaseModel):
     items: List[ProfileOut]
     total: int
+    next_cursor: Optional[str] = None
+
+class MeasurementQuery(BaseModel):
+    float_ids: List[str] = []
+    profile_ids: List[int] = []
+    pres_min: Optional[float] = None
+    pres_max: Optional[float] = None
+    lat_min: Optional[float] = None
+    lat_max: Optional[float] = None
+    lon_min: Optional[float] = None
+    lon_max: Optional[float] = None
+    variables: List[str] = ["float_id", "n_prof", "pres", "temp", "psal"]
+    limit: Optional[int] = None
 
 class IngestCSVRequest(BaseModel):
     folder: str
     float_id: Optional[str] = None
+
+class IngestJobOut(BaseModel):
+    id: int
+    folder: str
+    source: Optional[str] = "csv"
+    status: str
+    files_total: int
+    files_done: int
+    rows_written: int
+    rows_per_sec: float
+    elapsed_seconds: Optional[float] = None
+    cancel_requested: bool
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
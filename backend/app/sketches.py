@@ -0,0 +1,281 @@
+"""Mergeable statistics sketches over partitions of measurement rows.
+
+Rows are grouped by integer partition keys (for example float × month ×
+depth band).  Each partition keeps, per variable, count, sum, sum of
+squares, min, max and a fixed-bin histogram (``HISTOGRAM_EDGES``), plus
+HyperLogLog registers for distinct counts of ids such as profiles.  All of
+these merge exactly (addition, min/max, register-wise max), so any filter
+that is a union of partitions is answered by ``summarize`` over the
+selected partitions instead of a scan of the rows.
+
+A sketch is a flat ``{name: ndarray}`` dict with one entry per partition
+(``key_*``, ``count_*``, ``sum_*``, ``sumsq_*``, ``min_*``, ``max_*``,
+``hist_*``, ``hll_*``), so it concatenates and saves as ``.npz`` directly.
+NumPy only: the Streamlit dashboard imports this module as well.
+"""
+import io
+
+import numpy as np
+
+HISTOGRAM_EDGES = {
+    "temp": np.linspace(-2.0, 34.0, 73),  # 0.5 °C bins
+    "psal": np.linspace(30.0, 38.0, 81),  # 0.1 PSU bins
+}
+
+# Registers per HyperLogLog sketch = 2 ** precision (standard error ~1.04 / sqrt(registers))
+HLL_PRECISION = 8
+
+# Month key of rows without a date
+UNDATED = np.iinfo(np.int32).min
+
+_EPOCH_1950 = np.datetime64("1950-01-01", "D")
+
+
+def month_key(juld=None, dates=None) -> np.ndarray:
+    """Months since 1970-01 from Argo JULD days or datetime64 values; ``UNDATED`` where missing"""
+    if dates is None:
+        juld = np.asarray(juld, dtype=np.float64)
+        ok = np.isfinite(juld)
+        dates = _EPOCH_1950 + np.where(ok, np.floor(np.where(ok, juld, 0)), 0).astype("timedelta64[D]")
+    else:
+        dates = np.asarray(dates).astype("datetime64[D]")
+        ok = ~np.isnat(dates)
+    return np.where(ok, dates.astype("datetime64[M]").astype(np.int64), UNDATED).astype(np.int32)
+
+
+def month_of(value) -> int:
+    """Month key of a date, datetime or ``YYYY-MM[-DD]`` string"""
+    return int(np.datetime64(value, "M").astype(np.int64))
+
+
+def depth_band(pres, edges) -> np.ndarray:
+    """Band index of each pressure (band ``i`` is ``edges[i] <= p < edges[i + 1]``, the last is open); -1 if missing"""
+    pres = np.asarray(pres, dtype=np.float64)
+    band = np.maximum(np.searchsorted(edges, np.where(np.isfinite(pres), pres, 0), side="right") - 1, 0)
+    return np.where(np.isfinite(pres), band, -1).astype(np.int16)
+
+
+def bands_overlapping(edges, low=None, high=None) -> tuple:
+    """``(first, last)`` band indices that intersect the pressure range ``[low, high]``"""
+    first = 0 if low is None else int(max(np.searchsorted(edges, low, side="right") - 1, 0))
+    last = len(edges) - 1 if high is None else int(max(np.searchsorted(edges, high, side="right") - 1, 0))
+    return first, last
+
+
+def hash64(ids) -> np.ndarray:
+    """SplitMix64 of integer ids"""
+    x = np.asarray(ids).astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    # frexp's exponent is the bit length; float64 rounding can only matter for values >= 2**53
+    return np.frexp(values.astype(np.float64))[1]
+
+
+def hll_registers(group: np.ndarray, n_groups: int, ids, precision: int = HLL_PRECISION) -> np.ndarray:
+    """HyperLogLog registers ``(n_groups, 2 ** precision)`` of ``ids`` per group"""
+    m = 1 << precision
+    registers = np.zeros((n_groups, m), dtype=np.uint8)
+    if group.shape[0]:
+        h = hash64(ids)
+        index = (h & np.uint64(m - 1)).astype(np.int64)
+        rank = (64 - precision) - _bit_length(h >> np.uint64(precision)) + 1
+        np.maximum.at(registers, (group, index), rank.astype(np.uint8))
+    return registers
+
+
+def hll_estimate(registers: np.ndarray) -> float:
+    """Cardinality estimate of one register array (linear counting while sparse)"""
+    m = registers.shape[-1]
+    alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+    estimate = alpha * m * m / np.sum(np.exp2(-registers.astype(np.float64)))
+    zeros = int(np.count_nonzero(registers == 0))
+    if estimate <= 2.5 * m and zeros:
+        return m * np.log(m / zeros)
+    return float(estimate)
+
+
+def _empty(keys, values, distinct, precision) -> dict:
+    sketch = {f"key_{name}": np.empty(0, dtype=np.int64) for name in keys}
+    for var in values:
+        for stat in ("count", "sum", "sumsq", "min", "max"):
+            sketch[f"{stat}_{var}"] = np.empty(0, dtype=np.int64 if stat == "count" else np.float64)
+        sketch[f"hist_{var}"] = np.empty((0, HISTOGRAM_EDGES[var].shape[0] - 1), dtype=np.uint32)
+    for name in distinct:
+        sketch[f"hll_{name}"] = np.empty((0, 1 << precision), dtype=np.uint8)
+    return sketch
+
+
+def _groups(columns: list):
+    """Partition number of every row, number of partitions and each partition's key values"""
+    low = [int(col.min()) for col in columns]
+    spans = [int(col.max()) - lo + 1 for col, lo in zip(columns, low)]
+    n = columns[0].shape[0]
+    if np.prod(np.array(spans, dtype=np.float64)) <= max(4 * n, 1 << 20):
+        # Small key space: dense codes, no sort
+        code = np.zeros(n, dtype=np.int64)
+        for col, lo, span in zip(columns, low, spans):
+            code = code * span + (col - lo)
+        occupied = np.bincount(code, minlength=int(np.prod(spans))) > 0
+        group = (np.cumsum(occupied) - 1)[code]
+        n_groups = int(occupied.sum())
+    else:
+        _, group = np.unique(np.stack(columns, axis=1), axis=0, return_inverse=True)
+        group = group.reshape(-1)
+        n_groups = int(group.max()) + 1
+    keys = []
+    for col in columns:
+        values = np.empty(n_groups, dtype=np.int64)
+        values[group] = col
+        keys.append(values)
+    return group, n_groups, keys
+
+
+def build(keys: dict, values: dict, distinct: dict = None, precision: int = HLL_PRECISION) -> dict:
+    """Sketch per distinct combination of the integer row ``keys``.
+
+    ``values`` maps variable names (keys of ``HISTOGRAM_EDGES``) to per-row
+    values (NaN = missing); ``distinct`` maps names to per-row integer ids
+    counted with HyperLogLog.  Partitions come out in key order.
+    """
+    distinct = distinct or {}
+    columns = [np.asarray(col, dtype=np.int64) for col in keys.values()]
+    n = columns[0].shape[0] if columns else 0
+    if n == 0:
+        return _empty(keys, values, distinct, precision)
+
+    group, n_groups, key_values = _groups(columns)
+    sketch = {f"key_{name}": values for name, values in zip(keys, key_values)}
+    for var, vals in values.items():
+        vals = np.asarray(vals, dtype=np.float64)
+        ok = np.isfinite(vals)
+        group_ok, vals = group[ok], vals[ok]
+        sketch[f"count_{var}"] = np.bincount(group_ok, minlength=n_groups).astype(np.int64)
+        sketch[f"sum_{var}"] = np.bincount(group_ok, weights=vals, minlength=n_groups)
+        sketch[f"sumsq_{var}"] = np.bincount(group_ok, weights=vals * vals, minlength=n_groups)
+        sketch[f"min_{var}"] = np.full(n_groups, np.nan)
+        np.fmin.at(sketch[f"min_{var}"], group_ok, vals)
+        sketch[f"max_{var}"] = np.full(n_groups, np.nan)
+        np.fmax.at(sketch[f"max_{var}"], group_ok, vals)
+        edges = HISTOGRAM_EDGES[var]
+        n_bins = edges.shape[0] - 1
+        # Edges are evenly spaced: the bin is arithmetic, clipped into the end bins
+        bins = np.clip(np.floor((vals - edges[0]) * (n_bins / (edges[-1] - edges[0]))), 0, n_bins - 1).astype(np.int64)
+        hist = np.bincount(group_ok * n_bins + bins, minlength=n_groups * n_bins).reshape(n_groups, n_bins)
+        sketch[f"hist_{var}"] = hist.astype(np.uint32)
+    for name, ids in distinct.items():
+        sketch[f"hll_{name}"] = hll_registers(group, n_groups, ids, precision)
+    return sketch
+
+
+def size(sketch: dict) -> int:
+    """Number of partitions"""
+    return next(iter(sketch.values())).shape[0] if sketch else 0
+
+
+def concat(sketches: list) -> dict:
+    """Partitions of several sketches with the same layout"""
+    sketches = [s for s in sketches if s]
+    if not sketches:
+        return {}
+    return {name: np.concatenate([s[name] for s in sketches]) for name in sketches[0]}
+
+
+def combine(sketch: dict) -> dict:
+    """Merge partitions with equal keys (e.g. after ``concat`` of an old and a new sketch)"""
+    names = [name for name in sketch if name.startswith("key_")]
+    n = size(sketch)
+    if n == 0 or not names:
+        return sketch
+    columns = [sketch[name] for name in names]
+    order = np.lexsort(columns[::-1])
+    change = np.zeros(n, dtype=bool)
+    change[0] = True
+    for col in columns:
+        sorted_col = col[order]
+        change[1:] |= sorted_col[1:] != sorted_col[:-1]
+    starts = np.flatnonzero(change)
+    merged = {}
+    for name, values in sketch.items():
+        values = values[order]
+        if name.startswith("key_"):
+            merged[name] = values[starts]
+        elif name.startswith("min_"):
+            merged[name] = np.fmin.reduceat(values, starts)
+        elif name.startswith("max_"):
+            merged[name] = np.fmax.reduceat(values, starts)
+        elif name.startswith("hll_"):
+            merged[name] = np.maximum.reduceat(values, starts, axis=0)
+        else:
+            merged[name] = np.add.reduceat(values, starts, axis=0).astype(values.dtype)
+    return merged
+
+
+def select(sketch: dict, **conditions) -> np.ndarray:
+    """Partitions whose ``key_<name>`` is in ``conditions[name]``.
+
+    A condition is an inclusive ``(low, high)`` tuple (either end None) or a
+    list/set/array of allowed values; None means no restriction.
+    """
+    mask = np.ones(size(sketch), dtype=bool)
+    for name, condition in conditions.items():
+        if condition is None:
+            continue
+        keys = sketch[f"key_{name}"]
+        if isinstance(condition, tuple):
+            low, high = condition
+            if low is not None:
+                mask &= keys >= low
+            if high is not None:
+                mask &= keys <= high
+        else:
+            mask &= np.isin(keys, np.asarray(list(condition), dtype=np.int64))
+    return mask
+
+
+def _number(value):
+    return None if value is None or not np.isfinite(value) else float(value)
+
+
+def summarize(sketch: dict, mask=None) -> dict:
+    """Merge the selected partitions into count/mean/std/min/max/histogram per variable and distinct estimates"""
+    mask = np.ones(size(sketch), dtype=bool) if mask is None else mask
+    result = {"partitions": int(mask.sum())}
+    for name in sketch:
+        if name.startswith("count_"):
+            var = name[len("count_"):]
+            count = int(sketch[name][mask].sum())
+            total = float(sketch[f"sum_{var}"][mask].sum())
+            sumsq = float(sketch[f"sumsq_{var}"][mask].sum())
+            mean = total / count if count else None
+            variance = max(sumsq - total * total / count, 0.0) / (count - 1) if count > 1 else None
+            result[var] = {
+                "count": count,
+                "mean": mean,
+                "std": None if variance is None else float(np.sqrt(variance)),
+                "min": _number(np.nanmin(sketch[f"min_{var}"][mask])) if count else None,
+                "max": _number(np.nanmax(sketch[f"max_{var}"][mask])) if count else None,
+                "histogram": {
+                    "edges": HISTOGRAM_EDGES[var].tolist(),
+                    "counts": sketch[f"hist_{var}"][mask].sum(axis=0, dtype=np.int64).tolist(),
+                },
+            }
+        elif name.startswith("hll_"):
+            registers = sketch[name][mask]
+            estimate = hll_estimate(registers.max(axis=0)) if registers.shape[0] else 0.0
+            result[f"distinct_{name[len('hll_'):]}"] = int(round(estimate))
+    return result
+
+
+def to_bytes(sketch: dict) -> bytes:
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **sketch)
+    return buffer.getvalue()
+
+
+def from_bytes(data: bytes) -> dict:
+    with np.load(io.BytesIO(data)) as arrays:
+        return {name: arrays[name] for name in arrays.files}
@@ -0,0 +1,226 @@
+"""Spatial index for profile positions.
+
+On SQLite the index is an R*Tree virtual table, ``profiles_rtree``, kept in
+sync with ``profiles`` by triggers, so every write path (bulk ingest, ORM
+inserts, resets) maintains it without extra code.  Bounding-box lookups hit
+the R*Tree and are then checked against the exact coordinates; nearest
+neighbour search widens a box around the point until it provably holds the
+``k`` closest profiles and ranks them by haversine distance.  On PostgreSQL
+with PostGIS, nearest neighbours come from the GiST index on
+``profiles.location`` (see postgres.py); bounding boxes stay on latitude and
+longitude, since a lat/lon box is not a geodesic polygon.  Other databases
+(or SQLite builds without R*Tree) fall back to the latitude and longitude
+B-tree indexes.
+"""
+import math
+
+import numpy as np
+from sqlalchemy import and_, column, or_, select, table
+from sqlalchemy.orm import Session
+
+from . import models, postgres
+from .trajectory import EARTH_RADIUS_KM, haversine_km
+
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180.0
+
+# Half-width (degrees) of the first nearest-neighbour search box
+INITIAL_RADIUS_DEG = 1.0
+
+RTREE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS profiles_rtree USING rtree(id, min_lat, max_lat, min_lon, max_lon)",
+    """CREATE TRIGGER IF NOT EXISTS profiles_rtree_insert AFTER INSERT ON profiles
+       WHEN NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL
+       BEGIN
+           INSERT OR REPLACE INTO profiles_rtree VALUES (NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS profiles_rtree_update AFTER UPDATE OF latitude, longitude ON profiles
+       BEGIN
+           DELETE FROM profiles_rtree WHERE id = OLD.id;
+           INSERT INTO profiles_rtree SELECT NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude
+           WHERE NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS profiles_rtree_delete AFTER DELETE ON profiles
+       BEGIN
+           DELETE FROM profiles_rtree WHERE id = OLD.id;
+       END""",
+]
+
+PROFILES_RTREE = table("profiles_rtree", column("id"), column("min_lat"), column("max_lat"),
+                       column("min_lon"), column("max_lon"))
+
+_rtree_available = {}
+_postgis_available = {}
+
+
+def ensure_spatial_index(engine) -> bool:
+    """Create the R*Tree and its triggers (PostGIS column and GiST index on
+    PostgreSQL) if needed and resync it with ``profiles``.
+
+    Safe to call repeatedly (startup, after the tables are recreated).
+    Returns whether a spatial index is in use.
+    """
+    if engine.dialect.name == "postgresql":
+        _rtree_available[engine.url] = False
+        _postgis_available[engine.url] = postgres.ensure_postgis(engine)
+        return _postgis_available[engine.url]
+    if engine.dialect.name != "sqlite":
+        _rtree_available[engine.url] = False
+        return False
+    try:
+        with engine.begin() as conn:
+            for ddl in RTREE_DDL:
+                conn.exec_driver_sql(ddl)
+            indexed = conn.exec_driver_sql("SELECT count(*) FROM profiles_rtree").scalar()
+            located = conn.exec_driver_sql(
+                "SELECT count(*) FROM profiles WHERE latitude IS NOT NULL AND longitude IS NOT NULL"
+            ).scalar()
+            if indexed != located:
+                conn.exec_driver_sql("DELETE FROM profiles_rtree")
+                conn.exec_driver_sql(
+                    "INSERT INTO profiles_rtree SELECT id, latitude, latitude, longitude, longitude FROM profiles "
+                    "WHERE latitude IS NOT NULL AND longitude IS NOT NULL"
+                )
+        _rtree_available[engine.url] = True
+    except Exception as e:
+        print(f"R*Tree spatial index unavailable, using B-tree indexes: {e}")
+        _rtree_available[engine.url] = False
+    return _rtree_available[engine.url]
+
+
+def _uses_rtree(db: Session) -> bool:
+    return _rtree_available.get(db.get_bind().url, False)
+
+
+def _uses_postgis(db: Session) -> bool:
+    return _postgis_available.get(db.get_bind().url, False)
+
+
+def _lon_ranges(lon_min: float, lon_max: float):
+    """Split a longitude range that crosses the antimeridian (lon_min > lon_max)"""
+    if lon_min <= lon_max:
+        return [(lon_min, lon_max)]
+    return [(lon_min, 180.0), (-180.0, lon_max)]
+
+
+def _box_rows(db: Session, lat_min, lat_max, lon_min, lon_max, limit=None):
+    p = models.Profile
+    lon_ranges = _lon_ranges(lon_min, lon_max)
+    q = select(p.id, p.float_id, p.n_prof, p.latitude, p.longitude).where(
+        p.latitude >= lat_min,
+        p.latitude <= lat_max,
+        or_(*(and_(p.longitude >= lo, p.longitude <= hi) for lo, hi in lon_ranges)),
+    )
+    if _uses_rtree(db):
+        # R*Tree bounds are 32-bit and rounded outwards, so test overlap here
+        # and let the exact predicate above trim the edges
+        q = q.join(PROFILES_RTREE, PROFILES_RTREE.c.id == p.id).where(
+            PROFILES_RTREE.c.max_lat >= lat_min,
+            PROFILES_RTREE.c.min_lat <= lat_max,
+            or_(*(and_(PROFILES_RTREE.c.max_lon >= lo, PROFILES_RTREE.c.min_lon <= hi) for lo, hi in lon_ranges)),
+        )
+    q = q.order_by(p.id)
+    if limit is not None:
+        q = q.limit(limit)
+    return db.execute(q).all()
+
+
+def bbox(db: Session, lat_min: float, lat_max: float, lon_min: float, lon_max: float, limit: int = 1000) -> list:
+    """Profiles inside a box; ``lon_min > lon_max`` means the box crosses the antimeridian"""
+    return [
+        {"id": r[0], "float_id": r[1], "n_prof": r[2], "latitude": r[3], "longitude": r[4]}
+        for r in _box_rows(db, lat_min, lat_max, lon_min, lon_max, limit)
+    ]
+
+
+def _window(lat: float, lon: float, radius_km: float):
+    """Lat/lon box guaranteed to contain every point within ``radius_km``"""
+    dlat = radius_km / KM_PER_DEGREE
+    lat_min, lat_max = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+    if lat_min <= -90.0 or lat_max >= 90.0:
+        return lat_min, lat_max, -180.0, 180.0
+    dlon = dlat / max(math.cos(math.radians(max(abs(lat_min), abs(lat_max)))), 1e-12)
+    if dlon >= 180.0:
+        return lat_min, lat_max, -180.0, 180.0
+    wrap = lambda x: (x + 180.0) % 360.0 - 180.0
+    return lat_min, lat_max, wrap(lon - dlon), wrap(lon + dlon)
+
+
+def nearest(db: Session, lat: float, lon: float, k: int = 10) -> list:
+    """The ``k`` profiles closest to (lat, lon), nearest first, with ``distance_km``"""
+    if _uses_postgis(db):
+        rows = postgres.nearest_rows(db, lat, lon, k)
+        distances = haversine_km(lat, lon, [r[3] for r in rows], [r[4] for r in rows]) if rows else np.empty(0)
+        return [
+            {"id": r[0], "float_id": r[1], "n_prof": r[2], "latitude": r[3], "longitude": r[4],
+             "distance_km": float(d)}
+            for r, d in zip(rows, distances)
+        ]
+    radius_km = INITIAL_RADIUS_DEG * KM_PER_DEGREE
+    while True:
+        window = _window(lat, lon, radius_km)
+        rows = _box_rows(db, *window)
+        whole_globe = window == (-90.0, 90.0, -180.0, 180.0)
+        if len(rows) >= k or whole_globe:
+            distances = haversine_km(lat, lon, [r[3] for r in rows], [r[4] for r in rows]) if rows else np.empty(0)
+            order = np.argsort(distances, kind="stable")[:k]
+            # The box is only conclusive when the k-th distance fits inside its radius
+            if whole_globe or len(order) == 0 or distances[order[-1]] <= radius_km:
+                return [
+                    {"id": rows[i][0], "float_id": rows[i][1], "n_prof": rows[i][2],
+                     "latitude": rows[i][3], "longitude": rows[i][4], "distance_km": float(distances[i])}
+                    for i in order
+                ]
+            radius_km = float(distances[order[-1]])
+        else:
+            radius_km *= 2
+
+
+# Web-Mercator tiles (XYZ scheme, 256 px) for the trajectory map
+TILE_SIZE = 256
+MAX_MERCATOR_LAT = 85.0511287798
+MAX_ZOOM = 22
+
+
+def tile_bounds(z: int, x: int, y: int):
+    """``(lat_min, lat_max, lon_min, lon_max)`` of an XYZ tile"""
+    n = 2 ** z
+    lon_min = x / n * 360.0 - 180.0
+    lon_max = (x + 1) / n * 360.0 - 180.0
+    lat_max = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    lat_min = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return lat_min, lat_max, lon_min, lon_max
+
+
+def _tile_pixels(lat, lon, z: int, x: int, y: int):
+    """Pixel coordinates of points inside tile (z, x, y)"""
+    n = 2 ** z
+    lat = np.radians(np.clip(lat, -MAX_MERCATOR_LAT, MAX_MERCATOR_LAT))
+    px = ((lon + 180.0) / 360.0 * n - x) * TILE_SIZE
+    py = ((1 - np.log(np.tan(lat) + 1 / np.cos(lat)) / math.pi) / 2 * n - y) * TILE_SIZE
+    return px, py
+
+
+def tile_rows(db: Session, z: int, x: int, y: int, cell_px: int = 4):
+    """Profiles in a tile, thinned to one per float per ``cell_px`` square of pixels.
+
+    Rows are returned ordered by ``(float_id, n_prof)`` so consecutive rows of
+    a float form its track.  At low zoom a cell spans many kilometres and
+    dense tracks collapse to a few vertices; zooming in restores detail.
+    """
+    rows = _box_rows(db, *tile_bounds(z, x, y))
+    if not rows:
+        return []
+    lat = np.fromiter((r[3] for r in rows), dtype=np.float64, count=len(rows))
+    lon = np.fromiter((r[4] for r in rows), dtype=np.float64, count=len(rows))
+    floats, float_code = np.unique([r[1] or "" for r in rows], return_inverse=True)
+    n_prof = np.fromiter((r[2] if r[2] is not None else -1 for r in rows), dtype=np.int64, count=len(rows))
+
+    order = np.lexsort((n_prof, float_code))
+    px, py = _tile_pixels(lat[order], lon[order], z, x, y)
+    cells = np.column_stack([
+        float_code[order],
+        np.clip(px // cell_px, 0, TILE_SIZE // cell_px - 1),
+        np.clip(py // cell_px, 0, TILE_SIZE // cell_px - 1),
+    ]).astype(np.int64)
+    _, first = np.unique(cells, axis=0, return_index=True)
+    return [rows[i] for i in order[np.sort(first)]]
@@ -0,0 +1,242 @@
+"""Database location and SQLite connection configuration.
+
+SQLite allows one writer at a time, so the API uses two engines on the
+same file:
+
+- ``writer``: a pool of exactly one connection.  Sessions that write
+  queue for it (up to ``SQLITE_WRITER_WAIT`` seconds) instead of racing
+  for the file lock and failing with "database is locked".
+- ``reader``: a pool of ``SQLITE_READERS`` connections opened with
+  ``query_only``.  In WAL mode readers see the last committed state and
+  never wait for the writer, so listing profiles stays fast during ingest.
+
+Every connection gets ``synchronous``, ``mmap_size``, ``cache_size`` and
+``busy_timeout`` from the environment (defaults below); the writer puts the
+database in ``journal_mode`` (default WAL, which persists in the file).
+A server (``DATABASE_URL`` pointing at PostgreSQL, see postgres.py) has
+MVCC and concurrent writers, so one pooled engine serves both roles with
+``DB_POOL_SIZE`` connections (plus as many overflow) checked before use.
+
+``async def`` endpoints read through ``create_async_engine``: the reader
+settings on aiosqlite, or asyncpg / psycopg on PostgreSQL, so a request
+waiting for the database holds no thread.  Without an async driver (or
+with ``ASYNC_DATABASE=0``, or an in-memory database, which another driver
+could not share) ``ThreadedSession`` runs the same calls on the thread pool.
+"""
+import asyncio
+import contextlib
+import os
+import tempfile
+import weakref
+from pathlib import Path
+
+import anyio.to_thread
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import StaticPool
+
+JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+# Negative: KiB, as in PRAGMA cache_size (default 64 MiB per connection)
+CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))
+BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+READERS = int(os.getenv("SQLITE_READERS", "8"))
+# Seconds a session waits for the writer connection (an ingest file holds it for one transaction)
+WRITER_WAIT = float(os.getenv("SQLITE_WRITER_WAIT", "120"))
+# Connection pool of a database server
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+# Async sessions for the async read endpoints (0: run them on the thread pool)
+ASYNC_DATABASE = os.getenv("ASYNC_DATABASE", "1") != "0"
+
+
+def _writable(path: Path) -> bool:
+    """True if a database (plus its -wal/-shm files) can be created or written at ``path``"""
+    if path.exists():
+        return os.access(path, os.W_OK) and os.access(path.parent, os.W_OK | os.X_OK)
+    parent = path.parent
+    while not parent.exists() and parent != parent.parent:
+        parent = parent.parent
+    return os.access(parent, os.W_OK | os.X_OK)
+
+
+def database_url() -> str:
+    """``DATABASE_URL``, otherwise SQLite in the first writable location (in memory on Streamlit Cloud)"""
+    if "DATABASE_URL" in os.environ:
+        url = os.environ["DATABASE_URL"]
+        # Hosting providers hand out postgres://, which SQLAlchemy no longer accepts
+        return "postgresql://" + url[len("postgres://"):] if url.startswith("postgres://") else url
+
+    # Read-only filesystem on Streamlit Cloud
+    if os.getenv("STREAMLIT_SHARING_MODE") or os.getenv("STREAMLIT_CLOUD"):
+        return "sqlite:///:memory:"
+
+    possible_locations = [
+        Path(tempfile.gettempdir()) / "argo.db",
+        Path.home() / ".argo" / "argo.db",
+        Path.cwd() / "argo.db",
+        # Backend data directory (local development)
+        Path(__file__).parent.parent / "data" / "argo.db",
+    ]
+    for db_path in possible_locations:
+        if _writable(db_path):
+            return f"sqlite:///{db_path}"
+
+    print("Warning: Could not find writable location for database, using in-memory SQLite")
+    return "sqlite:///:memory:"
+
+
+def _set_pragmas(engine, writer: bool):
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+            if writer:
+                cursor.execute(f"PRAGMA journal_mode = {JOURNAL_MODE}")
+            cursor.execute(f"PRAGMA synchronous = {SYNCHRONOUS}")
+            cursor.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+            cursor.execute(f"PRAGMA cache_size = {CACHE_SIZE}")
+            if not writer:
+                cursor.execute("PRAGMA query_only = ON")
+        finally:
+            cursor.close()
+
+
+def create_engines(url: str):
+    """``(writer, reader)`` engines for ``url``; the same engine twice when there is nothing to split"""
+    if not url.startswith("sqlite"):
+        engine = create_engine(url, pool_size=POOL_SIZE, max_overflow=POOL_SIZE, pool_pre_ping=True, echo=False)
+        return engine, engine
+
+    connect_args = {"check_same_thread": False}
+    if ":memory:" in url or url in ("sqlite://", "sqlite:///"):
+        # One shared in-memory database: a single connection serves everyone
+        engine = create_engine(url, connect_args=connect_args, poolclass=StaticPool, echo=False)
+        _set_pragmas(engine, writer=True)
+        return engine, engine
+
+    path = Path(url.split("///", 1)[1].split("?", 1)[0])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    writer = create_engine(url, connect_args=connect_args, pool_size=1, max_overflow=0,
+                           pool_timeout=WRITER_WAIT, echo=False)
+    reader = create_engine(url, connect_args=connect_args, pool_size=READERS, max_overflow=READERS,
+                           echo=False)
+    _set_pragmas(writer, writer=True)
+    _set_pragmas(reader, writer=False)
+    return writer, reader
+
+
+def _async_url(url: str):
+    """``url`` with an asyncio driver, or None when there is none for its database"""
+    if url.startswith("sqlite"):
+        if ":memory:" in url or url in ("sqlite://", "sqlite:///"):
+            return None
+        return "sqlite+aiosqlite://" + url.split("://", 1)[1]
+    if url.startswith("postgresql"):
+        scheme, rest = url.split("://", 1)
+        # psycopg 3 is async already; any other driver is swapped for asyncpg
+        return url if scheme == "postgresql+psycopg" else "postgresql+asyncpg://" + rest
+    return None
+
+
+def create_async_engine(url: str):
+    """Async reader engine for ``url``, or None (see ``ThreadedSession``)"""
+    async_url = _async_url(url) if ASYNC_DATABASE else None
+    if async_url is None:
+        return None
+    try:
+        from sqlalchemy.ext.asyncio import create_async_engine as create
+        slots = read_slots(url)
+        engine = create(async_url, pool_size=slots // 2, max_overflow=slots - slots // 2, echo=False)
+    except ImportError as e:
+        print(f"Async database driver unavailable, async endpoints use the thread pool: {e}")
+        return None
+    if url.startswith("sqlite"):
+        _set_pragmas(engine.sync_engine, writer=False)
+    return engine
+
+
+class _ThreadedStream:
+    def __init__(self, result):
+        self._result = result
+
+    async def partitions(self, size=None):
+        chunks = self._result.partitions(size)
+        while True:
+            chunk = await anyio.to_thread.run_sync(next, chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+
+
+class ThreadedSession:
+    """The ``AsyncSession`` calls the routers use, over a sync session on the thread pool.
+
+    Every call returns its connection before giving the thread back: a
+    session holding a connection between calls while other threads wait for
+    the pool would deadlock once every thread is waiting.
+    """
+
+    def __init__(self, session):
+        self.sync_session = session
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _call(self, fn):
+        def call():
+            try:
+                return fn()
+            finally:
+                self.sync_session.close()
+        return await anyio.to_thread.run_sync(call)
+
+    async def execute(self, statement, params=None):
+        frozen = await self._call(lambda: self.sync_session.execute(statement, params).freeze())
+        return frozen()
+
+    async def get(self, entity, ident):
+        return await self._call(lambda: self.sync_session.get(entity, ident))
+
+    async def stream(self, statement, params=None):
+        # Holds its connection until the last partition, like a sync streaming generator
+        return _ThreadedStream(await anyio.to_thread.run_sync(self.sync_session.execute, statement, params))
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await self._call(lambda: fn(self.sync_session, *args, **kwargs))
+
+    async def close(self):
+        await anyio.to_thread.run_sync(self.sync_session.close)
+
+
+def async_sessionmaker(async_engine, sync_sessionmaker, slots: int):
+    """Factory of ``async with`` sessions on ``async_engine`` (``ThreadedSession`` without one).
+
+    At most ``slots`` (the reader pool's size) are open at once; the rest
+    queue in arrival order.  Left to the pool, a request woken for a
+    returned connection can lose it to a newer one and wait again, which
+    starves a few requests for seconds under load.
+    """
+    if async_engine is None:
+        make = lambda: ThreadedSession(sync_sessionmaker())
+    else:
+        from sqlalchemy.ext.asyncio import async_sessionmaker as sessionmaker
+        make = sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    gates = weakref.WeakKeyDictionary()
+
+    @contextlib.asynccontextmanager
+    async def session():
+        gate = gates.setdefault(asyncio.get_running_loop(), asyncio.Semaphore(slots))
+        async with gate:
+            async with make() as db:
+                yield db
+
+    return session
+
+
+def read_slots(url: str) -> int:
+    """Connections the reader pool for ``url`` opens at most"""
+    return 2 * (READERS if url.startswith("sqlite") else POOL_SIZE)
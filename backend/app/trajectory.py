@@ -0,0 +1,81 @@
+"""Float trajectory statistics from profile positions.
+
+Profiles are ordered by time within each float (JULD, then cycle number
+``n_prof``, which orders undated profiles) and every consecutive pair of
+positions is one leg.  Leg lengths are great-circle (haversine)
+distances, so along-track distance, drift speed and mission duration for
+any number of floats come from a handful of whole-array operations.
+
+NumPy only: the Streamlit dashboard imports this module as well.
+"""
+import numpy as np
+
+# Mean Earth radius (IUGG)
+EARTH_RADIUS_KM = 6371.0088
+
+FIELDS = (
+    "n_positions", "first_juld", "last_juld", "duration_days", "distance_km", "displacement_km",
+    "speed_km_per_day", "max_leg_km", "start_latitude", "start_longitude", "end_latitude", "end_longitude",
+)
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Great-circle distance (km) between positions in degrees"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def track_stats(float_code, n_prof, latitude, longitude, juld) -> dict:
+    """Per-float trajectory statistics from one row per profile.
+
+    ``float_code`` is an integer per profile; ``juld`` is days since 1950
+    (NaN when undated).  Returns ``FIELDS`` arrays plus ``float_code``, one
+    entry per float with at least one valid position.  Duration is NaN for
+    undated floats and speed is NaN when no time elapsed.
+    """
+    float_code = np.asarray(float_code, dtype=np.int64)
+    n_prof = np.asarray(n_prof, dtype=np.int64)
+    latitude = np.asarray(latitude, dtype=np.float64)
+    longitude = np.asarray(longitude, dtype=np.float64)
+    juld = np.asarray(juld, dtype=np.float64)
+    ok = np.isfinite(latitude) & np.isfinite(longitude)
+    float_code, n_prof, latitude, longitude, juld = (v[ok] for v in (float_code, n_prof, latitude, longitude, juld))
+    if float_code.shape[0] == 0:
+        return {name: np.empty(0) for name in ("float_code",) + FIELDS}
+
+    # NaN sorts last: undated profiles follow the dated ones, by cycle number
+    order = np.lexsort((n_prof, juld, float_code))
+    float_code, latitude, longitude, juld = float_code[order], latitude[order], longitude[order], juld[order]
+    starts = np.flatnonzero(np.r_[True, float_code[1:] != float_code[:-1]])
+    ends = np.r_[starts[1:], float_code.shape[0]] - 1
+    group = np.cumsum(np.r_[True, float_code[1:] != float_code[:-1]]) - 1
+    n_floats = starts.shape[0]
+
+    legs = haversine_km(latitude[:-1], longitude[:-1], latitude[1:], longitude[1:])
+    same = float_code[1:] == float_code[:-1]
+    leg_group = group[1:][same]
+    distance = np.bincount(leg_group, weights=legs[same], minlength=n_floats)
+    max_leg = np.zeros(n_floats)
+    np.maximum.at(max_leg, leg_group, legs[same])
+
+    first_juld = juld[starts]
+    last_juld = np.fmax.reduceat(juld, starts)
+    duration = last_juld - first_juld
+    with np.errstate(divide="ignore", invalid="ignore"):
+        speed = np.where(duration > 0, distance / duration, np.nan)
+    return {
+        "float_code": float_code[starts],
+        "n_positions": ends - starts + 1,
+        "first_juld": first_juld,
+        "last_juld": last_juld,
+        "duration_days": duration,
+        "distance_km": distance,
+        "displacement_km": haversine_km(latitude[starts], longitude[starts], latitude[ends], longitude[ends]),
+        "speed_km_per_day": speed,
+        "max_leg_km": max_leg,
+        "start_latitude": latitude[starts],
+        "start_longitude": longitude[starts],
+        "end_latitude": latitude[ends],
+        "end_longitude": longitude[ends],
+    }
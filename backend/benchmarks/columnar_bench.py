@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Disk footprint and depth-profile scan time: SQLite measurements table
+against the Parquet tier in app/columnar.py.
+
+Each CSV is ingested COPIES times under distinct float ids to get a
+larger archive than the sample data.
+
+Usage (from backend/):  python benchmarks/columnar_bench.py [csv_folder] [copies]
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from app import columnar, ingest_engine, models
+from app.db import Base
+
+DEFAULT_FOLDER = BACKEND_DIR.parent / "data" / "csv_cleaned"
+REPEAT = 20
+
+
+def dir_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def timed(fn):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        rows = fn()
+    return (time.perf_counter() - start) / REPEAT * 1000, rows
+
+
+def main():
+    folder = Path(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_FOLDER
+    copies = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    batches = [ingest_engine.parse_csv(f) for f in sorted(folder.glob("nodc_*_prof.csv"))]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        columnar.COLUMNAR_DIR = str(tmp / "parquet")
+        engine = create_engine(f"sqlite:///{tmp / 'bench.db'}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+
+        rows = 0
+        for copy in range(copies):
+            for batch in batches:
+                batch = dict(batch, float_id=f"{batch['float_id']}{copy:03d}")
+                rows += ingest_engine.write_batch(db, batch)[1]
+                columnar.write(batch)
+        db.commit()
+        db.execute(select(1))  # keep the connection open for the scans
+
+        sqlite_bytes = (tmp / "bench.db").stat().st_size
+        parquet_bytes = dir_size(tmp / "parquet")
+        print(f"{rows} measurements in {copies * len(batches)} floats")
+        print(f"disk   sqlite {sqlite_bytes / 1e6:8.2f} MB   parquet {parquet_bytes / 1e6:8.2f} MB"
+              f"   ({sqlite_bytes / parquet_bytes:.1f}x smaller)")
+
+        float_id = f"{batches[0]['float_id']}{copies // 2:03d}"
+
+        def sql_scan():
+            return len(db.execute(
+                select(models.Profile.n_prof, models.Measurement.pres, models.Measurement.temp)
+                .join(models.Measurement, models.Measurement.profile_id == models.Profile.id)
+                .where(models.Profile.float_id == float_id, models.Measurement.pres <= 500)
+            ).all())
+
+        def parquet_scan():
+            return columnar.read_levels(columns=["n_prof", "pres", "temp"], float_ids=[float_id], pres_max=500).num_rows
+
+        sql_ms, sql_rows = timed(sql_scan)
+        parquet_ms, parquet_rows = timed(parquet_scan)
+        print(f"scan   sqlite {sql_ms:8.2f} ms   parquet {parquet_ms:8.2f} ms   ({sql_rows} / {parquet_rows} levels)")
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Read latency while an ingest is writing: reader threads run the
+``GET /profiles`` queries (first page + count) against a SQLite file while
+a writer thread keeps inserting batches, one transaction per file.
+
+Compares the previous setup (one default engine: rollback journal, shared
+pool) with app/storage.py (WAL, synchronous=NORMAL, mmap/cache pragmas,
+query-only reader pool beside a single serialized writer connection).
+Under the rollback journal readers wait whenever the writer holds the lock,
+which also hands the writer the whole CPU: compare reads/s and p99
+together with rows/s.  BENCH_FILES_PER_TRANSACTION (default 7) sets the
+transaction size; larger ones spill the page cache and lock readers out
+for longer.
+
+Usage (from backend/):  python benchmarks/concurrency_bench.py [seconds] [readers] [csv_folder]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+import numpy as np
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app import models, ingest_engine, storage
+from app.db import Base
+
+DEFAULT_FOLDER = BACKEND_DIR.parent / "data" / "csv_cleaned"
+# Files written per transaction, so the writer holds the lock like a large file would
+FILES_PER_TRANSACTION = int(os.getenv("BENCH_FILES_PER_TRANSACTION", "7"))
+
+
+def list_profiles(db):
+    rows = db.execute(select(models.Profile).order_by(models.Profile.id).limit(50)).scalars().all()
+    total = db.execute(select(func.count()).select_from(models.Profile)).scalar_one()
+    return len(rows), total
+
+
+def run(writer_engine, reader_engine, batches, seconds: float, readers: int) -> dict:
+    Base.metadata.create_all(bind=writer_engine)
+    Writer = sessionmaker(bind=writer_engine)
+    Reader = sessionmaker(bind=reader_engine)
+    stop = threading.Event()
+    written = [0]
+
+    def write():
+        i = 0
+        while not stop.is_set():
+            db = Writer()
+            try:
+                for batch in batches[:FILES_PER_TRANSACTION]:
+                    written[0] += ingest_engine.write_batch(db, dict(batch, float_id=f"{batch['float_id']}_{i}"))[1]
+                    i += 1
+                db.commit()
+            finally:
+                db.close()
+
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+
+    def read():
+        while not stop.is_set():
+            db = Reader()
+            start = time.perf_counter()
+            try:
+                list_profiles(db)
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+            except OperationalError:
+                with lock:
+                    errors[0] += 1
+            finally:
+                db.close()
+
+    threads = [threading.Thread(target=write)] + [threading.Thread(target=read) for _ in range(readers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        "reads/s": len(latencies) / seconds,
+        "p50": np.percentile(ms, 50),
+        "p99": np.percentile(ms, 99),
+        "max": ms.max(),
+        "errors": errors[0],
+        "rows/s": written[0] / seconds,
+    }
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10.0
+    readers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    folder = Path(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_FOLDER
+    batches = [ingest_engine.parse_csv(f) for f in sorted(folder.glob("*.csv"))]
+    batches = (batches * FILES_PER_TRANSACTION)[:FILES_PER_TRANSACTION]
+    print(f"{readers} readers, 1 writer ({FILES_PER_TRANSACTION} files per transaction), {seconds:.0f} s each")
+    print(f"{'setup':<10} {'reads/s':>9} {'p50':>9} {'p99':>9} {'max':>9} {'errors':>7} {'rows/s':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{Path(tmp) / 'default.db'}"
+        engine = create_engine(url, connect_args={"check_same_thread": False})
+        results = {"default": run(engine, engine, batches, seconds, readers)}
+        engine.dispose()
+        writer, reader = storage.create_engines(f"sqlite:///{Path(tmp) / 'tuned.db'}")
+        results["tuned"] = run(writer, reader, batches, seconds, readers)
+        writer.dispose()
+        reader.dispose()
+    for name, r in results.items():
+        print(f"{name:<10} {r['reads/s']:>9.0f} {r['p50']:>7.1f}ms {r['p99']:>7.1f}ms {r['max']:>7.1f}ms "
+              f"{r['errors']:>7} {r['rows/s']:>10,.0f}")
+
+
+if __name__ == "__main__":
+    main()
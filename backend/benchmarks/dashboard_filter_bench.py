@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Sidebar filter latency on the synthetic dashboard frame: the sorted index
+in dashboard_index.py (first call and cached) against the old
+``df.copy()`` plus boolean masks with ``dt.date`` comparisons.
+
+Usage (from backend/):  python benchmarks/dashboard_filter_bench.py [rows]
+"""
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import dashboard_data
+import dashboard_index
+
+
+def masked(df, region, float_id, pressure_range, date_range):
+    filtered = df.copy()
+    if region is not None:
+        filtered = filtered[filtered["region"] == region]
+    if float_id is not None:
+        filtered = filtered[filtered["float_id"] == float_id]
+    filtered = filtered[(filtered["pressure"] >= pressure_range[0]) & (filtered["pressure"] <= pressure_range[1])]
+    if date_range is not None:
+        filtered = filtered[(filtered["date"].dt.date >= date_range[0]) & (filtered["date"].dt.date <= date_range[1])]
+    return filtered
+
+
+def ms(fn):
+    start = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    elapsed, df = ms(lambda: dashboard_data.generate_synthetic(rows))
+    print(f"generate {len(df):,} rows: {elapsed / 1000:.1f} s")
+    elapsed, index = ms(lambda: dashboard_index.FrameIndex(df))
+    print(f"build index: {elapsed / 1000:.1f} s")
+
+    some_float = index.floats_in("Indian Ocean")[0]
+    cases = [
+        ("default depth 0-500", (None, None, (0, 500), None)),
+        ("region", ("Indian Ocean", None, (0, 500), None)),
+        ("region + float", ("Indian Ocean", some_float, (0, 2000), None)),
+        ("depth + dates", (None, None, (50, 750), (date(2023, 2, 1), date(2023, 6, 30)))),
+        ("region + depth + month", ("South Atlantic", None, (0, 500), (date(2023, 3, 1), date(2023, 3, 31)))),
+    ]
+    print(f"{'filter':<24} {'rows':>10} {'index':>10} {'cached':>10} {'masks':>10}")
+    for label, args in cases:
+        index_ms, result = ms(lambda: index.filter(*args))
+        cached_ms, _ = ms(lambda: index.filter(*args))
+        mask_ms, expected = ms(lambda: masked(df, *args))
+        assert len(result) == len(expected), label
+        print(f"{label:<24} {len(result):>10,} {index_ms:>8.1f}ms {cached_ms:>8.3f}ms {mask_ms:>8.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
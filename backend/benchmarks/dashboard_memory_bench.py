@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Memory of the dashboard frame: the compact layout from dashboard_data.py
+(categorical ids, float32 values, int16 pressure) against the previous
+one (object strings, int64, float64, datetime64[ns]), per column, plus
+the cost of a filtered copy and a column mean in each layout.
+
+Usage (from backend/):  python benchmarks/dashboard_memory_bench.py [rows]
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import dashboard_data
+
+WIDE = {
+    "float_id": object, "n_prof": np.int64, "latitude": np.float64, "longitude": np.float64,
+    "pressure": np.int64, "temperature": np.float64, "salinity": np.float64,
+    "date": "datetime64[ns]", "region": object,
+}
+
+
+def timed(fn, repeat=5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    compact = dashboard_data.generate_synthetic(rows)
+    wide = compact.astype(WIDE)
+
+    compact_bytes = compact.memory_usage(deep=True, index=False)
+    wide_bytes = wide.memory_usage(deep=True, index=False)
+    print(f"{len(compact):,} rows")
+    print(f"{'column':<12} {'previous':>12} {'compact':>12} {'dtype':>16}")
+    for name in compact.columns:
+        print(f"{name:<12} {wide_bytes[name] / 1e6:>10.1f}MB {compact_bytes[name] / 1e6:>10.1f}MB {str(compact[name].dtype):>16}")
+    print(f"{'total':<12} {wide_bytes.sum() / 1e6:>10.1f}MB {compact_bytes.sum() / 1e6:>10.1f}MB"
+          f"   ({wide_bytes.sum() / compact_bytes.sum():.1f}x smaller, {compact_bytes.sum() / len(compact):.0f} B/row)")
+
+    rows_taken = np.flatnonzero(compact["pressure"].to_numpy() <= 500)
+    print(f"take {len(rows_taken):,} rows   previous {timed(lambda: wide.take(rows_taken)):7.1f} ms"
+          f"   compact {timed(lambda: compact.take(rows_taken)):7.1f} ms")
+    print(f"mean temperature   previous {timed(lambda: wide['temperature'].mean()):7.1f} ms"
+          f"   compact {timed(lambda: compact['temperature'].mean()):7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
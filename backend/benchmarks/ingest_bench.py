@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Compare CSV ingest throughput (rows/sec): the original per-row ORM path
+against the columnar engine in app/ingest_engine.py, serial and with the
+process-pool parser (INGEST_WORKERS).
+
+Usage (from backend/):  python benchmarks/ingest_bench.py [csv_folder]
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import models, ingest_engine
+from app.db import Base
+
+DEFAULT_FOLDER = BACKEND_DIR.parent / "data" / "csv_cleaned"
+
+
+def legacy_ingest(csv_files, db):
+    """The pre-engine implementation: groupby + flush per profile + one ORM object per row"""
+    rows = 0
+    for csv_file in csv_files:
+        df = pd.read_csv(csv_file)
+        float_id = ingest_engine.float_id_from_filename(csv_file.name)
+        for n_prof, g in df.groupby("N_PROF"):
+            profile = models.Profile(float_id=str(float_id), n_prof=int(n_prof),
+                                     latitude=float(g["LATITUDE"].iloc[0]), longitude=float(g["LONGITUDE"].iloc[0]))
+            db.add(profile)
+            db.flush()
+            for _, row in g.iterrows():
+                db.add(models.Measurement(
+                    profile_id=profile.id,
+                    n_levels=int(row.get("N_LEVELS", 0)),
+                    pres=float(row.get("PRES", 0.0)) if pd.notna(row.get("PRES")) else 0.0,
+                    temp=float(row.get("TEMP", 0.0)) if pd.notna(row.get("TEMP")) else 0.0,
+                    psal=float(row.get("PSAL", 0.0)) if pd.notna(row.get("PSAL")) else 0.0,
+                ))
+                rows += 1
+    db.commit()
+    return rows
+
+
+def columnar_ingest(csv_files, db):
+    rows = 0
+    for csv_file in csv_files:
+        batch = ingest_engine.parse_csv(csv_file)
+        rows += ingest_engine.write_batch(db, batch)[1]
+    db.commit()
+    return rows
+
+
+def parallel_ingest(csv_files, db):
+    results = ingest_engine.ingest_files(csv_files, db)
+    db.commit()
+    return sum(r["rows"] for r in results)
+
+
+def run(label, fn, csv_files):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'bench.db'}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        try:
+            start = time.perf_counter()
+            rows = fn(csv_files, db)
+            elapsed = time.perf_counter() - start
+        finally:
+            db.close()
+            engine.dispose()
+    print(f"{label:<10} {rows:>8} rows  {elapsed:8.3f} s  {rows / elapsed:>12,.0f} rows/sec")
+    return elapsed
+
+
+def main():
+    folder = Path(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_FOLDER
+    csv_files = sorted(folder.glob("nodc_*_prof.csv"))
+    if not csv_files:
+        sys.exit(f"No nodc_*_prof.csv files in {folder}")
+
+    print(f"Ingesting {len(csv_files)} files from {folder}")
+    legacy = run("legacy", legacy_ingest, csv_files)
+    columnar = run("columnar", columnar_ingest, csv_files)
+    parallel = run("parallel", parallel_ingest, csv_files)
+    print(f"speedup: columnar {legacy / columnar:.1f}x, "
+          f"parallel ({ingest_engine.INGEST_WORKERS} workers) {legacy / parallel:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Read endpoints under many concurrent clients: ``uvicorn app.main:app`` on a
+SQLite file loaded with the CSV folder, hammered by N keep-alive clients per
+endpoint (``GET /profiles``, ``GET /profiles/{id}/measurements``, ``GET
+/profiles/trajectories``).
+
+``threads`` runs the server with ``ASYNC_DATABASE=0``: every database call
+takes a slot of the thread pool (40 threads), as the ``def`` handlers did.
+``async`` uses the aiosqlite session, where a request waiting for the
+database holds no thread.  Reports requests/s and p50/p99 latency.
+
+Usage (from backend/):  python benchmarks/load_bench.py [clients] [seconds] [copies] [csv_folder]
+"""
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import httpx
+import numpy as np
+
+DEFAULT_FOLDER = BACKEND_DIR.parent / "data" / "csv_cleaned"
+# Seconds of load before requests are counted
+WARMUP = 3.0
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def load_database(path: Path, folder: Path, copies: int):
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    from sqlalchemy.orm import sessionmaker
+    from app import ingest_engine, storage
+    from app.db import Base
+
+    engine, _ = storage.create_engines(os.environ["DATABASE_URL"])
+    Base.metadata.create_all(bind=engine)
+    parsed = [ingest_engine.parse_csv(f) for f in sorted(folder.glob("*.csv"))]
+    db = sessionmaker(bind=engine)()
+    try:
+        for i in range(copies):
+            for batch in parsed:
+                ingest_engine.write_batch(db, dict(batch, float_id=f"{batch['float_id']}_{i}"))
+        db.commit()
+    finally:
+        db.close()
+        engine.dispose()
+
+
+async def _get(reader, writer, path: str) -> int:
+    """One keep-alive HTTP/1.1 GET; returns the status (httpx's own overhead caps a single-core client)"""
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: bench\r\n\r\n".encode())
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    headers = dict(line.lower().split(": ", 1) for line in lines[1:] if ": " in line)
+    if "content-length" in headers:
+        await reader.readexactly(int(headers["content-length"]))
+    else:  # chunked (streamed responses)
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    return int(lines[0].split()[1])
+
+
+async def hammer(port: int, paths, clients: int, seconds: float, warmup: float = WARMUP) -> dict:
+    """Requests/s and latency of ``clients`` looping over ``paths``; the first ``warmup`` seconds
+    (connections opening, first requests queueing) are not counted"""
+    latencies, errors = [], 0
+    measure_from = time.perf_counter() + warmup
+    deadline = measure_from + seconds
+
+    async def run(i):
+        nonlocal errors
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        n = i
+        try:
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    ok = await _get(reader, writer, paths[n % len(paths)]) == 200
+                except (OSError, asyncio.IncompleteReadError):
+                    ok = False
+                    writer.close()
+                    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                if start < measure_from:
+                    pass
+                elif ok:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+                n += 1
+        finally:
+            writer.close()
+
+    await asyncio.gather(*(run(i) for i in range(clients)))
+    elapsed = time.perf_counter() - measure_from
+    ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {"req/s": len(latencies) / elapsed, "p50": np.percentile(ms, 50), "p99": np.percentile(ms, 99),
+            "errors": errors}
+
+
+def serve(db_path: Path, async_database: bool, port: int):
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}", ASYNC_DATABASE="1" if async_database else "0")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning",
+         "--no-access-log", "--backlog", "4096"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL,
+    )
+    for _ in range(200):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/health", timeout=1)
+            return server
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("server did not start")
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10.0
+    copies = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    folder = Path(sys.argv[4]) if len(sys.argv) > 4 else DEFAULT_FOLDER
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "load.db"
+        load_database(db_path, folder, copies)
+        import sqlite3
+        with sqlite3.connect(db_path) as con:
+            profiles = con.execute("SELECT count(*) FROM profiles").fetchone()[0]
+        rng = np.random.default_rng(0)
+        endpoints = {
+            "profiles": [f"/profiles?limit=50&skip={s}" for s in rng.integers(0, max(profiles - 50, 1), 200)],
+            "measurements": [f"/profiles/{i}/measurements" for i in rng.integers(1, profiles + 1, 200)],
+            "trajectories": ["/profiles/trajectories"],
+        }
+        print(f"{profiles:,} profiles, {clients} clients, {seconds:.0f} s per run")
+        print(f"{'endpoint':<14} {'mode':<8} {'req/s':>8} {'p50':>10} {'p99':>10} {'errors':>7}")
+        for name, paths in endpoints.items():
+            for mode, async_database in (("threads", False), ("async", True)):
+                port = free_port()
+                server = serve(db_path, async_database, port)
+                try:
+                    r = asyncio.run(hammer(port, paths, clients, seconds))
+                finally:
+                    server.terminate()
+                    server.wait()
+                print(f"{name:<14} {mode:<8} {r['req/s']:>8.0f} {r['p50']:>8.1f}ms {r['p99']:>8.1f}ms {r['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
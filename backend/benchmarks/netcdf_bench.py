@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Time the three-script pipeline (changecsv.py -> cleancsv.py -> CSV ingest)
+against reading the Argo .nc files directly with app/netcdf_ingest.py.
+Both paths end with the same columnar write into a fresh SQLite file.
+
+Usage (from backend/):  python benchmarks/netcdf_bench.py [nc_folder]
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import ingest_engine
+from app.db import Base
+from app.netcdf_ingest import read_netcdf
+
+DEFAULT_FOLDER = BACKEND_DIR.parent / "data" / ".nc files"
+VARS_TO_EXTRACT = ["PRES", "TEMP", "PSAL", "LATITUDE", "LONGITUDE"]
+
+
+def csv_pipeline(nc_files, workdir: Path):
+    """changecsv.py + cleancsv.py + parse_csv, file by file"""
+    import xarray as xr
+
+    output, cleaned = workdir / "csv_output", workdir / "csv_cleaned"
+    output.mkdir()
+    cleaned.mkdir()
+    for nc in nc_files:
+        with xr.open_dataset(nc) as ds:
+            available = [v for v in VARS_TO_EXTRACT if v in ds.variables]
+            ds[available].to_dataframe().reset_index().to_csv(output / f"{nc.stem}.csv", index=False)
+    for csv_file in sorted(output.glob("*.csv")):
+        pd.read_csv(csv_file).dropna().to_csv(cleaned / csv_file.name, index=False)
+    return [ingest_engine.parse_csv(csv_file) for csv_file in sorted(cleaned.glob("*.csv"))]
+
+
+def direct_netcdf(nc_files, workdir: Path):
+    return [read_netcdf(nc, ingest_engine.float_id_from_filename(nc.name)) for nc in nc_files]
+
+
+def run(label, fn, nc_files):
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        engine = create_engine(f"sqlite:///{workdir / 'bench.db'}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        try:
+            start = time.perf_counter()
+            batches = fn(nc_files, workdir)
+            parsed = time.perf_counter()
+            rows = sum(ingest_engine.write_batch(db, batch)[1] for batch in batches)
+            db.commit()
+            elapsed = time.perf_counter() - start
+        finally:
+            db.close()
+            engine.dispose()
+    print(f"{label:<12} {rows:>8} rows  parse {parsed - start:7.3f} s  total {elapsed:7.3f} s")
+    return elapsed
+
+
+def main():
+    folder = Path(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_FOLDER
+    nc_files = sorted(folder.glob("*.nc"))
+    if not nc_files:
+        sys.exit(f"No .nc files in {folder}")
+
+    print(f"Ingesting {len(nc_files)} files from {folder}")
+    pipeline = run("csv pipeline", csv_pipeline, nc_files)
+    direct = run("netcdf", direct_netcdf, nc_files)
+    print(f"speedup: {pipeline / direct:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Serialization time and bytes on the wire of the large read responses:
+the trajectories GeoJSON, a 1000-profile page and a depth-level scan.
+
+First the payloads are encoded with the standard library ``json`` (the
+previous path), orjson and MessagePack.  Then each endpoint is requested
+through the app for every ``Accept`` / ``Accept-Encoding`` pair, twice: the
+first request runs the route (and, for cached routes, stores the compressed
+body), the second is what every later client gets.
+
+Usage (from backend/):  python benchmarks/payload_bench.py [copies] [csv_folder]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+DEFAULT_FOLDER = BACKEND_DIR.parent / "data" / "csv_cleaned"
+REPEAT = 10
+
+
+def timed(fn):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        out = fn()
+    return (time.perf_counter() - start) / REPEAT * 1000, out
+
+
+def load(folder: Path, copies: int):
+    from app import ingest_engine
+    from app.db import SessionLocal
+
+    parsed = [ingest_engine.parse_csv(f) for f in sorted(folder.glob("*.csv"))]
+    db = SessionLocal()
+    try:
+        for i in range(copies):
+            for batch in parsed:
+                ingest_engine.write_batch(db, dict(batch, float_id=f"{batch['float_id']}_{i}"))
+        db.commit()
+    finally:
+        db.close()
+
+
+def serialization():
+    import msgpack
+    from sqlalchemy import select
+    from app import encoding, measurement_query, models
+    from app.db import ReadSessionLocal
+    from app.routers.profiles import _point_feature
+
+    db = ReadSessionLocal()
+    try:
+        positions = db.execute(select(models.Profile.float_id, models.Profile.n_prof, models.Profile.latitude,
+                                      models.Profile.longitude).order_by(models.Profile.id)).all()
+        profiles = [{c.name: getattr(p, c.name) for c in models.Profile.__table__.columns}
+                    for p in db.execute(select(models.Profile).limit(1000)).scalars()]
+        columns, _ = measurement_query.query_levels(db, "float_id,n_prof,pres,temp,psal")
+    finally:
+        db.close()
+    trajectories = {"type": "FeatureCollection", "features": [_point_feature(*p) for p in positions]}
+
+    print(f"{'payload':<14} {'encoder':<8} {'ms':>8} {'bytes':>12}")
+    for name, doc in (("trajectories", trajectories), ("profiles", {"items": profiles})):
+        for encoder, fn in (("json", lambda: json.dumps(doc).encode()), ("orjson", lambda: encoding.dumps(doc)),
+                            ("msgpack", lambda: msgpack.packb(doc))):
+            ms, body = timed(fn)
+            print(f"{name:<14} {encoder:<8} {ms:>8.1f} {len(body):>12,}")
+    rows = len(columns["pres"])
+    for encoder, fn in (
+        ("json", lambda: json.dumps({"rows": rows, "columns": encoding.json_columns(columns)}).encode()),
+        ("orjson", lambda: encoding.encode(columns, encoding.JSON).body),
+        ("msgpack", lambda: encoding.encode(columns, encoding.MSGPACK).body),
+    ):
+        ms, body = timed(fn)
+        print(f"{'levels':<14} {encoder:<8} {ms:>8.1f} {len(body):>12,}")
+
+
+def request(client, path: str, accept: str, coding: str):
+    """(milliseconds, bytes on the wire) of one GET"""
+    start = time.perf_counter()
+    with client.stream("GET", path, headers={"accept": accept, "accept-encoding": coding}) as r:
+        size = sum(len(chunk) for chunk in r.iter_raw())
+    return (time.perf_counter() - start) * 1000, size
+
+
+def wire():
+    from fastapi.testclient import TestClient
+    from app import compression, response_cache
+    from app.main import app
+
+    client = TestClient(app)
+    endpoints = {
+        "trajectories": "/profiles/trajectories",
+        "profiles": "/profiles?limit=1000",
+        "levels": "/profiles/levels?columns=float_id,n_prof,pres,temp,psal",
+    }
+    print(f"\n{'endpoint':<14} {'accept':<8} {'coding':<9} {'first':>10} {'repeat':>10} {'bytes':>12}")
+    for name, path in endpoints.items():
+        for accept in ("application/json", "application/msgpack"):
+            for coding in ("identity",) + compression.available():
+                response_cache.memory.clear()
+                first, size = request(client, path, accept, coding)
+                repeat, _ = request(client, path, accept, coding)
+                print(f"{name:<14} {accept.split('/')[1]:<8} {coding:<9} {first:>8.1f}ms {repeat:>8.1f}ms {size:>12,}")
+
+
+def main():
+    copies = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    folder = Path(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_FOLDER
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{Path(tmp) / 'payload.db'}"
+        os.environ.pop("RESPONSE_CACHE_DIR", None)
+        from app import compression, models  # noqa: F401  (registers the tables)
+        from app.db import Base, engine
+
+        Base.metadata.create_all(bind=engine)
+        load(folder, copies)
+        print(f"codings: {', '.join(compression.available())} (zstd needs zstandard)\n")
+        serialization()
+        wire()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
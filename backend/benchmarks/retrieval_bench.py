@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Top-k latency of the chat retrieval index (app/retrieval.py) as the
+number of indexed profiles grows: exact search below IVF_MIN_VECTORS,
+IVF above it.  Profiles are synthetic (random positions, dates and
+levels) so any archive size can be tried.
+
+Usage (from backend/):  python benchmarks/retrieval_bench.py [max_profiles]
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from app import retrieval
+
+QUESTIONS = [
+    "warm salty profiles in the arabian sea",
+    "deep profiles in the bay of bengal in 2024",
+    "cold fresh water south of 40S",
+    "float 7902246 in march",
+    "average temperature below 1000 m near the equator",
+]
+REPEAT = 50
+
+
+def synthetic_summaries(rng, n: int, first: int) -> list:
+    levels = np.arange(0.0, 2000.0, 20.0)
+    summaries = []
+    for i in range(n):
+        depth = levels[: rng.integers(10, levels.shape[0])]
+        sst = rng.uniform(-1.0, 30.0)
+        summaries.append(retrieval.summarize(
+            str(7900000 + (first + i) // 150), (first + i) % 150,
+            rng.uniform(-60.0, 30.0), rng.uniform(20.0, 147.0), rng.uniform(18000.0, 27500.0),
+            depth, sst - depth / 200.0, rng.uniform(33.0, 37.0) + 0 * depth,
+        ))
+    return summaries
+
+
+def main():
+    max_profiles = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    rng = np.random.default_rng(0)
+    index = retrieval.VectorIndex()
+    sizes = [n for n in (1000, 4000, 20000, 100000, 500000, 1000000) if n <= max_profiles] or [max_profiles]
+    print(f"dim {retrieval.DIM}, nprobe {retrieval.NPROBE}")
+    for size in sizes:
+        start = time.perf_counter()
+        while index.size < size:
+            chunk = min(5000, size - index.size)
+            first = index.size
+            summaries = synthetic_summaries(rng, chunk, first)
+            # One float per chunk keeps add() calls large, as in ingest
+            index.add(str(7900000 + first // 150), np.arange(first, first + chunk), summaries)
+        index.maintain()
+        build_s = time.perf_counter() - start
+
+        for question in QUESTIONS:
+            index.search(question, 5)  # warm up
+        start = time.perf_counter()
+        for _ in range(REPEAT):
+            for question in QUESTIONS:
+                index.search(question, 5)
+        search_ms = (time.perf_counter() - start) / (REPEAT * len(QUESTIONS)) * 1000
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "index.npz"
+            start = time.perf_counter()
+            index.save(path)
+            save_s = time.perf_counter() - start
+            start = time.perf_counter()
+            retrieval.VectorIndex.load(path)
+            load_s = time.perf_counter() - start
+            size_mb = path.stat().st_size / 1e6
+        mode = f"ivf {index.centroids.shape[0]} lists" if index.centroids.shape[0] else "exact"
+        print(f"{size:>8} profiles  {mode:<15} top-5 {search_ms:6.2f} ms   "
+              f"build +{build_s:6.1f} s   save {save_s:5.2f} s   load {load_s:5.2f} s   {size_mb:7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
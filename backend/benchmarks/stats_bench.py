@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Dashboard metrics on the synthetic frame: merging the precomputed
+region × month × depth band sketches (dashboard_stats.py) against scanning
+the filtered rows (mean temperature/salinity, distinct floats and
+profiles, 30-bin histograms).  Also prints the relative error of the
+merged means and distinct-count estimates.
+
+Usage (from backend/):  python benchmarks/stats_bench.py [rows]
+"""
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import dashboard_data
+import dashboard_index
+import dashboard_stats
+
+
+def scanned(index, args):
+    df = index.filter(*args)
+    return {
+        "temp": df["temperature"].mean(),
+        "psal": df["salinity"].mean(),
+        "floats": df["float_id"].nunique(),
+        "profiles": df.groupby(["float_id", "n_prof"], observed=True).ngroups,
+        "hist": (np.histogram(df["temperature"], bins=30), np.histogram(df["salinity"], bins=30)),
+    }
+
+
+def ms(fn):
+    start = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def error(estimate, exact):
+    return abs(estimate - exact) / exact * 100 if exact else 0.0
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    elapsed, df = ms(lambda: dashboard_data.generate_synthetic(rows))
+    print(f"generate {len(df):,} rows: {elapsed / 1000:.1f} s")
+    index = dashboard_index.FrameIndex(df)
+    elapsed, stats = ms(lambda: dashboard_stats.FrameStats(index))
+    size = sum(values.nbytes for values in stats.sketch.values())
+    print(f"build sketches: {elapsed / 1000:.1f} s, {len(stats.sketch['key_band']):,} partitions, {size / 1e6:.1f} MB")
+
+    cases = [
+        ("default depth 0-500", (None, None, (0, 500), None)),
+        ("region", ("Indian Ocean", None, (0, 500), None)),
+        ("all depths", (None, None, (0, 2000), None)),
+        ("depth + months", (None, None, (50, 750), (date(2023, 2, 1), date(2023, 6, 30)))),
+    ]
+    print(f"{'filter':<22} {'sketch':>9} {'scan':>9} {'temp err':>9} {'floats err':>11} {'profiles err':>13}")
+    for label, args in cases:
+        # Fresh index cache so the scan includes the filter, as on a new selection
+        index._cache.clear()
+        scan_ms, expected = ms(lambda: scanned(index, args))
+        sketch_ms, summary = ms(lambda: stats.summary(*args))
+        print(f"{label:<22} {sketch_ms:>7.1f}ms {scan_ms:>7.0f}ms "
+              f"{error(summary['temp']['mean'], expected['temp']):>8.2f}% "
+              f"{error(summary['distinct_floats'], expected['floats']):>10.2f}% "
+              f"{error(summary['distinct_profiles'], expected['profiles']):>12.2f}%")
+
+
+if __name__ == "__main__":
+    main()
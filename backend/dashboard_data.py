@@ -0,0 +1,319 @@
+"""Data sources for the Streamlit dashboard.
+
+Every source returns the same frame: one row per measurement level with
+``float_id, n_prof, latitude, longitude, pressure, temperature, salinity,
+date, region``.  ``DASHBOARD_SOURCE`` picks the source:
+
+- ``synthetic`` (default): simulated floats in five ocean basins, generated
+  with whole-array NumPy operations; ``DASHBOARD_ROWS`` sets the size
+  (default 30,000; 10M+ for load testing).
+- ``sqlite``: the ingested archive read straight from ``argo.db``
+  (``DASHBOARD_DB``, otherwise the first database found where the API
+  keeps it), selecting only the columns asked for.
+- ``api``: the FastAPI backend at ``ARGO_API_URL`` via
+  ``POST /measurements/query`` in NumPy (npz) encoding.
+
+Regions of real data are assigned from latitude/longitude boxes.
+
+Frames use the compact ``DTYPES`` (categorical ids, float32 values, int16
+pressure in whole dbar), about a quarter of the object/int64/float64
+layout, so one copy can be shared by every dashboard session.
+"""
+import io
+import os
+import sqlite3
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+SOURCE = os.getenv("DASHBOARD_SOURCE", "synthetic")
+SYNTHETIC_ROWS = int(os.getenv("DASHBOARD_ROWS", "30000"))
+# FastAPI backend for the api source (the chat assistant uses it too)
+API_URL = os.getenv("ARGO_API_URL", "http://localhost:8000")
+SOURCES = ("synthetic", "sqlite", "api")
+
+COLUMNS = ("float_id", "n_prof", "latitude", "longitude", "pressure", "temperature", "salinity", "date", "region")
+
+# pandas stores dates in seconds at the coarsest; whole days are kept there
+DTYPES = {
+    "float_id": "category",
+    "n_prof": np.int16,
+    "latitude": np.float32,
+    "longitude": np.float32,
+    "pressure": np.int16,
+    "temperature": np.float32,
+    "salinity": np.float32,
+    "date": "datetime64[s]",
+    "region": "category",
+}
+
+JULD_ORIGIN = "1950-01-01"
+
+# Simulated basins: position ranges and surface temperature of their floats
+SYNTHETIC_REGIONS = [
+    {"name": "North Pacific", "lat_range": (35, 50), "lon_range": (-180, -120), "temp_base": 12},
+    {"name": "South Pacific", "lat_range": (-45, -20), "lon_range": (-180, -120), "temp_base": 18},
+    {"name": "North Atlantic", "lat_range": (40, 60), "lon_range": (-60, -10), "temp_base": 10},
+    {"name": "South Atlantic", "lat_range": (-40, -10), "lon_range": (-50, 10), "temp_base": 20},
+    {"name": "Indian Ocean", "lat_range": (-30, 10), "lon_range": (40, 100), "temp_base": 22},
+]
+SYNTHETIC_DEPTHS = np.array([0, 10, 20, 30, 50, 75, 100, 125, 150, 200, 250, 300, 400, 500, 600, 750,
+                             1000, 1250, 1500, 2000])
+PROFILES_PER_FLOAT = 100
+SYNTHETIC_START = np.datetime64("2023-01-01")
+
+# (lat_min, lat_max, lon_min, lon_max) boxes for real positions; first match wins
+REGION_BOXES = [
+    ("Southern Ocean", [(-90, -60, -180, 180)]),
+    ("Indian Ocean", [(-60, 30, 20, 147)]),
+    ("North Pacific", [(0, 66, 120, 180), (0, 66, -180, -100)]),
+    ("South Pacific", [(-60, 0, 147, 180), (-60, 0, -180, -70)]),
+    ("North Atlantic", [(0, 70, -100, 20)]),
+    ("South Atlantic", [(-60, 0, -70, 20)]),
+    ("Arctic Ocean", [(66, 90, -180, 180)]),
+]
+OTHER_REGION = "Other"
+
+# Frame column -> SQL expression / measurements API column
+SQL_COLUMNS = {
+    "float_id": "p.float_id", "n_prof": "p.n_prof", "latitude": "p.latitude", "longitude": "p.longitude",
+    "date": "p.juld", "pressure": "m.pres", "temperature": "m.temp", "salinity": "m.psal",
+}
+API_COLUMNS = {
+    "float_id": "float_id", "n_prof": "n_prof", "latitude": "latitude", "longitude": "longitude",
+    "date": "juld", "pressure": "pres", "temperature": "temp", "salinity": "psal",
+}
+
+
+def _projection(columns) -> list:
+    """Stored columns needed for ``columns`` (``region`` is derived from the position)"""
+    columns = list(COLUMNS if columns is None else columns)
+    unknown = [c for c in columns if c not in COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown columns: {unknown}. Available: {list(COLUMNS)}")
+    needed = [c for c in columns if c != "region"]
+    if "region" in columns:
+        needed += [c for c in ("latitude", "longitude") if c not in needed]
+    return needed
+
+
+def assign_regions(latitude, longitude) -> pd.Categorical:
+    """Basin name of each position, vectorized over the box table"""
+    latitude = np.asarray(latitude, dtype=np.float64)
+    longitude = np.asarray(longitude, dtype=np.float64)
+    codes = np.full(latitude.shape[0], len(REGION_BOXES), dtype=np.int8)
+    for code in range(len(REGION_BOXES) - 1, -1, -1):
+        inside = np.zeros(latitude.shape[0], dtype=bool)
+        for lat_min, lat_max, lon_min, lon_max in REGION_BOXES[code][1]:
+            inside |= (latitude >= lat_min) & (latitude <= lat_max) & (longitude >= lon_min) & (longitude <= lon_max)
+        codes[inside] = code
+    names = [name for name, _ in REGION_BOXES] + [OTHER_REGION]
+    return pd.Categorical.from_codes(codes, categories=names)
+
+
+def compact(frame: pd.DataFrame) -> pd.DataFrame:
+    """``frame`` converted to ``DTYPES``; pressure is rounded to whole dbar and rows without one are dropped"""
+    if "pressure" in frame.columns and frame["pressure"].isna().any():
+        frame = frame[frame["pressure"].notna()]
+    converted = {}
+    for name in frame.columns:
+        values = frame[name]
+        if name == "pressure":
+            info = np.iinfo(np.int16)
+            values = np.clip(np.rint(values.to_numpy(dtype=np.float64)), info.min, info.max)
+        elif name == "date":
+            values = values.dt.floor("D")
+        converted[name] = pd.Series(values, index=frame.index).astype(DTYPES.get(name, values.dtype))
+    return pd.DataFrame(converted).reset_index(drop=True)
+
+
+def _frame(data: dict, columns) -> pd.DataFrame:
+    """Assemble stored columns into the dashboard frame (dates from days since 1950, derived regions)"""
+    columns = list(COLUMNS if columns is None else columns)
+    frame = {}
+    for name in columns:
+        if name == "region":
+            frame[name] = assign_regions(data["latitude"], data["longitude"])
+        elif name == "date":
+            frame[name] = pd.to_datetime(np.asarray(data["date"], dtype=np.float64), unit="D", origin=JULD_ORIGIN)
+        elif name == "float_id":
+            codes, categories = pd.factorize(np.asarray(data[name]).astype(str), sort=True)
+            frame[name] = pd.Categorical.from_codes(codes, categories=categories)
+        else:
+            frame[name] = np.asarray(data[name])
+    return compact(pd.DataFrame(frame, columns=columns))
+
+
+def generate_synthetic(n_rows: int = None, seed: int = 42) -> pd.DataFrame:
+    """Simulated archive of about ``n_rows`` levels: floats of 100 ten-day profiles across five basins"""
+    n_rows = SYNTHETIC_ROWS if n_rows is None else n_rows
+    rng = np.random.default_rng(seed)
+    n_levels = SYNTHETIC_DEPTHS.shape[0]
+    n_profiles = max(1, -(-n_rows // n_levels))
+    n_floats = max(1, -(-n_profiles // PROFILES_PER_FLOAT))
+
+    # Per float: basin (three consecutive floats per basin, cycling) and start position
+    float_region = (np.arange(n_floats) // 3) % len(SYNTHETIC_REGIONS)
+    lat_lo, lat_hi, lon_lo, lon_hi, temp_base = (
+        np.array([r["lat_range"][0] for r in SYNTHETIC_REGIONS], dtype=np.float64)[float_region],
+        np.array([r["lat_range"][1] for r in SYNTHETIC_REGIONS], dtype=np.float64)[float_region],
+        np.array([r["lon_range"][0] for r in SYNTHETIC_REGIONS], dtype=np.float64)[float_region],
+        np.array([r["lon_range"][1] for r in SYNTHETIC_REGIONS], dtype=np.float64)[float_region],
+        np.array([r["temp_base"] for r in SYNTHETIC_REGIONS], dtype=np.float64)[float_region],
+    )
+    start_lat = rng.uniform(lat_lo, lat_hi)
+    start_lon = rng.uniform(lon_lo, lon_hi)
+
+    # Per profile: drift away from the start position, one profile every 10 days
+    profile_float = np.arange(n_profiles) // PROFILES_PER_FLOAT
+    n_prof = np.arange(n_profiles) % PROFILES_PER_FLOAT + 1
+    drift = n_prof * 0.01
+    lat = np.clip(start_lat[profile_float] + rng.normal(0, 0.1, n_profiles) * drift,
+                  lat_lo[profile_float], lat_hi[profile_float]).round(4)
+    lon = np.clip(start_lon[profile_float] + rng.normal(0, 0.1, n_profiles) * drift,
+                  lon_lo[profile_float], lon_hi[profile_float]).round(4)
+    date = SYNTHETIC_START + (n_prof * 10).astype("timedelta64[D]")
+
+    # Per level: temperature decays with depth, salinity rises slightly
+    n = n_profiles * n_levels
+    row_profile = np.repeat(np.arange(n_profiles), n_levels)
+    depth = np.tile(SYNTHETIC_DEPTHS.astype(np.int16), n_profiles)
+    temp_surface = temp_base[profile_float][row_profile] + 2.0 * rng.standard_normal(n, dtype=np.float32)
+    temperature = np.maximum(temp_surface * np.exp(-depth / 1000.0) + 0.5 * rng.standard_normal(n, dtype=np.float32), 2.0)
+    salinity = np.clip(34.5 + 0.3 * rng.standard_normal(n, dtype=np.float32) + depth / 2000.0 * 0.5
+                       + 0.1 * rng.standard_normal(n, dtype=np.float32), 33, 37)
+
+    float_names = np.char.add("ARGO_", np.char.zfill(np.arange(1, n_floats + 1).astype(str), 4))
+    region_names = [r["name"] for r in SYNTHETIC_REGIONS]
+    frame = pd.DataFrame({
+        "float_id": pd.Categorical.from_codes(profile_float[row_profile], categories=float_names),
+        "n_prof": n_prof.astype(np.int16)[row_profile],
+        "latitude": lat.astype(np.float32)[row_profile],
+        "longitude": lon.astype(np.float32)[row_profile],
+        "pressure": depth,
+        "temperature": temperature.round(2).astype(np.float32),
+        "salinity": salinity.round(3).astype(np.float32),
+        "date": date.astype("datetime64[s]")[row_profile],
+        "region": pd.Categorical.from_codes(float_region[profile_float][row_profile], categories=region_names),
+    })
+    return frame.iloc[:n_rows].copy() if n > n_rows else frame
+
+
+def default_db_path():
+    """``DASHBOARD_DB`` or the first existing database in the locations the API uses"""
+    if os.getenv("DASHBOARD_DB"):
+        return Path(os.environ["DASHBOARD_DB"])
+    url = os.getenv("DATABASE_URL", "")
+    if url.startswith("sqlite:///") and ":memory:" not in url:
+        return Path(url[len("sqlite:///"):])
+    for path in (Path(tempfile.gettempdir()) / "argo.db", Path.home() / ".argo" / "argo.db",
+                 Path.cwd() / "argo.db", Path(__file__).parent / "data" / "argo.db"):
+        if path.exists():
+            return path
+    return None
+
+
+def load_sqlite(path=None, columns=None) -> pd.DataFrame:
+    """Read the archive from SQLite (read-only), selecting only the stored columns ``columns`` need"""
+    path = default_db_path() if path is None else Path(path)
+    if path is None or not path.exists():
+        raise FileNotFoundError(f"Database not found: {path}. Set DASHBOARD_DB or ingest data first.")
+    needed = _projection(columns)
+    sql = (f"SELECT {', '.join(SQL_COLUMNS[c] for c in needed)} "
+           "FROM profiles p JOIN measurements m ON m.profile_id = p.id "
+           "ORDER BY p.float_id, p.n_prof, m.pres")
+    con = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = con.execute(sql).fetchall()
+    finally:
+        con.close()
+    values = list(zip(*rows)) if rows else [()] * len(needed)
+    data = {}
+    for name, col in zip(needed, values):
+        if name == "float_id":
+            data[name] = np.asarray(col, dtype=str)
+        elif name == "n_prof":
+            data[name] = np.asarray([-1 if v is None else v for v in col], dtype=np.int64)
+        else:
+            data[name] = np.asarray(col, dtype=np.float64)
+    return _frame(data, columns)
+
+
+def load_api(url: str = None, columns=None) -> pd.DataFrame:
+    """Fetch the archive from the FastAPI backend as NumPy arrays, only the needed columns"""
+    import requests
+
+    url = API_URL if url is None else url
+    needed = _projection(columns)
+    response = requests.post(
+        f"{url}/measurements/query",
+        json={"variables": [API_COLUMNS[c] for c in needed]},
+        headers={"Accept": "application/x-npz"},
+        timeout=(3, 300),
+    )
+    response.raise_for_status()
+    with np.load(io.BytesIO(response.content)) as arrays:
+        data = {name: arrays[API_COLUMNS[name]] for name in needed}
+    return _frame(data, columns)
+
+
+# Last body and ETag per URL, for conditional GETs (the API answers 304 while its data is unchanged)
+_validated = {}
+
+
+def _get_json(url: str):
+    import requests
+
+    etag, payload = _validated.get(url, (None, None))
+    response = requests.get(url, headers={"If-None-Match": etag} if etag else {}, timeout=(3, 60))
+    if response.status_code == 304 and payload is not None:
+        return payload
+    response.raise_for_status()
+    payload = response.json()
+    if response.headers.get("ETag"):
+        _validated[url] = (response.headers["ETag"], payload)
+    return payload
+
+
+def load_float_stats(source: str = None):
+    """Per-float trajectory statistics stored by ingest (``float_stats``), indexed by float id.
+
+    None for the synthetic source, or when the database predates the
+    table or has not been filled yet: callers compute them from the frame.
+    """
+    source = SOURCE if source is None else source
+    if source == "sqlite":
+        path = default_db_path()
+        if path is None or not path.exists():
+            return None
+        con = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            stats = pd.read_sql_query("SELECT * FROM float_stats", con)
+        except (sqlite3.OperationalError, pd.errors.DatabaseError):
+            return None
+        finally:
+            con.close()
+    elif source == "api":
+        import requests
+
+        stats = pd.DataFrame(_get_json(f"{API_URL}/floats/stats")["items"])
+    else:
+        return None
+    if stats.empty:
+        return None
+    return stats.drop(columns=["updated_at"], errors="ignore").set_index("float_id")
+
+
+def load(source: str = None, columns=None, n_rows: int = None) -> pd.DataFrame:
+    """The dashboard frame from ``source`` (default ``DASHBOARD_SOURCE``)"""
+    source = SOURCE if source is None else source
+    if source == "synthetic":
+        frame = generate_synthetic(n_rows)
+        return frame if columns is None else frame[list(columns)]
+    if source == "sqlite":
+        return load_sqlite(columns=columns)
+    if source == "api":
+        return load_api(columns=columns)
+    raise ValueError(f"Unknown DASHBOARD_SOURCE: {source}. Available: {list(SOURCES)}")
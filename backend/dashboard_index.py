@@ -0,0 +1,172 @@
+"""Pre-sorted index over the dashboard frame for the sidebar filters.
+
+Rows are sorted once by (pressure bin, region, float, date, pressure) with
+region and float held as integer category codes and ``PRESSURE_BIN``-wide
+pressure bins.  Every (bin, region, float) triple is then a contiguous
+block with a known pressure range, and a date range inside a block is
+found by binary search on the composite key ``block * span + day``:
+
+- blocks outside the depth range, region or float are skipped without
+  touching their rows;
+- blocks wholly inside the depth range need no per-row test, so a
+  depth-only selection is one contiguous slice (no copy);
+- only blocks straddling a depth boundary are masked row by row.
+
+Results are kept in a small LRU keyed by the filter tuple, so flipping
+back to an earlier selection costs nothing.  The index is read-only and
+meant to be shared by every session (``st.cache_resource``).
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+CACHE_SIZE = 16
+
+# Width (dbar) of the pressure bins leading the sort order; the depth slider moves in 50 m steps
+PRESSURE_BIN = 10.0
+
+# Stand-in day for undated rows: sorts first, excluded by any date range
+NO_DATE = np.iinfo(np.int64).min // 4
+
+
+def _codes(values):
+    """Category codes and names of a column (categorical or not)"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy().astype(np.int64), list(values.cat.categories)
+    codes, names = pd.factorize(values, sort=True)
+    return codes.astype(np.int64), list(names)
+
+
+def day_number(value) -> int:
+    """Days since 1970-01-01 of a date/datetime/string"""
+    return int(np.datetime64(value, "D").astype(np.int64))
+
+
+class FrameIndex:
+    def __init__(self, frame: pd.DataFrame):
+        region, self.regions = _codes(frame["region"])
+        float_code, self.floats = _codes(frame["float_id"])
+        dates = frame["date"].to_numpy().astype("datetime64[D]")
+        day = np.where(np.isnat(dates), NO_DATE, dates.astype(np.int64))
+        pressure = frame["pressure"].to_numpy()
+        # NaN pressures share bin -1 and are dropped by any depth filter
+        pres_bin = np.floor(np.nan_to_num(pressure.astype(np.float64), nan=-PRESSURE_BIN) / PRESSURE_BIN).astype(np.int64)
+        pres_bin -= pres_bin.min() if pres_bin.shape[0] else 0
+
+        order = np.lexsort((pressure, day, float_code, region, pres_bin))
+        self.frame = frame.iloc[order].reset_index(drop=True)
+        self.pressure = pressure[order]
+        dated = day[day != NO_DATE]
+        self.dated = dated.shape[0] > 0
+        self.undated = dated.shape[0] < day.shape[0]
+        self.day_min = int(dated.min()) if self.dated else 0
+        self.day_max = int(dated.max()) if self.dated else 0
+        self.span = self.day_max - self.day_min + 2
+        # Undated rows get offset 0, dated rows 1..span-1
+        day = day[order]
+        offset = np.where(day == NO_DATE, 0, day - self.day_min + 1)
+        block = (pres_bin[order] * max(len(self.regions), 1) + region[order]) * max(len(self.floats), 1) + float_code[order]
+        self.key = block * self.span + offset
+
+        # One entry per (bin, region, float) block
+        starts = np.flatnonzero(np.r_[True, block[1:] != block[:-1]]) if block.shape[0] else np.empty(0, np.int64)
+        self.block_start = starts
+        self.block_stop = np.r_[starts[1:], block.shape[0]].astype(np.int64)
+        self.block_id = block[starts]
+        self.block_region = region[order][starts]
+        self.block_float = float_code[order][starts]
+        pressure64 = self.pressure.astype(np.float64)
+        self.block_pmin = np.fmin.reduceat(pressure64, starts) if starts.shape[0] else np.empty(0)
+        self.block_pmax = np.fmax.reduceat(pressure64, starts) if starts.shape[0] else np.empty(0)
+
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.frame.shape[0]
+
+    def regions_present(self) -> list:
+        """Region names that have rows"""
+        return sorted(self.regions[c] for c in np.unique(self.block_region))
+
+    def floats_in(self, region=None) -> list:
+        """Float ids with rows in ``region`` (all floats when None)"""
+        blocks = self.block_float
+        if region is not None:
+            code = self.regions.index(region) if region in self.regions else -1
+            blocks = blocks[self.block_region == code]
+        return sorted(self.floats[c] for c in np.unique(blocks))
+
+    def date_bounds(self):
+        """First and last date, or None when no row is dated"""
+        if not self.dated:
+            return None
+        return np.datetime64(self.day_min, "D"), np.datetime64(self.day_max, "D")
+
+    def _covers(self, date_range) -> bool:
+        """True when ``date_range`` spans every dated row and there are no undated rows to exclude"""
+        return (day_number(date_range[0]) <= self.day_min and day_number(date_range[1]) >= self.day_max
+                and not self.undated)
+
+    def ranges(self, region=None, float_id=None, pressure_range=None, date_range=None):
+        """Row ranges ``(starts, stops, partial)`` of the selection; ``partial`` ranges still need the pressure test"""
+        keep = np.ones(self.block_start.shape[0], dtype=bool)
+        if region is not None:
+            keep &= self.block_region == (self.regions.index(region) if region in self.regions else -1)
+        if float_id is not None:
+            keep &= self.block_float == (self.floats.index(float_id) if float_id in self.floats else -1)
+        partial = np.zeros(self.block_start.shape[0], dtype=bool)
+        if pressure_range is not None:
+            low, high = pressure_range
+            inside = (self.block_pmin >= low) & (self.block_pmax <= high)
+            outside = (self.block_pmax < low) | (self.block_pmin > high)
+            keep &= ~outside
+            partial = ~inside
+        starts, stops, partial = self.block_start[keep], self.block_stop[keep], partial[keep]
+        if date_range is not None and not self._covers(date_range):
+            low = np.clip(day_number(date_range[0]) - self.day_min + 1, 1, self.span)
+            high = np.clip(day_number(date_range[1]) - self.day_min + 1, 0, self.span - 1)
+            base = self.block_id[keep] * self.span
+            starts = np.searchsorted(self.key, base + low, side="left")
+            stops = np.searchsorted(self.key, base + high, side="right")
+            nonempty = stops > starts
+            starts, stops, partial = starts[nonempty], stops[nonempty], partial[nonempty]
+        return starts, stops, partial
+
+    def select(self, region=None, float_id=None, pressure_range=None, date_range=None):
+        """Selected rows: a ``slice`` when they are contiguous, otherwise an index array"""
+        starts, stops, partial = self.ranges(region, float_id, pressure_range, date_range)
+        if starts.shape[0] == 0:
+            return np.empty(0, dtype=np.int64)
+        if not partial.any():
+            # Adjacent ranges merge (e.g. every float of a region within a bin)
+            breaks = np.flatnonzero(starts[1:] != stops[:-1])
+            if breaks.shape[0] == 0:
+                return slice(int(starts[0]), int(stops[-1]))
+        lengths = stops - starts
+        rows = np.repeat(starts - np.r_[0, np.cumsum(lengths)[:-1]], lengths) + np.arange(lengths.sum())
+        if partial.any():
+            check = np.repeat(partial, lengths)
+            pressure = self.pressure[rows[check]]
+            ok = np.ones(rows.shape[0], dtype=bool)
+            ok[check] = (pressure >= pressure_range[0]) & (pressure <= pressure_range[1])
+            rows = rows[ok]
+        return rows
+
+    def filter(self, region=None, float_id=None, pressure_range=None, date_range=None) -> pd.DataFrame:
+        """Rows matching every given filter (None means no restriction), cached by the filter tuple"""
+        key = (region, float_id, None if pressure_range is None else tuple(pressure_range),
+               None if date_range is None else tuple(day_number(d) for d in date_range))
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        rows = self.select(region, float_id, pressure_range, date_range)
+        result = self.frame.iloc[rows] if isinstance(rows, slice) else self.frame.take(rows)
+        with self._lock:
+            self._cache[key] = result
+            while len(self._cache) > CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return result
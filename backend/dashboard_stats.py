@@ -0,0 +1,75 @@
+"""Precomputed statistics behind the dashboard metrics.
+
+The frame is summarized once into mergeable sketches (``app/sketches.py``)
+with a partition per region × month × ``DEPTH_STEP`` depth band, holding
+temperature/salinity moments and histograms and HyperLogLog counts of
+distinct floats and profiles.  The sidebar filters select partitions, so
+the metrics and histograms merge a few thousand partitions instead of
+scanning the filtered rows.  A single float is few rows: its metrics are
+sketched from the index's filtered rows directly.
+
+Whole partitions are merged: the depth range covers every band it touches
+and the date range every month it touches (exact for the defaults, which
+span the data); float and profile counts are estimates.
+"""
+import numpy as np
+import pandas as pd
+
+from app import sketches
+
+# Band width (dbar) matching the depth slider step
+DEPTH_STEP = 50.0
+DEPTH_BANDS = np.arange(0.0, 2000.0 + DEPTH_STEP, DEPTH_STEP)
+
+# Registers per distinct count: ~3% error
+HLL_PRECISION = 10
+
+VARIABLES = {"temperature": "temp", "salinity": "psal"}
+
+
+def _sketch(frame: pd.DataFrame) -> dict:
+    float_code = frame["float_id"].cat.codes.to_numpy().astype(np.int64)
+    keys = {
+        "region": frame["region"].cat.codes.to_numpy(),
+        "month": sketches.month_key(dates=frame["date"].to_numpy()),
+        "band": sketches.depth_band(frame["pressure"].to_numpy(), DEPTH_BANDS),
+    }
+    return sketches.build(
+        keys,
+        {var: frame[column].to_numpy() for column, var in VARIABLES.items()},
+        distinct={
+            "floats": float_code,
+            "profiles": (float_code << 32) | frame["n_prof"].to_numpy().astype(np.int64),
+        },
+        precision=HLL_PRECISION,
+    )
+
+
+class FrameStats:
+    def __init__(self, index):
+        self.index = index
+        self.regions = list(index.frame["region"].cat.categories)
+        self.sketch = _sketch(index.frame)
+
+    def summary(self, region=None, float_id=None, pressure_range=None, date_range=None) -> dict:
+        """Merged statistics of the filter selection (see ``sketches.summarize``)"""
+        if float_id is not None:
+            rows = self.index.filter(region, float_id, pressure_range, date_range)
+            return sketches.summarize(_sketch(rows))
+        regions = None
+        if region is not None:
+            regions = [self.regions.index(region)] if region in self.regions else []
+        bands = None if pressure_range is None else sketches.bands_overlapping(DEPTH_BANDS, *pressure_range)
+        months = None
+        if date_range is not None:
+            months = (sketches.month_of(date_range[0]), sketches.month_of(date_range[1]))
+        return sketches.summarize(self.sketch, sketches.select(self.sketch, region=regions, month=months, band=bands))
+
+
+def histogram(summary: dict, column: str) -> pd.DataFrame:
+    """``(lower edge, count)`` of a variable's histogram, trimmed to the occupied bins"""
+    hist = summary[VARIABLES[column]]["histogram"]
+    counts = np.asarray(hist["counts"])
+    occupied = np.flatnonzero(counts)
+    lo, hi = (occupied[0], occupied[-1] + 1) if occupied.shape[0] else (0, 0)
+    return pd.DataFrame({"edge": np.asarray(hist["edges"][:-1])[lo:hi], "count": counts[lo:hi]})
@@ -0,0 +1,66 @@
+"""Float trajectories for the dashboard.
+
+Built once per data source: one position per profile, sorted by float and
+time so a float's track is a slice, and a table of per-float trajectory
+statistics (haversine along-track distance, drift speed, mission
+duration) so the Float Trajectories page is a single-row lookup.  The
+statistics come from ``float_stats`` (precomputed at ingest) for the
+sqlite and api sources and are computed here with the same
+``app/trajectory.py`` code for synthetic data.
+"""
+import numpy as np
+import pandas as pd
+
+import dashboard_data
+from app import trajectory
+
+JULD_ORIGIN = np.datetime64(dashboard_data.JULD_ORIGIN, "s")
+
+
+class Tracks:
+    def __init__(self, frame: pd.DataFrame, source: str = None):
+        codes = frame["float_id"].cat.codes.to_numpy().astype(np.int64)
+        n_prof = frame["n_prof"].to_numpy().astype(np.int64)
+        # First row of every (float, profile): its position and date
+        _, first, profile_of_row = np.unique((codes << 32) | (n_prof & 0xFFFFFFFF), return_index=True,
+                                             return_inverse=True)
+        profiles = frame.iloc[first][["float_id", "n_prof", "latitude", "longitude", "date"]]
+        juld = (profiles["date"].to_numpy() - JULD_ORIGIN) / np.timedelta64(1, "D")
+        order = np.lexsort((profiles["n_prof"].to_numpy(), juld, codes[first]))
+        self.positions = profiles.iloc[order].reset_index(drop=True)
+        self.floats = list(frame["float_id"].cat.categories)
+        self._codes = codes[first][order]
+        # Row of ``positions`` for every frame row, so a filter selection maps to its profiles
+        rank = np.empty(order.shape[0], dtype=np.int64)
+        rank[order] = np.arange(order.shape[0])
+        self._row_position = rank[profile_of_row.reshape(-1)]
+
+        stats = dashboard_data.load_float_stats(source)
+        if stats is None:
+            computed = trajectory.track_stats(codes[first], profiles["n_prof"].to_numpy(), profiles["latitude"].to_numpy(),
+                                              profiles["longitude"].to_numpy(), juld)
+            stats = pd.DataFrame({name: computed[name] for name in trajectory.FIELDS},
+                                 index=pd.Index([self.floats[c] for c in computed["float_code"]], name="float_id"))
+        self.stats = stats
+
+    def positions_of(self, rows) -> pd.DataFrame:
+        """Positions of the profiles with a row in ``rows`` (a ``FrameIndex.select`` over the same frame)"""
+        selected = np.zeros(self.positions.shape[0], dtype=bool)
+        selected[self._row_position[rows]] = True
+        return self.positions[selected]
+
+    def track(self, float_id, date_range=None) -> pd.DataFrame:
+        """A float's profile positions in time order, optionally within ``date_range``"""
+        code = self.floats.index(float_id) if float_id in self.floats else -1
+        start, stop = np.searchsorted(self._codes, [code, code + 1])
+        positions = self.positions.iloc[start:stop]
+        if date_range is not None:
+            dates = positions["date"]
+            positions = positions[(dates >= pd.Timestamp(date_range[0])) & (dates < pd.Timestamp(date_range[1]) + pd.Timedelta(days=1))]
+        return positions
+
+    def stats_for(self, float_id):
+        """The float's statistics row as a dict, or None"""
+        if float_id not in self.stats.index:
+            return None
+        return self.stats.loc[float_id].to_dict()
@@ -17,7 +17,7 @@ try {
 
     .\.venv\Scripts\python -m ensurepip --upgrade
     .\.venv\Scripts\python -m pip install --upgrade pip
-    .\.venv\Scripts\python -m pip install fastapi "uvicorn[standard]" SQLAlchemy pandas | Out-Host
+    .\.venv\Scripts\python -m pip install fastapi "uvicorn[standard]" "SQLAlchemy[asyncio]" aiosqlite orjson msgpack brotli zstandard pyarrow pandas netCDF4 | Out-Host
 
     Write-Host "Verifying installs..." -ForegroundColor Yellow
     .\.venv\Scripts\python -c "import sqlalchemy, pandas; print('sqlalchemy', sqlalchemy.__version__, '| pandas', pandas.__version__)" | Out-Host
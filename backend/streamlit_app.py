@@ -1,77 +1,31 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
+import json
 import random
-import time
+import requests
 from datetime import datetime, timedelta
 
-# Generate realistic Argo float data
-@st.cache_data
-def generate_argo_data():
-    """Generate realistic Argo float dataset"""
-    np.random.seed(42)  # For reproducible data
-    
-    # Create 15 different floats across different ocean regions
-    floats = []
-    base_date = datetime(2023, 1, 1)
-    
-    regions = [
-        {"name": "North Pacific", "lat_range": (35, 50), "lon_range": (-180, -120), "temp_base": 12},
-        {"name": "South Pacific", "lat_range": (-45, -20), "lon_range": (-180, -120), "temp_base": 18},
-        {"name": "North Atlantic", "lat_range": (40, 60), "lon_range": (-60, -10), "temp_base": 10},
-        {"name": "South Atlantic", "lat_range": (-40, -10), "lon_range": (-50, 10), "temp_base": 20},
-        {"name": "Indian Ocean", "lat_range": (-30, 10), "lon_range": (40, 100), "temp_base": 22},
-    ]
-    
-    float_id = 1
-    for region in regions:
-        for i in range(3):  # 3 floats per region
-            # Generate float trajectory over 2 years
-            n_profiles = random.randint(80, 120)
-            
-            # Starting position
-            start_lat = np.random.uniform(*region["lat_range"])
-            start_lon = np.random.uniform(*region["lon_range"])
-            
-            for profile_num in range(1, n_profiles + 1):
-                # Drift simulation
-                days_elapsed = profile_num * 10  # Profile every 10 days
-                drift_lat = start_lat + np.random.normal(0, 0.1) * profile_num * 0.01
-                drift_lon = start_lon + np.random.normal(0, 0.1) * profile_num * 0.01
-                
-                # Keep within reasonable bounds
-                drift_lat = np.clip(drift_lat, region["lat_range"][0], region["lat_range"][1])
-                drift_lon = np.clip(drift_lon, region["lon_range"][0], region["lon_range"][1])
-                
-                # Generate depth profile (0-2000m)
-                depths = np.array([0, 10, 20, 30, 50, 75, 100, 125, 150, 200, 250, 300, 400, 500, 600, 750, 1000, 1250, 1500, 2000])
-                
-                for depth in depths:
-                    # Temperature decreases with depth
-                    temp_surface = region["temp_base"] + np.random.normal(0, 2)
-                    temp = temp_surface * np.exp(-depth / 1000) + np.random.normal(0, 0.5)
-                    temp = max(temp, 2)  # Minimum deep water temp
-                    
-                    # Salinity varies by region and depth
-                    sal_base = 34.5 + np.random.normal(0, 0.3)
-                    salinity = sal_base + (depth / 2000) * 0.5 + np.random.normal(0, 0.1)
-                    salinity = np.clip(salinity, 33, 37)
-                    
-                    floats.append({
-                        'float_id': f'ARGO_{float_id:04d}',
-                        'n_prof': profile_num,
-                        'latitude': round(drift_lat, 4),
-                        'longitude': round(drift_lon, 4),
-                        'pressure': depth,
-                        'temperature': round(temp, 2),
-                        'salinity': round(salinity, 3),
-                        'date': base_date + timedelta(days=days_elapsed),
-                        'region': region["name"]
-                    })
-            
-            float_id += 1
-    
-    return pd.DataFrame(floats)
+import dashboard_data
+import dashboard_index
+import dashboard_stats
+import dashboard_tracks
+
+# Dashboard data: synthetic, SQLite or API depending on DASHBOARD_SOURCE,
+# loaded and indexed once and shared read-only by every session
+@st.cache_resource(show_spinner="Loading Argo data...")
+def load_argo_index(source):
+    """Sorted filter index (and frame) for a data source"""
+    return dashboard_index.FrameIndex(dashboard_data.load(source))
+
+@st.cache_resource(show_spinner="Precomputing statistics...")
+def load_argo_stats(source):
+    """Mergeable per-partition statistics behind the dashboard metrics"""
+    return dashboard_stats.FrameStats(load_argo_index(source))
+
+@st.cache_resource(show_spinner="Loading float trajectories...")
+def load_argo_tracks(source):
+    """Time-ordered profile positions and per-float trajectory statistics"""
+    return dashboard_tracks.Tracks(load_argo_index(source).frame, source)
 
 # Hardcoded chat responses
 CHAT_RESPONSES = {
@@ -222,6 +176,62 @@ def get_chat_response(question):
 Try asking about any of these topics! 🌊
         """
 
+def stream_chat(question):
+    """Yield ``(event, data)`` pairs from the backend's ``/chat/stream`` Server-Sent Events"""
+    with requests.get(f"{dashboard_data.API_URL}/chat/stream", params={"question": question}, stream=True, timeout=(3, 60)) as r:
+        r.raise_for_status()
+        event = None
+        for line in r.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: ") and event:
+                yield event, json.loads(line[len("data: "):])
+                event = None
+
+
+def render_chat_stream(question):
+    """Render a streamed answer as its parts arrive; returns the markdown kept in the history.
+
+    Raises if the stream fails before anything arrived (the caller falls back to the
+    built-in answers); a failure after that replaces the partial output with the error.
+    """
+    status = st.empty()
+    answer_box = st.empty()
+    sql_box = st.empty()
+    rows_box = st.empty()
+    status.caption("Understanding the question...")
+    answer, sql, rows = "", None, []
+    received = False
+    try:
+        for event, data in stream_chat(question):
+            received = True
+            if event == "intent":
+                intent = data["intent"]
+                status.caption(f"Intent: {intent['kind'] if intent else 'not understood'} · {data['elapsed_ms']:.0f} ms")
+            elif event == "sql":
+                sql = data["sql"]
+                sql_box.code(sql, language="sql")
+            elif event == "rows":
+                rows += data["rows"]
+                if rows:
+                    rows_box.dataframe(pd.DataFrame(rows, columns=data["columns"]), hide_index=True)
+            elif event == "answer":
+                answer = data["answer"]
+                answer_box.markdown(answer)
+                status.caption(f"Answered in {data['elapsed_ms']:.0f} ms")
+            elif event == "error":
+                raise RuntimeError(data["detail"])
+    except (requests.RequestException, RuntimeError) as e:
+        for box in (status, answer_box, sql_box, rows_box):
+            box.empty()
+        if not received:
+            raise
+        print(f"Chat stream failed: {e}")
+        message = f"⚠️ The answer could not be completed: {e}"
+        st.error(message)
+        return message
+    return answer + (f"\n\n```sql\n{sql}\n```" if sql else "")
+
 # Main App
 st.set_page_config(
     page_title="🌊 Argo Float Explorer", 
@@ -229,8 +239,7 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Load the hardcoded data
-df = generate_argo_data()
+index = load_argo_index(dashboard_data.SOURCE)
 
 # Sidebar for navigation and filters
 with st.sidebar:
@@ -249,14 +258,11 @@ with st.sidebar:
     st.subheader("🎛️ Filters")
     
     # Region filter
-    regions = ["All Regions"] + sorted(df['region'].unique().tolist())
+    regions = ["All Regions"] + index.regions_present()
     selected_region = st.selectbox("🌍 Ocean Region:", regions)
     
     # Float filter
-    if selected_region != "All Regions":
-        available_floats = ["All Floats"] + sorted(df[df['region'] == selected_region]['float_id'].unique().tolist())
-    else:
-        available_floats = ["All Floats"] + sorted(df['float_id'].unique().tolist())
+    available_floats = ["All Floats"] + index.floats_in(None if selected_region == "All Regions" else selected_region)
     selected_float = st.selectbox("🤖 Float ID:", available_floats)
     
     # Depth filter
@@ -268,31 +274,27 @@ with st.sidebar:
         step=50
     )
     
-    # Date filter
-    date_range = st.date_input(
-        "📅 Date Range:",
-        value=(df['date'].min().date(), df['date'].max().date()),
-        min_value=df['date'].min().date(),
-        max_value=df['date'].max().date()
+    # Date filter (profiles ingested without JULD have no date)
+    date_bounds = index.date_bounds()
+    if date_bounds is not None:
+        first, last = (d.astype(object) for d in date_bounds)
+        date_range = st.date_input(
+            "📅 Date Range:",
+            value=(first, last),
+            min_value=first,
+            max_value=last
+        )
+    else:
+        date_range = ()
+    
+    # Apply filters through the sorted index (results cached per filter combination)
+    filters = dict(
+        region=None if selected_region == "All Regions" else selected_region,
+        float_id=None if selected_float == "All Floats" else selected_float,
+        pressure_range=depth_range,
+        date_range=date_range if len(date_range) == 2 else None,
     )
-    
-    # Apply filters
-    filtered_df = df.copy()
-    if selected_region != "All Regions":
-        filtered_df = filtered_df[filtered_df['region'] == selected_region]
-    if selected_float != "All Floats":
-        filtered_df = filtered_df[filtered_df['float_id'] == selected_float]
-    
-    filtered_df = filtered_df[
-        (filtered_df['pressure'] >= depth_range[0]) & 
-        (filtered_df['pressure'] <= depth_range[1])
-    ]
-    
-    if len(date_range) == 2:
-        filtered_df = filtered_df[
-            (filtered_df['date'].dt.date >= date_range[0]) & 
-            (filtered_df['date'].dt.date <= date_range[1])
-        ]
+    filtered_df = index.filter(**filters)
     
     st.markdown("---")
     st.info(f"📊 **{len(filtered_df):,}** measurements selected")
@@ -302,43 +304,44 @@ if page == "🏠 Dashboard":
     st.title("🌊 Argo Float Data Explorer")
     st.markdown("### Real-time Oceanographic Monitoring Dashboard")
     
-    # Simulate "loading" effect
+    # Reload from the configured source
     if st.button("🔄 Refresh Data", type="primary"):
-        with st.spinner("Fetching latest data from Argo network..."):
-            time.sleep(1)
-        st.success("✅ Data refreshed successfully!")
+        load_argo_index.clear()
+        load_argo_stats.clear()
+        load_argo_tracks.clear()
         st.rerun()
     
-    # Key metrics
+    # Key metrics and distributions merge precomputed partition statistics
+    stats = load_argo_stats(dashboard_data.SOURCE).summary(**filters)
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
         st.metric(
             "🤖 Active Floats", 
-            len(filtered_df['float_id'].unique()),
+            stats['distinct_floats'],
             delta=f"+{random.randint(1,3)} this week"
         )
     
     with col2:
         st.metric(
             "📊 Total Profiles", 
-            len(filtered_df['n_prof'].unique()),
+            f"{stats['distinct_profiles']:,}",
             delta=f"+{random.randint(10,50)} today"
         )
     
     with col3:
-        avg_temp = filtered_df['temperature'].mean()
+        avg_temp = stats['temp']['mean']
         st.metric(
             "🌡️ Avg Temperature", 
-            f"{avg_temp:.1f}°C",
+            f"{avg_temp:.1f}°C" if avg_temp is not None else "n/a",
             delta=f"{random.uniform(-0.5, 0.5):.1f}°C"
         )
     
     with col4:
-        avg_sal = filtered_df['salinity'].mean()
+        avg_sal = stats['psal']['mean']
         st.metric(
             "🧂 Avg Salinity", 
-            f"{avg_sal:.2f} PSU",
+            f"{avg_sal:.2f} PSU" if avg_sal is not None else "n/a",
             delta=f"{random.uniform(-0.1, 0.1):.2f} PSU"
         )
     
@@ -367,29 +370,24 @@ if page == "🏠 Dashboard":
     with col1:
         # Temperature distribution
         st.write("🌡️ **Temperature Distribution**")
-        temp_hist = np.histogram(filtered_df['temperature'], bins=30)
-        temp_df = pd.DataFrame({
-            'Temperature (°C)': temp_hist[1][:-1],
-            'Count': temp_hist[0]
-        })
+        temp_df = dashboard_stats.histogram(stats, 'temperature').rename(
+            columns={'edge': 'Temperature (°C)', 'count': 'Count'})
         st.bar_chart(temp_df.set_index('Temperature (°C)'))
     
     with col2:
         # Salinity distribution
         st.write("🧂 **Salinity Distribution**")
-        sal_hist = np.histogram(filtered_df['salinity'], bins=30)
-        sal_df = pd.DataFrame({
-            'Salinity (PSU)': sal_hist[1][:-1],
-            'Count': sal_hist[0]
-        })
+        sal_df = dashboard_stats.histogram(stats, 'salinity').rename(
+            columns={'edge': 'Salinity (PSU)', 'count': 'Count'})
         st.bar_chart(sal_df.set_index('Salinity (PSU)'))
 
 elif page == "🗺️ Float Trajectories":
     st.title("🗺️ Argo Float Trajectories")
     st.markdown("### Interactive map showing float positions and drift patterns")
     
-    # Create trajectory map using Streamlit's built-in map
-    map_data = filtered_df.groupby(['float_id', 'latitude', 'longitude']).first().reset_index()
+    # Precomputed profile positions, restricted to the profiles the filters select
+    tracks = load_argo_tracks(dashboard_data.SOURCE)
+    map_data = tracks.positions_of(index.select(**filters))
     
     st.subheader("🌍 Global Argo Float Positions")
     st.map(map_data[['latitude', 'longitude']], size=20, color='#FF0000')
@@ -398,28 +396,28 @@ elif page == "🗺️ Float Trajectories":
     st.subheader("🛤️ Individual Float Trajectories")
     
     if selected_float != "All Floats":
-        float_data = filtered_df[filtered_df['float_id'] == selected_float]
-        
-        # Create trajectory data
-        trajectory_data = float_data.groupby(['n_prof', 'latitude', 'longitude', 'date']).first().reset_index()
-        trajectory_data = trajectory_data.sort_values('date')
+        # Precomputed positions and statistics: a slice and a single-row lookup
+        trajectory_data = tracks.track(selected_float, date_range if len(date_range) == 2 else None)
+        float_stats = tracks.stats_for(selected_float)
         
         st.write(f"**Trajectory for {selected_float}**")
         st.map(trajectory_data[['latitude', 'longitude']], size=10, color='#0000FF')
         
-        # Trajectory statistics
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("📍 Total Positions", len(trajectory_data))
-        with col2:
-            distance = np.sqrt(
-                (trajectory_data['latitude'].iloc[-1] - trajectory_data['latitude'].iloc[0])**2 +
-                (trajectory_data['longitude'].iloc[-1] - trajectory_data['longitude'].iloc[0])**2
-            ) * 111  # Rough km conversion
-            st.metric("🏃 Distance Traveled", f"{distance:.0f} km")
-        with col3:
-            days = (trajectory_data['date'].iloc[-1] - trajectory_data['date'].iloc[0]).days
-            st.metric("⏱️ Mission Duration", f"{days} days")
+        # Whole-mission statistics (haversine along-track distance)
+        if float_stats is not None:
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("📍 Total Positions", int(float_stats['n_positions']))
+            with col2:
+                st.metric("🏃 Distance Traveled", f"{float_stats['distance_km']:.0f} km")
+            with col3:
+                duration = float_stats['duration_days']
+                st.metric("⏱️ Mission Duration", "n/a" if pd.isna(duration) else f"{duration:.0f} days")
+            with col4:
+                speed = float_stats['speed_km_per_day']
+                st.metric("🧭 Drift Speed", "n/a" if pd.isna(speed) else f"{speed:.1f} km/day")
+        else:
+            st.info("No trajectory statistics for this float yet")
     else:
         st.info("Select a specific float to view its trajectory")
 
@@ -431,7 +429,7 @@ elif page == "📊 Data Analysis":
     st.subheader("🌡️ Temperature vs Depth Profiles")
     
     # Create depth profile data
-    profile_data = filtered_df.groupby(['region', 'pressure']).agg({
+    profile_data = filtered_df.groupby(['region', 'pressure'], observed=True).agg({
         'temperature': 'mean',
         'salinity': 'mean'
     }).reset_index()
@@ -465,13 +463,13 @@ elif page == "📊 Data Analysis":
         # Temperature by region (surface waters)
         st.write("🌡️ **Surface Temperature by Region (0-100m)**")
         surface_data = filtered_df[filtered_df['pressure'] <= 100]
-        temp_by_region = surface_data.groupby('region')['temperature'].mean().sort_values(ascending=False)
+        temp_by_region = surface_data.groupby('region', observed=True)['temperature'].mean().sort_values(ascending=False)
         st.bar_chart(temp_by_region)
     
     with col2:
         # Salinity by region
         st.write("🧂 **Surface Salinity by Region (0-100m)**")
-        sal_by_region = surface_data.groupby('region')['salinity'].mean().sort_values(ascending=False)
+        sal_by_region = surface_data.groupby('region', observed=True)['salinity'].mean().sort_values(ascending=False)
         st.bar_chart(sal_by_region)
     
     # Time series analysis
@@ -524,8 +522,11 @@ elif page == "💬 Chat Assistant":
         
         # Generate response
         with st.chat_message("assistant"):
-            with st.spinner("Analyzing data..."):
-                time.sleep(1)  # Simulate processing
+            try:
+                response = render_chat_stream(prompt)
+            except (requests.RequestException, RuntimeError) as e:
+                # Nothing was streamed yet: the API is unreachable
+                print(f"Chat stream unavailable, using built-in answers: {e}")
                 response = get_chat_response(prompt)
                 st.markdown(response)
         
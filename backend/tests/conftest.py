@@ -0,0 +1,72 @@
+"""Shared fixtures: the app runs against a throwaway SQLite database.
+
+The environment is set before ``app`` is first imported, since the engines,
+the retrieval index directory and the response cache read it at import.
+
+Run (from backend/):  python -m pytest -q
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+_TMP = Path(tempfile.mkdtemp(prefix="argo_tests_"))
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP / 'argo.db'}"
+os.environ["RETRIEVAL_INDEX_DIR"] = str(_TMP / "retrieval")
+for name in ("RESPONSE_CACHE_DIR", "COLUMNAR_DIR"):
+    os.environ.pop(name, None)
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def empty_db(client):
+    """Data tables emptied (and the manifest forgotten) before the test"""
+    response = client.post("/profiles/reset-tables")
+    assert response.status_code == 200, response.text
+    return client
+
+
+def write_csv(path: Path, profiles: dict):
+    """One float CSV: ``profiles`` maps ``n_prof`` to ``(lat, lon, [(pres, temp, psal), ...])``"""
+    lines = ["N_PROF,N_LEVELS,PRES,TEMP,PSAL,LATITUDE,LONGITUDE"]
+    for n_prof, (lat, lon, rows) in profiles.items():
+        for level, (pres, temp, psal) in enumerate(rows):
+            lines.append(f"{n_prof},{level},{pres},{temp},{psal},{lat},{lon}")
+    path.write_text("\n".join(lines) + "\n")
+    return path
+
+
+def levels(temp: float) -> list:
+    """Three ``(pres, temp, psal)`` levels cooling with depth"""
+    return [(5.0, temp, 35.0), (50.0, temp - 1, 35.1), (100.0, temp - 2, 35.2)]
+
+
+def ingest(paths, force: bool = False) -> dict:
+    """Ingest ``paths`` the way the API does (commit, deferred writes, new data version); results by file name"""
+    from app import cache, ingest_engine
+    from app.db import SessionLocal
+
+    db = SessionLocal()
+    try:
+        results = ingest_engine.ingest_files(paths, db, workers=1, force=force)
+        if any(r["rows"] or r["profiles"] for r in results):
+            cache.bump_version(db)
+        db.commit()
+        ingest_engine.after_commit(db)
+        cache.invalidate()
+        return {r["file"]: r for r in results}
+    finally:
+        db.close()
@@ -0,0 +1,90 @@
+"""Climatology cubes: merged on ingest, recomputed per grid cell, equal to a full rebuild."""
+import pytest
+from sqlalchemy import select
+
+from app import climatology, models
+from app.db import SessionLocal
+from conftest import BACKEND_DIR, ingest, levels, write_csv
+
+CSV_FOLDER = BACKEND_DIR / "data" / "data" / "csv_cleaned"
+
+
+def _cells(db) -> dict:
+    table = models.ClimatologyCell.__table__
+    return {tuple(row[:4]): row[4:] for row in db.execute(select(table).order_by(*table.primary_key.columns)).all()}
+
+
+def _assert_same(actual: dict, expected: dict):
+    assert actual.keys() == expected.keys()
+    columns = [c.name for c in models.ClimatologyCell.__table__.columns][4:]
+    for key in expected:
+        for name, got, want in zip(columns, actual[key], expected[key]):
+            if name.endswith(("_sum", "_sumsq")):
+                assert got == pytest.approx(want, rel=1e-9), (key, name)
+            else:
+                assert got == want, (key, name)
+
+
+def _rebuilt(db) -> dict:
+    """The cubes recomputed from scratch, leaving the stored ones untouched"""
+    db.begin_nested()
+    try:
+        climatology.rebuild(db)
+        return _cells(db)
+    finally:
+        db.rollback()
+
+
+def test_ingested_cubes_equal_a_full_rebuild(empty_db):
+    ingest(sorted(CSV_FOLDER.glob("*.csv")))
+    db = SessionLocal()
+    try:
+        stored = _cells(db)
+        assert stored
+        _assert_same(stored, _rebuilt(db))
+    finally:
+        db.close()
+
+
+def test_replaced_profiles_recompute_their_cells(empty_db, tmp_path):
+    path = write_csv(tmp_path / "nodc_6000001_prof.csv", {
+        0: (1.5, 60.5, levels(28.0)),
+        1: (1.6, 60.6, levels(30.0)),  # same cell as profile 0, holds the cell's max
+        2: (5.5, 65.5, levels(20.0)),  # another cell
+    })
+    ingest([path])
+    db = SessionLocal()
+    try:
+        before = _cells(db)
+    finally:
+        db.close()
+
+    # Profile 1 cools: the cell's max must drop, which a merge alone cannot do
+    write_csv(path, {0: (1.5, 60.5, levels(28.0)), 1: (1.6, 60.6, levels(25.0)), 2: (5.5, 65.5, levels(20.0))})
+    ingest([path])
+    db = SessionLocal()
+    try:
+        after = _cells(db)
+        _assert_same(after, _rebuilt(db))
+    finally:
+        db.close()
+    surface = (1, 60, int(climatology.pressure_bin(5.0)), 0)
+    assert before[surface][3:5] == (28.0, 30.0)  # temp_min, temp_max
+    assert after[surface][3:5] == (25.0, 28.0)
+    other = [key for key in before if key[:2] == (5, 65)]
+    assert other and all(after[key] == before[key] for key in other)
+
+
+def test_rebuild_cells_keeps_points_on_cell_edges(empty_db, tmp_path):
+    # On the boundary: bins (2, 61) only, never (1, 60)
+    ingest([write_csv(tmp_path / "nodc_6000002_prof.csv", {0: (2.0, 61.0, levels(22.0)), 1: (1.5, 60.5, levels(23.0))})])
+    db = SessionLocal()
+    try:
+        before = _cells(db)
+        climatology.rebuild_cells(db, {(2, 61), (1, 60), (40, 40)})
+        _assert_same(_cells(db), before)
+        assert {key[:2] for key in before} == {(2, 61), (1, 60)}
+        assert sum(row[0] for key, row in before.items() if key[:2] == (2, 61)) == 3  # temp_count
+        db.rollback()
+    finally:
+        db.close()
@@ -0,0 +1,123 @@
+"""Parquet tier: written only after commit, repaired from SQL, and read back like SQL."""
+import numpy as np
+import pytest
+
+from app import columnar, ingest_engine, measurement_query, models
+from app.db import SessionLocal
+from conftest import BACKEND_DIR, ingest, levels, write_csv
+
+pytest.importorskip("pyarrow")
+
+CSV_FOLDER = BACKEND_DIR / "data" / "data" / "csv_cleaned"
+COLUMNS = "float_id,n_prof,latitude,longitude,n_levels,pres,temp,psal"
+
+
+@pytest.fixture
+def parquet(empty_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(columnar, "COLUMNAR_DIR", str(tmp_path / "parquet"))
+    return tmp_path / "parquet"
+
+
+def _partition(root, float_id):
+    return root / f"float_id={float_id}" / "data.parquet"
+
+
+def _sorted(columns: dict) -> dict:
+    order = np.lexsort((columns["temp"], columns["pres"], columns["n_prof"], columns["float_id"].astype(str)))
+    return {name: values[order] for name, values in columns.items()}
+
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {"float_ids": ["7902247", "7902250"]},
+    {"float_ids": ["7902246"], "n_prof": 3},
+    {"pres_min": 100.0, "pres_max": 500.0},
+    {"lat_min": 0.0, "lat_max": 10.0, "lon_min": 80.0, "lon_max": 90.0, "pres_max": 50.0},
+    {"float_ids": ["0000000"]},
+])
+def test_query_levels_parquet_matches_sql(parquet, monkeypatch, filters):
+    ingest(sorted(CSV_FOLDER.glob("*.csv")))
+    db = SessionLocal()
+    try:
+        from_parquet, source = measurement_query.query_levels(db, COLUMNS, **filters)
+        assert source == "parquet"
+        monkeypatch.setattr(columnar, "COLUMNAR_DIR", None)
+        from_sql, source = measurement_query.query_levels(db, COLUMNS, **filters)
+        assert source == "sql"
+    finally:
+        db.close()
+    from_parquet, from_sql = _sorted(from_parquet), _sorted(from_sql)
+    assert from_parquet["pres"].shape == from_sql["pres"].shape
+    for name in from_sql:
+        np.testing.assert_array_equal(from_parquet[name], from_sql[name], err_msg=name)
+
+
+def test_sql_only_columns_fall_back_to_sql(parquet):
+    ingest(sorted(CSV_FOLDER.glob("*.csv"))[:1])
+    db = SessionLocal()
+    try:
+        columns, source = measurement_query.query_levels(db, "profile_id,pres", limit=5)
+    finally:
+        db.close()
+    assert source == "sql" and columns["pres"].shape == (5,)
+
+
+def test_partitions_are_written_after_commit_only(parquet, tmp_path):
+    path = write_csv(tmp_path / "nodc_5000001_prof.csv", {0: (1.0, 60.0, levels(28.0)), 1: (2.0, 61.0, levels(27.0))})
+    batch = ingest_engine.parse_csv(path)
+    db = SessionLocal()
+    try:
+        with ingest_engine.file_savepoint(db):
+            ingest_engine.write_batch(db, batch)
+            columnar.upsert(db, batch)
+        assert not _partition(parquet, "5000001").exists()  # queued, not written
+        db.rollback()
+        ingest_engine.after_rollback(db)
+        columnar.flush(db)
+        assert not _partition(parquet, "5000001").exists()
+
+        # A file failing inside its savepoint drops only its own queued batch
+        other = dict(batch, float_id="5000002")
+        with pytest.raises(RuntimeError):
+            with ingest_engine.file_savepoint(db):
+                ingest_engine.write_batch(db, other)
+                columnar.upsert(db, other)
+                raise RuntimeError("parse error")
+        with ingest_engine.file_savepoint(db):
+            ingest_engine.write_batch(db, batch)
+            columnar.upsert(db, batch)
+        db.commit()
+        ingest_engine.after_commit(db)
+    finally:
+        db.close()
+    assert _partition(parquet, "5000001").exists()
+    assert not _partition(parquet, "5000002").exists()
+    assert columnar.read_levels(float_ids=["5000001"]).num_rows == 6
+
+
+def test_failed_write_is_re_exported_from_sql(parquet, tmp_path, monkeypatch):
+    path = write_csv(tmp_path / "nodc_5000003_prof.csv", {0: (1.0, 60.0, levels(28.0))})
+    ingest([path])
+    write_csv(path, {0: (1.0, 60.0, levels(20.0)), 1: (2.0, 61.0, levels(19.0))})
+
+    write = columnar.write
+    calls = []
+
+    def flaky(batch, drop_n_prof=()):
+        calls.append(batch["float_id"])
+        if len(calls) == 1:
+            raise OSError("disk full")
+        return write(batch, drop_n_prof)
+
+    monkeypatch.setattr(columnar, "write", flaky)
+    ingest([path])
+    assert len(calls) == 2  # the failed write and the re-export
+
+    table = columnar.read_levels(columns=["n_prof", "temp"], float_ids=["5000003"])
+    db = SessionLocal()
+    try:
+        stored = db.query(models.Measurement).join(models.Profile).filter(models.Profile.float_id == "5000003").count()
+    finally:
+        db.close()
+    assert table.num_rows == stored == 6
+    assert sorted(table["temp"].to_pylist())[-1] == 20.0
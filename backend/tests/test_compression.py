@@ -0,0 +1,90 @@
+"""Content negotiation: Accept-Encoding codings and Accept media types."""
+import gzip
+
+import pytest
+from fastapi import HTTPException
+
+from app import compression, encoding
+from conftest import BACKEND_DIR, ingest
+
+CSV_FOLDER = BACKEND_DIR / "data" / "data" / "csv_cleaned"
+
+
+@pytest.fixture
+def all_codings(monkeypatch):
+    """Negotiate as if every coding were installed"""
+    monkeypatch.setattr(compression, "AVAILABLE", compression.PREFERENCE)
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("", None),
+    ("identity", None),
+    ("gzip", "gzip"),
+    ("GZIP;q=0.5", "gzip"),
+    ("gzip, br, zstd", "br"),  # equal q: server preference
+    ("gzip;q=1.0, br;q=0.8", "gzip"),
+    ("zstd;q=0.9, gzip;q=0.1", "zstd"),
+    ("*", "br"),
+    ("br;q=0, *;q=0.5", "zstd"),
+    ("gzip;q=0", None),
+    ("gzip;q=bogus", None),
+])
+def test_negotiate_encoding(all_codings, header, expected):
+    assert compression.negotiate(header) == expected
+
+
+def test_only_installed_codings_are_offered():
+    assert compression.GZIP in compression.AVAILABLE
+    assert compression.available() == tuple(c for c in compression.PREFERENCE if c in compression.MODULES)
+    assert compression.negotiate("zstd, br, gzip;q=0.1") == compression.AVAILABLE[0]
+
+
+@pytest.mark.parametrize("stored", [False, True])
+def test_compress_round_trip(stored):
+    body = b'{"items": [' + b", ".join(b'{"temp": %d.25}' % i for i in range(2000)) + b"]}"
+    for coding in compression.AVAILABLE:
+        packed = compression.compress(body, coding, stored=stored)
+        assert len(packed) < len(body) and compression.decompress(packed, coding) == body
+
+        stream = compression.Stream(coding)
+        parts = [stream.compress(body[:5000], flush=True), stream.compress(body[5000:9000]), stream.finish(body[9000:])]
+        assert compression.decompress(b"".join(parts), coding) == body
+    assert gzip.decompress(compression.compress(body, compression.GZIP)) == body
+
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, encoding.JSON),
+    ("application/msgpack", encoding.MSGPACK),
+    ("application/x-npz;q=0.5, application/vnd.apache.arrow.stream", encoding.ARROW),
+    ("text/html, */*;q=0.1", encoding.JSON),
+    ("application/*", encoding.JSON),
+])
+def test_media_type(accept, expected):
+    assert encoding.media_type(accept) == expected
+
+
+@pytest.mark.parametrize("accept", ["text/csv", "text/html, application/json;q=0", "image/png;q=1"])
+def test_unsupported_media_type_is_406(accept):
+    assert encoding.negotiate(accept) is None
+    with pytest.raises(HTTPException) as raised:
+        encoding.media_type(accept)
+    assert raised.value.status_code == 406
+
+
+def test_responses_are_negotiated(empty_db):
+    client = empty_db
+    ingest(sorted(CSV_FOLDER.glob("*.csv"))[:2])
+    query = {"variables": ["float_id", "pres", "temp"]}
+
+    response = client.post("/measurements/query", json=query, headers={"accept-encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip" and "accept-encoding" in response.headers["vary"].lower()
+    assert response.json()["rows"] == len(response.json()["columns"]["pres"]) > 0
+
+    plain = client.post("/measurements/query", json=query, headers={"accept-encoding": "identity"})
+    assert "content-encoding" not in plain.headers and plain.json() == response.json()
+
+    assert client.post("/measurements/query", json=query, headers={"accept": "text/csv"}).status_code == 406
+    # Small bodies are sent as they are
+    assert "content-encoding" not in client.get("/health", headers={"accept-encoding": "gzip"}).headers
@@ -0,0 +1,55 @@
+"""Dashboard FrameIndex filters checked against plain boolean masks."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from dashboard_index import FrameIndex
+
+
+@pytest.fixture(scope="module")
+def frame():
+    rng = np.random.default_rng(1)
+    n = 5000
+    dates = pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 400, n), unit="D")
+    frame = pd.DataFrame({
+        "region": pd.Categorical(rng.choice(["Arabian Sea", "Bay of Bengal", "Equatorial"], n)),
+        "float_id": rng.choice([f"790224{i}" for i in range(6)], n),
+        "date": pd.Series(dates).where(rng.random(n) > 0.05),  # some undated rows
+        "pressure": np.where(rng.random(n) > 0.02, rng.uniform(0.0, 2000.0, n), np.nan),
+        "temperature": rng.normal(20.0, 5.0, n),
+    })
+    return frame
+
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {"region": "Bay of Bengal"},
+    {"float_id": "7902243"},
+    {"region": "Equatorial", "float_id": "7902241"},
+    {"pressure_range": (100.0, 750.0)},
+    {"pressure_range": (0.0, 2000.0)},
+    {"date_range": ("2020-03-01", "2020-06-30")},
+    {"region": "Arabian Sea", "pressure_range": (55.5, 1200.0), "date_range": ("2020-02-10", "2020-12-31")},
+    {"region": "Nowhere"},
+])
+def test_frame_index_filter_matches_masks(frame, filters):
+    mask = np.ones(len(frame), dtype=bool)
+    if "region" in filters:
+        mask &= (frame["region"] == filters["region"]).to_numpy()
+    if "float_id" in filters:
+        mask &= (frame["float_id"] == filters["float_id"]).to_numpy()
+    if "pressure_range" in filters:
+        low, high = filters["pressure_range"]
+        mask &= frame["pressure"].between(low, high).to_numpy()
+    if "date_range" in filters:
+        low, high = (pd.Timestamp(d) for d in filters["date_range"])
+        mask &= frame["date"].between(low, high).to_numpy()
+
+    result = FrameIndex(frame).filter(**filters)
+
+    expected = frame[mask]
+    key = ["float_id", "pressure", "temperature"]
+    pd.testing.assert_frame_equal(
+        result.sort_values(key).reset_index(drop=True)[key],
+        expected.sort_values(key).reset_index(drop=True)[key],
+    )
@@ -0,0 +1,59 @@
+"""Vertical interpolation onto standard pressure levels."""
+import numpy as np
+
+from app import interpolation
+from conftest import ingest, write_csv
+
+
+def test_interpolate_matches_np_interp():
+    rng = np.random.default_rng(0)
+    levels = np.arange(0.0, 500.0, 10.0)
+    profile_index, pres, values = [], [], []
+    for p in range(25):
+        n = int(rng.integers(2, 40))
+        depths = np.sort(rng.uniform(3.0, 480.0, n))
+        profile_index.append(np.full(n, p))
+        pres.append(depths)
+        values.append(rng.normal(10.0, 3.0, n))
+    profile_index, pres, values = (np.concatenate(v) for v in (profile_index, pres, values))
+    # Missing samples are skipped, and rows need not be in profile order
+    values[::17] = np.nan
+    shuffle = rng.permutation(pres.shape[0])
+
+    grid = interpolation.interpolate(profile_index[shuffle], pres[shuffle], values[shuffle], 26, levels)
+
+    assert grid.shape == (26, levels.shape[0])
+    assert np.isnan(grid[25]).all()  # a profile without samples
+    for p in range(25):
+        ok = (profile_index == p) & np.isfinite(values)
+        x, y = pres[ok], values[ok]
+        expected = np.interp(levels, x, y)
+        expected[(levels < x.min()) | (levels > x.max())] = np.nan  # no extrapolation
+        np.testing.assert_allclose(grid[p], expected.astype(np.float32), rtol=1e-5, atol=1e-5)
+
+
+def test_interpolate_exact_levels():
+    grid = interpolation.interpolate([0, 0, 0], [0.0, 10.0, 20.0], [1.0, 2.0, 4.0], 1, [0.0, 10.0, 15.0, 20.0, 30.0])
+    np.testing.assert_array_equal(grid[0], np.array([1.0, 2.0, 3.0, 4.0, np.nan], dtype=np.float32))
+
+
+def test_grid_endpoint(empty_db, tmp_path):
+    client = empty_db
+    ingest([write_csv(tmp_path / "nodc_7000001_prof.csv", {
+        0: (1.0, 60.0, [(0.0, 20.0, 35.0), (100.0, 10.0, 35.5)]),
+        1: (1.5, 60.5, [(50.0, 15.0, 35.2), (150.0, 5.0, 35.6)]),
+    })])
+    response = client.get("/floats/7000001/grid", params={"variables": "temp", "pres_max": 100.0})
+    assert response.status_code == 200
+    body = response.json()
+    levels = np.array(body["levels"])
+    assert levels[0] == interpolation.STANDARD_LEVELS[0] and levels[-1] == 100.0
+    temp = np.array(body["columns"]["temp"], dtype=np.float64)
+    assert temp.shape == (2, levels.shape[0])
+    np.testing.assert_allclose(temp[0], np.interp(levels, [0.0, 100.0], [20.0, 10.0]), rtol=1e-6)
+    # Outside the sampled range of profile 1 there is no value
+    assert np.isnan(temp[1][levels < 50.0]).all()
+    assert body["columns"]["n_prof"] == [0, 1]
+
+    assert client.get("/floats/0000000/grid").status_code == 404
+    assert client.get("/floats/7000001/grid", params={"variables": "oxygen"}).status_code == 400
@@ -0,0 +1,78 @@
+"""Background ingest jobs: lifecycle, status polling and the guards around them."""
+import time
+
+import pytest
+
+from app import models
+from app.db import SessionLocal
+from conftest import levels, write_csv
+
+
+def _wait(client, job_id: int, timeout: float = 30.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(f"/ingest/jobs/{job_id}").json()
+        if job["status"] not in ("queued", "running") or time.monotonic() > deadline:
+            return job
+        time.sleep(0.05)
+
+
+def _folder(tmp_path):
+    for f in range(3):
+        write_csv(tmp_path / f"nodc_40000{f:02d}_prof.csv",
+                  {n: (float(f), 60.0 + n, levels(25.0 - n)) for n in range(4)})
+    return str(tmp_path)
+
+
+def test_background_job_runs_to_completion(empty_db, tmp_path):
+    client = empty_db
+    response = client.post("/ingest/csv", params={"folder": _folder(tmp_path), "background": True})
+    assert response.status_code == 202 and response.json()["status"] == "queued"
+    job = _wait(client, response.json()["job_id"])
+    assert job["status"] == "completed", job
+    assert (job["files_total"], job["files_done"], job["rows_written"]) == (3, 3, 36)
+    assert job["finished_at"] is not None
+    assert client.get("/profiles").json()["total"] == 12
+
+    # Re-running an unchanged folder writes nothing and keeps the data version
+    etag = client.get("/profiles").headers["etag"]
+    again = _wait(client, client.post("/ingest/csv", params={"folder": str(tmp_path), "background": True}).json()["job_id"])
+    assert again["status"] == "completed" and again["rows_written"] == 0
+    assert client.get("/profiles").headers["etag"] == etag
+
+
+def test_unknown_job(client):
+    assert client.get("/ingest/jobs/999999").status_code == 404
+    assert client.post("/ingest/jobs/999999/cancel").status_code == 404
+
+
+def test_cancel_finished_job_is_a_no_op(empty_db, tmp_path):
+    client = empty_db
+    job_id = client.post("/ingest/csv", params={"folder": _folder(tmp_path), "background": True}).json()["job_id"]
+    assert _wait(client, job_id)["status"] == "completed"
+    cancelled = client.post(f"/ingest/jobs/{job_id}/cancel").json()
+    assert cancelled["status"] == "completed" and not cancelled["cancel_requested"]
+
+
+@pytest.mark.parametrize("status", ["queued", "running"])
+def test_reset_refused_while_a_job_is_active(empty_db, status):
+    db = SessionLocal()
+    try:
+        job = models.IngestJob(status=status, folder="/nowhere")
+        db.add(job)
+        db.commit()
+        job_id = job.id
+    finally:
+        db.close()
+    try:
+        assert empty_db.post("/profiles/reset-tables").status_code == 409
+    finally:
+        db = SessionLocal()
+        try:
+            db.query(models.IngestJob).filter_by(id=job_id).update({"status": "cancelled"})
+            db.commit()
+        finally:
+            db.close()
+    assert empty_db.post("/profiles/reset-tables").status_code == 200
+    # Job history survives the reset
+    assert any(j["id"] == job_id for j in empty_db.get("/ingest/jobs").json())
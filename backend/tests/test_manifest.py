@@ -0,0 +1,90 @@
+"""Incremental ingest: unchanged files are skipped, changed profiles are replaced on ``(float_id, n_prof)``."""
+import os
+
+from sqlalchemy import func, select
+
+from app import manifest, models
+from app.db import SessionLocal
+from conftest import ingest, levels, write_csv
+
+
+def _profiles():
+    """``{(float_id, n_prof): (id, n_measurements, lowest temp)}``"""
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            select(models.Profile.float_id, models.Profile.n_prof, models.Profile.id,
+                   func.count(models.Measurement.id), func.min(models.Measurement.temp))
+            .join(models.Measurement, models.Measurement.profile_id == models.Profile.id)
+            .group_by(models.Profile.id)
+        ).all()
+        return {(f, n): (pid, count, temp) for f, n, pid, count, temp in rows}
+    finally:
+        db.close()
+
+
+def test_manifest_incremental_and_replace(empty_db, tmp_path):
+    path = write_csv(tmp_path / "nodc_1000001_prof.csv", {
+        0: (1.0, 70.0, levels(28.0)),
+        1: (1.5, 70.5, levels(27.0)),
+        2: (2.0, 71.0, levels(26.0)),
+    })
+    first = ingest([path])
+    assert first[path.name]["profiles"] == 3 and first[path.name]["rows"] == 9
+    before = _profiles()
+
+    # Same size and mtime: skipped before parsing
+    again = ingest([path])
+    assert again[path.name]["status"] == "unchanged" and again[path.name]["rows"] == 0
+    assert _profiles() == before
+
+    # Profile 1 changes, profile 2 disappears, profile 3 is new
+    write_csv(path, {
+        0: (1.0, 70.0, levels(28.0)),
+        1: (1.5, 70.5, levels(17.0) + [(150.0, 14.0, 35.3)]),
+        3: (2.5, 71.5, levels(25.0)),
+    })
+    changed = ingest([path])
+    assert changed[path.name]["profiles"] == 2 and changed[path.name]["rows"] == 7
+    after = _profiles()
+    assert set(after) == {("1000001", 0), ("1000001", 1), ("1000001", 3)}
+    assert after[("1000001", 0)] == before[("1000001", 0)]  # untouched row, same id
+    assert after[("1000001", 1)][1:] == (4, 14.0)
+
+    # force rewrites every profile without duplicating any
+    forced = ingest([path], force=True)
+    assert forced[path.name]["profiles"] == 3
+    assert {k: v[1:] for k, v in _profiles().items()} == {k: v[1:] for k, v in after.items()}
+
+
+def test_manifest_replaces_profiles_from_another_file(empty_db, tmp_path):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    original = write_csv(tmp_path / "a" / "nodc_1000002_prof.csv", {
+        0: (5.0, 80.0, levels(28.0)),
+        1: (5.5, 80.5, levels(27.0)),
+    })
+    ingest([original])
+    # A second copy of the float elsewhere replaces (float_id, n_prof) instead of adding rows
+    copy = write_csv(tmp_path / "b" / original.name, {0: (5.0, 80.0, levels(20.0)), 1: (5.5, 80.5, levels(27.0))})
+    ingest([copy])
+    profiles = _profiles()
+    assert len(profiles) == 2
+    assert profiles[("1000002", 0)][2] == 18.0
+
+
+def test_touched_file_with_same_content_is_unchanged(empty_db, tmp_path):
+    path = write_csv(tmp_path / "nodc_1000003_prof.csv", {0: (3.0, 75.0, levels(24.0))})
+    ingest([path])
+    before = _profiles()
+    # New mtime, same bytes: parsed and hashed, but nothing is written
+    os.utime(path, (path.stat().st_atime, path.stat().st_mtime + 60))
+    result = ingest([path])[path.name]
+    assert result["status"] == "unchanged" and result["profiles"] == 0
+    assert _profiles() == before
+    # The new mtime is recorded, so the next run skips it before parsing
+    db = SessionLocal()
+    try:
+        assert db.get(models.IngestManifest, manifest.manifest_key(path)).mtime == path.stat().st_mtime
+    finally:
+        db.close()
@@ -0,0 +1,38 @@
+"""The direct NetCDF reader against the converted and cleaned CSVs of the same floats."""
+import numpy as np
+import pytest
+
+from app import ingest_engine
+from conftest import BACKEND_DIR
+
+pytest.importorskip("netCDF4")
+from app.netcdf_ingest import read_netcdf  # noqa: E402
+
+DATA = BACKEND_DIR / "data" / "data"
+FLOATS = sorted(p.stem.split("_")[1] for p in (DATA / ".nc files").glob("nodc_*_prof.nc"))
+
+
+@pytest.mark.parametrize("float_id", FLOATS)
+def test_netcdf_matches_cleaned_csv(float_id):
+    nc = read_netcdf(DATA / ".nc files" / f"nodc_{float_id}_prof.nc", float_id)
+    csv = ingest_engine.parse_csv(DATA / "csv_cleaned" / f"nodc_{float_id}_prof.csv")
+
+    assert nc["float_id"] == csv["float_id"] == float_id
+    for key in ("n_prof", "profile_index", "n_levels"):
+        np.testing.assert_array_equal(nc[key], csv[key], err_msg=key)
+    for key in ("latitude", "longitude"):
+        np.testing.assert_allclose(nc[key], csv[key], rtol=1e-12, err_msg=key)
+    # The CSVs hold the float32 values as decimal text
+    for key in ("pres", "temp", "psal"):
+        np.testing.assert_allclose(nc[key], csv[key], rtol=1e-6, err_msg=key)
+    # JULD was lost in the CSV conversion; the direct reader keeps it
+    assert np.isfinite(nc["juld"]).all()
+
+
+def test_chunked_read_matches_single_pass():
+    path = DATA / ".nc files" / f"nodc_{FLOATS[0]}_prof.nc"
+    whole = read_netcdf(path, FLOATS[0], chunk_profiles=10 ** 6)
+    chunked = read_netcdf(path, FLOATS[0], chunk_profiles=3)
+    assert whole.keys() == chunked.keys()
+    for key, values in whole.items():
+        np.testing.assert_array_equal(chunked[key], values, err_msg=key)
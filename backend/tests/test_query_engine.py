@@ -0,0 +1,109 @@
+"""Offline text-to-SQL: plans, bound parameters and answers checked against pandas on the source CSVs."""
+import pandas as pd
+import pytest
+
+from app import query_engine
+from app.db import ReadSessionLocal
+from conftest import BACKEND_DIR, ingest
+
+CSV_FOLDER = BACKEND_DIR / "data" / "data" / "csv_cleaned"
+
+
+@pytest.fixture(scope="module")
+def frame():
+    parts = [pd.read_csv(path).assign(float_id=path.stem.split("_")[1]) for path in sorted(CSV_FOLDER.glob("*.csv"))]
+    return pd.concat(parts, ignore_index=True)
+
+
+@pytest.fixture
+def archive(empty_db):
+    ingest(sorted(CSV_FOLDER.glob("*.csv")))
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def test_numbers_become_slots_and_share_a_plan():
+    shallow, values = query_engine.normalize("Average temperature below 500 m?")
+    deep, deep_values = query_engine.normalize("average temperature below 1000m")
+    assert shallow == deep == "average temperature below #0 m"
+    assert (values, deep_values) == ([500.0], [1000.0])
+    assert query_engine.normalize("profiles north of 10N")[1] == [10.0]
+    assert query_engine.normalize("near 12.5S 70W") == ("near #0 lat #1 lon", [-12.5, -70.0])
+
+    query_engine.compile_plan.cache_clear()
+    plan = query_engine.compile_plan(shallow)
+    assert query_engine.compile_plan(deep) is plan
+    assert query_engine.compile_plan.cache_info().hits == 1
+    assert plan["intent"] == {"kind": "stat", "variable": "temp", "aggregate": "avg"}
+    assert "m.pres >= :v0" in plan["sql"]
+
+
+def test_question_text_only_reaches_sql_as_parameters():
+    template, values = query_engine.normalize("how many profiles for float abc_1'; drop table profiles")
+    plan = query_engine.compile_plan(template)
+    assert "drop" not in plan["sql"].lower() and "abc_1" not in plan["sql"]
+    params = {}
+    for bind in plan["binders"]:
+        params.update(bind(values)[0])
+    assert params == {"float_id": "abc_1"}
+
+
+@pytest.mark.parametrize("question", ["", "what is the meaning of life", "tell me a joke"])
+def test_unparseable_questions_get_help(question):
+    with pytest.raises(query_engine.QueryNotUnderstood):
+        query_engine.compile_plan(query_engine.normalize(question)[0])
+
+
+def test_answers_match_pandas(archive, frame):
+    def ask(question):
+        return query_engine.answer(archive, question)
+
+    result = ask("How many floats are there?")
+    assert result["rows"] == [{"value": frame["float_id"].nunique()}]
+    assert result["sql"].startswith("SELECT COUNT(DISTINCT p.float_id)")
+
+    float_id = frame["float_id"].iloc[0]
+    result = ask(f"number of profiles for float {float_id}")
+    assert result["rows"][0]["value"] == frame.loc[frame["float_id"] == float_id, "N_PROF"].nunique()
+    assert result["params"] == {"float_id": float_id}
+
+    deep = frame[frame["PRES"] >= 500]
+    result = ask("What is the average temperature below 500 m?")
+    assert result["rows"][0]["value"] == pytest.approx(deep["TEMP"].mean())
+    assert result["rows"][0]["n"] == len(deep)
+    assert "500 dbar" in result["answer"]
+
+    north = frame[frame["LATITUDE"] >= 5]
+    result = ask("maximum salinity north of 5N")
+    top = result["rows"][0]
+    assert top["value"] == pytest.approx(north["PSAL"].max())
+    assert north.loc[north["PSAL"] == north["PSAL"].max(), "float_id"].eq(top["float_id"]).any()
+
+    result = ask(f"average salinity by depth for float {float_id}")
+    one = frame[frame["float_id"] == float_id]
+    expected = one.groupby((one["PRES"] // 100).astype(int) * 100)["PSAL"].mean()
+    assert [r["pres_bin"] for r in result["rows"]] == expected.index.tolist()[:query_engine.MAX_ROWS]
+    assert [r["value"] for r in result["rows"]] == pytest.approx(expected.tolist()[:query_engine.MAX_ROWS])
+
+    result = ask("what is the meaning of life")
+    assert result["answer"] == query_engine.HELP and result["sql"] is None
+
+
+def test_stream_sends_first_rows_early(archive):
+    events = list(query_engine.stream(archive, "temperature per float"))
+    names = [name for name, _ in events]
+    assert names[:2] == ["intent", "sql"] and names[-1] == "answer"
+    rows = [data for name, data in events if name == "rows"]
+    assert len(rows[0]["rows"]) == min(query_engine.FIRST_ROWS, sum(len(r["rows"]) for r in rows))
+
+
+def test_chat_query_validates_k(archive, client):
+    assert client.post("/chat/query", json={"question": "how many floats", "k": "x"}).status_code == 400
+    result = client.post("/chat/query", json={"question": "how many floats", "k": 10 ** 9})
+    assert result.status_code == 200
+    assert len(result.json()["profiles"]) <= 100
+    assert len(client.post("/chat/query", json={"question": "how many floats", "k": 0}).json()["profiles"]) == 1
+    assert client.get("/chat/stream", params={"question": "how many floats", "k": 10 ** 9}).status_code == 422
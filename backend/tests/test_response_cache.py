@@ -0,0 +1,59 @@
+"""Response-cache ETags against a real database."""
+from app import cache, models
+from app.db import SessionLocal
+from conftest import ingest, levels, write_csv
+
+
+def _write_profile(float_id: str, bump: bool):
+    """Add a profile the way another process would: committed, but this process's caches are not invalidated"""
+    db = SessionLocal()
+    try:
+        db.add(models.Profile(float_id=float_id, n_prof=0, latitude=2.0, longitude=61.0))
+        if bump:
+            cache.bump_version(db)
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_version_bump_changes_etag(empty_db, tmp_path):
+    client = empty_db
+    ingest([write_csv(tmp_path / "nodc_3000001_prof.csv", {0: (1.0, 60.0, levels(28.0))})])
+    first = client.get("/profiles")
+    etag = first.headers["etag"]
+    assert client.get("/profiles", headers={"if-none-match": etag}).status_code == 304
+
+    # A write that does not bump the version is not seen: the entry stays valid
+    _write_profile("3000002", bump=False)
+    assert client.get("/profiles").headers["etag"] == etag
+
+    db = SessionLocal()
+    try:
+        cache.bump_version(db)
+        db.commit()
+        cache.invalidate()
+    finally:
+        db.close()
+    second = client.get("/profiles", headers={"if-none-match": etag})
+    assert second.status_code == 200
+    assert second.headers["etag"] != etag
+    assert "3000002" in second.text
+
+
+def test_other_process_writes_seen_after_ttl(empty_db, tmp_path, monkeypatch):
+    client = empty_db
+    ingest([write_csv(tmp_path / "nodc_3000003_prof.csv", {0: (1.0, 60.0, levels(28.0))})])
+    monkeypatch.setattr(cache, "VERSION_TTL", 60.0)
+    first = client.get("/profiles")
+    assert first.json()["total"] == 1
+
+    # Within the TTL the version read earlier is trusted
+    _write_profile("3000004", bump=True)
+    assert client.get("/profiles").headers["etag"] == first.headers["etag"]
+
+    # Once it expires the new version is read, and the cached count goes with the old one
+    monkeypatch.setattr(cache, "VERSION_TTL", 0.0)
+    second = client.get("/profiles", headers={"if-none-match": first.headers["etag"]})
+    assert second.status_code == 200 and second.headers["etag"] != first.headers["etag"]
+    assert second.json()["total"] == 2
+    assert client.get("/profiles", headers={"if-none-match": second.headers["etag"]}).status_code == 304
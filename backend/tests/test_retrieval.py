@@ -0,0 +1,101 @@
+"""Chat retrieval index: ranking, removal, persistence and warming off the request path."""
+import pytest
+
+from app import retrieval
+from app.db import ReadSessionLocal
+from conftest import ingest, levels, write_csv
+
+
+def _index() -> retrieval.VectorIndex:
+    index = retrieval.VectorIndex()
+    index.add("7000001", [0, 1], ["warm surface water arabian sea", "deep cold water arabian sea"])
+    index.add("7000002", [0], ["fresh water bay of bengal"])
+    index.add("7000003", [0], ["equatorial indian ocean salty"])
+    return index
+
+
+def test_search_ranks_matching_profiles_first():
+    index = _index()
+    hits = index.search("bay of bengal", k=3)
+    assert hits[0]["float_id"] == "7000002" and hits[0]["n_prof"] == 0
+    assert all(hit["score"] > 0 for hit in hits)
+    assert [h["n_prof"] for h in index.search("cold deep arabian", k=1)] == [1]
+    assert len(index.search("water", k=2)) == 2
+    assert index.search("zzz qqq", k=5) == []
+
+
+def test_remove_drops_profiles_from_results():
+    index = _index()
+    index.remove("7000001", [1])
+    assert all(h["n_prof"] != 1 for h in index.search("cold deep arabian", k=5))
+    assert index.size == 3
+    index.remove("7000002")
+    assert "7000002" not in {h["float_id"] for h in index.search("bay of bengal", k=5)}
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = _index()
+    index.remove("7000003")
+    index.version = "42"
+    index.save(tmp_path / "index.npz")
+    assert not index.dirty
+
+    loaded = retrieval.VectorIndex.load(tmp_path / "index.npz")
+    assert loaded.version == "42" and loaded.size == index.size
+    for question in ("bay of bengal", "arabian sea", "equatorial"):
+        assert loaded.search(question, k=5) == index.search(question, k=5)
+
+
+@pytest.fixture
+def cold(empty_db, tmp_path, monkeypatch):
+    """The process-wide index forgotten, as after a restart"""
+    ingest([write_csv(tmp_path / "nodc_7100001_prof.csv", {0: (15.0, 88.0, levels(28.0)), 1: (16.0, 89.0, levels(27.0))})])
+    monkeypatch.setattr(retrieval, "INDEX_DIR", str(tmp_path / "retrieval"))
+    monkeypatch.setattr(retrieval, "_index", None)
+    return empty_db
+
+
+def _join():
+    if retrieval._warming is not None:
+        retrieval._warming.join(timeout=30)
+
+
+def test_search_answers_empty_until_warm(cold):
+    db = ReadSessionLocal()
+    try:
+        assert retrieval.search(db, "bay of bengal") == []  # starts warming instead of building inline
+        _join()
+        assert retrieval.ready()
+        assert {h["float_id"] for h in retrieval.search(db, "bay of bengal")} == {"7100001"}
+    finally:
+        db.close()
+    # The built index was saved for the next start, at the current data version
+    db = ReadSessionLocal()
+    try:
+        saved = retrieval.VectorIndex.load(retrieval._path())
+        assert saved.version == retrieval._version(db) and saved.size == 2
+    finally:
+        db.close()
+
+
+def test_saved_index_for_another_version_is_rebuilt(cold):
+    stale = _index()
+    stale.version = "stale"
+    stale.save(retrieval._path())
+    retrieval.warm()
+    _join()
+    db = ReadSessionLocal()
+    try:
+        assert retrieval.get_index(db).version == retrieval._version(db)
+        assert {h["float_id"] for h in retrieval.search(db, "bay of bengal arabian sea", k=10)} == {"7100001"}
+    finally:
+        db.close()
+
+
+def test_chat_reports_retrieval_readiness(cold):
+    client = cold
+    result = client.post("/chat/query", json={"question": "how many floats"}).json()
+    assert result["profiles"] == [] and result["retrieval_ready"] is False
+    _join()
+    result = client.post("/chat/query", json={"question": "how many floats in the bay of bengal"}).json()
+    assert result["retrieval_ready"] is True and result["profiles"]
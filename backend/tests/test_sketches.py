@@ -0,0 +1,63 @@
+"""Mergeable sketches: partial builds combine exactly and summaries match the raw rows."""
+import numpy as np
+import pytest
+
+from app import sketches
+
+
+def _rows(seed: int, n: int):
+    rng = np.random.default_rng(seed)
+    keys = {"month": rng.integers(600, 606, n), "band": rng.integers(0, 4, n)}
+    temp = rng.normal(15.0, 8.0, n)
+    temp[rng.random(n) < 0.05] = np.nan
+    values = {"temp": temp, "psal": rng.normal(35.0, 1.0, n)}
+    return keys, values, {"profile": rng.integers(0, 3000, n)}
+
+
+def test_sketch_merge_equals_single_build():
+    parts = [_rows(seed, 4000) for seed in (2, 3, 4)]
+    merged = sketches.combine(sketches.concat([sketches.build(*part) for part in parts]))
+    whole = sketches.build(*(
+        {name: np.concatenate([part[i][name] for part in parts]) for name in parts[0][i]} for i in range(3)
+    ))
+
+    assert merged.keys() == whole.keys()
+    for name in whole:
+        if name.startswith(("sum_", "sumsq_")):
+            np.testing.assert_allclose(merged[name], whole[name], rtol=1e-12)
+        else:
+            # Counts, min/max, histograms and HLL registers merge exactly
+            np.testing.assert_array_equal(merged[name], whole[name], err_msg=name)
+
+
+def test_sketch_summary_matches_rows():
+    keys, values, distinct = _rows(5, 20000)
+    sketch = sketches.build(keys, values, distinct)
+    mask = sketches.select(sketch, month=(601, 603), band=[1, 3])
+    rows = (keys["month"] >= 601) & (keys["month"] <= 603) & np.isin(keys["band"], [1, 3])
+
+    summary = sketches.summarize(sketch, mask)
+
+    temp = values["temp"][rows & np.isfinite(values["temp"])]
+    assert summary["partitions"] == 6
+    assert summary["temp"]["count"] == temp.shape[0]
+    assert summary["temp"]["mean"] == pytest.approx(temp.mean())
+    assert summary["temp"]["std"] == pytest.approx(temp.std(ddof=1))
+    assert summary["temp"]["min"] == temp.min() and summary["temp"]["max"] == temp.max()
+    edges = sketches.HISTOGRAM_EDGES["temp"]
+    expected, _ = np.histogram(np.clip(temp, edges[0], edges[-1]), bins=edges)
+    assert summary["temp"]["histogram"]["counts"] == expected.tolist()
+    distinct = np.unique(distinct["profile"][rows]).shape[0]
+    # 256 registers: standard error ~6.5%
+    assert summary["distinct_profile"] == pytest.approx(distinct, rel=0.2)
+
+
+def test_hll_registers_merge_by_max():
+    ids = np.arange(10000)
+    group = (ids % 2).astype(np.int64)
+    registers = sketches.hll_registers(group, 2, ids)
+    whole = sketches.hll_registers(np.zeros(ids.shape[0], dtype=np.int64), 1, ids)
+
+    np.testing.assert_array_equal(registers.max(axis=0), whole[0])
+    assert sketches.hll_estimate(whole[0]) == pytest.approx(10000, rel=0.2)
+    assert sketches.hll_estimate(sketches.hll_registers(np.zeros(5, np.int64), 1, [1, 2, 3, 3, 3])[0]) == pytest.approx(3, abs=0.5)
@@ -0,0 +1,64 @@
+"""Spatial lookups against brute-force scans of every profile."""
+import numpy as np
+import pytest
+from sqlalchemy import select
+
+from app import models, spatial
+from app.db import SessionLocal
+from conftest import ingest, levels, write_csv
+
+
+@pytest.fixture
+def scattered(empty_db, tmp_path):
+    """300 profiles over 10 floats, 20 of them near the antimeridian; returns ``(ids, lat, lon)`` as stored"""
+    rng = np.random.default_rng(7)
+    lat = rng.uniform(-60.0, 60.0, 300)
+    lon = rng.uniform(-180.0, 180.0, 300)
+    lon[:20] = rng.uniform(175.0, 180.0, 20)
+    paths = []
+    for f in range(10):
+        profiles = {n: (lat[f * 30 + n], lon[f * 30 + n], levels(20.0)) for n in range(30)}
+        paths.append(write_csv(tmp_path / f"nodc_20000{f:02d}_prof.csv", profiles))
+    ingest(paths)
+    db = SessionLocal()
+    try:
+        rows = db.execute(select(models.Profile.id, models.Profile.latitude, models.Profile.longitude)).all()
+    finally:
+        db.close()
+    return tuple(np.array(col) for col in zip(*rows))
+
+
+def test_nearest_matches_full_sort(scattered):
+    ids, lat, lon = scattered
+    db = SessionLocal()
+    try:
+        for query_lat, query_lon, k in ((0.0, 0.0, 10), (10.0, -179.5, 15), (59.0, 120.0, 1), (-89.0, 0.0, 5), (0.0, 90.0, 400)):
+            distances = spatial.haversine_km(query_lat, query_lon, lat, lon)
+            expected = np.sort(distances)[:k]
+            found = spatial.nearest(db, query_lat, query_lon, k)
+            assert len(found) == min(k, ids.shape[0])
+            np.testing.assert_allclose([p["distance_km"] for p in found], expected)
+            assert set(p["id"] for p in found) <= set(ids[distances <= expected[-1]])
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("box", [(-10.0, 10.0, -20.0, 20.0), (-60.0, 60.0, 170.0, -170.0), (30.0, 30.5, 0.0, 1.0)])
+def test_bbox_matches_mask(scattered, box):
+    ids, lat, lon = scattered
+    lat_min, lat_max, lon_min, lon_max = box
+    in_lon = (lon >= lon_min) & (lon <= lon_max) if lon_min <= lon_max else (lon >= lon_min) | (lon <= lon_max)
+    expected = ids[(lat >= lat_min) & (lat <= lat_max) & in_lon]
+    db = SessionLocal()
+    try:
+        found = spatial.bbox(db, *box, limit=1000)
+    finally:
+        db.close()
+    assert sorted(p["id"] for p in found) == sorted(expected.tolist())
+
+
+def test_nearest_endpoint_validates_k(scattered, client):
+    assert client.get("/profiles/nearest", params={"lat": 0, "lon": 0, "k": 0}).status_code == 422
+    found = client.get("/profiles/nearest", params={"lat": 0, "lon": 0, "k": 3}).json()["items"]
+    assert len(found) == 3
+    assert [p["distance_km"] for p in found] == sorted(p["distance_km"] for p in found)
@@ -0,0 +1,38 @@
+"""Trajectory statistics checked against leg-by-leg haversine sums."""
+import numpy as np
+import pytest
+
+from app import trajectory
+
+
+def test_track_stats_per_float():
+    # Float 7 crosses the antimeridian; float 3 has an undated profile and a missing position
+    float_code = [7, 3, 7, 3, 3, 7, 3]
+    n_prof = [2, 1, 0, 0, 3, 1, 2]
+    latitude = [0.0, 10.0, 0.0, 10.0, 11.0, 0.0, np.nan]
+    longitude = [-179.0, 80.0, 179.0, 79.0, 80.0, 180.0, 80.0]
+    juld = [30.0, 10.0, 10.0, 0.0, np.nan, 20.0, 5.0]
+
+    stats = trajectory.track_stats(float_code, n_prof, latitude, longitude, juld)
+
+    np.testing.assert_array_equal(stats["float_code"], [3, 7])
+    np.testing.assert_array_equal(stats["n_positions"], [3, 3])
+    km = trajectory.haversine_km
+    # Float 3: n_prof 0 (day 0) -> 1 (day 10) -> undated 3 last; n_prof 2 has no position
+    legs3 = [km(10.0, 79.0, 10.0, 80.0), km(10.0, 80.0, 11.0, 80.0)]
+    # Float 7: days 10 -> 20 -> 30 along the equator, 1 degree then 1 degree across 180
+    legs7 = [km(0.0, 179.0, 0.0, 180.0), km(0.0, 180.0, 0.0, -179.0)]
+    np.testing.assert_allclose(stats["distance_km"], [sum(legs3), sum(legs7)])
+    np.testing.assert_allclose(stats["max_leg_km"], [max(legs3), max(legs7)])
+    np.testing.assert_allclose(stats["duration_days"], [10.0, 20.0])
+    np.testing.assert_allclose(stats["speed_km_per_day"], [sum(legs3) / 10.0, sum(legs7) / 20.0])
+    np.testing.assert_allclose(stats["displacement_km"], [km(10.0, 79.0, 11.0, 80.0), km(0.0, 179.0, 0.0, -179.0)])
+    np.testing.assert_array_equal(stats["end_latitude"], [11.0, 0.0])
+    assert stats["distance_km"][1] == pytest.approx(2 * 111.2, rel=1e-2)
+
+
+def test_track_stats_empty_and_undated():
+    assert trajectory.track_stats([1], [0], [np.nan], [0.0], [np.nan])["float_code"].shape == (0,)
+    stats = trajectory.track_stats([1, 1], [0, 1], [0.0, 1.0], [0.0, 0.0], [np.nan, np.nan])
+    assert np.isnan(stats["duration_days"][0]) and np.isnan(stats["speed_km_per_day"][0])
+    assert stats["distance_km"][0] > 0
@@ -0,0 +1,67 @@
+"""The single writer connection: freed between ingested files, and a 503 when it stays busy."""
+import pytest
+
+from app import jobs, models
+from app.db import ReadSessionLocal, SessionLocal, engine
+from app.routers import ingest as ingest_router
+from conftest import levels, write_csv
+
+
+def test_sync_ingest_commits_each_file(empty_db, tmp_path):
+    for f in range(3):
+        write_csv(tmp_path / f"nodc_41000{f:02d}_prof.csv", {0: (float(f), 60.0, levels(25.0))})
+    visible = []
+
+    def progress(result):
+        # Another connection already sees the file, so the writer is free between files
+        reader = ReadSessionLocal()
+        try:
+            visible.append(reader.query(models.Profile).count())
+        finally:
+            reader.close()
+
+    db = SessionLocal()
+    try:
+        summary = ingest_router.ingest_csv_folder(str(tmp_path), db, workers=1, progress=progress)
+    finally:
+        db.close()
+    assert summary["processed_files"] == 3
+    assert visible == [1, 2, 3]
+
+
+@pytest.fixture
+def busy_writer(empty_db, monkeypatch):
+    """The writer connection checked out by another session, with a short pool wait"""
+    monkeypatch.setattr(engine.pool, "_timeout", 0.2)
+    db = SessionLocal()
+    db.connection()
+    try:
+        yield empty_db
+    finally:
+        db.close()
+
+
+def test_writes_answer_503_while_the_writer_is_busy(busy_writer, tmp_path):
+    client = busy_writer
+    response = client.post("/aggregates/rebuild")
+    assert response.status_code == 503 and response.headers["retry-after"]
+    write_csv(tmp_path / "nodc_4200000_prof.csv", {0: (1.0, 60.0, levels(25.0))})
+    assert client.post("/ingest/csv", params={"folder": str(tmp_path)}).status_code == 503
+    assert client.post("/ingest/csv", params={"folder": str(tmp_path), "background": True}).status_code == 503
+    assert client.post("/profiles/reset-tables").status_code == 503
+    # Reads never wait for the writer
+    assert client.get("/profiles").status_code == 200
+    assert client.get("/ingest/jobs").status_code == 200
+
+
+def test_cancel_check_reads_without_the_writer(empty_db):
+    db = SessionLocal()
+    try:
+        job = models.IngestJob(status="cancelled", folder="/nowhere", cancel_requested=True)
+        db.add(job)
+        db.commit()
+        job_id = job.id
+        db.connection()  # hold the writer
+        assert jobs._cancel_requested(job_id)
+    finally:
+        db.close()
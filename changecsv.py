@@ -8,7 +8,7 @@ output_folder = r"C:\Users\kanis\Downloads\KANISHKA\PROJECT\sih floatchat\data\c
 os.makedirs(output_folder, exist_ok=True)
 
 # Variables we care about
-vars_to_extract = ["PRES", "TEMP", "PSAL", "LATITUDE", "LONGITUDE"]
+vars_to_extract = ["PRES", "TEMP", "PSAL", "LATITUDE", "LONGITUDE", "JULD"]
 
 
 for file in os.listdir(input_folder):